@@ -29,6 +29,7 @@ class Authoriser:
         self.req_timeout = auth_conf["req_timeout"]
         self.open_keys = auth_conf["open_keys"]
         self.protected_keys = auth_conf["protected_keys"]
+        self.index_prefix = auth_conf["index_prefix"]
         self.username = auth_conf["username"]
         self.password = auth_conf["password"]
 
@@ -142,21 +143,36 @@ class Authoriser:
             logger.debug("Invalid request, Body cannot be empty")
             raise InvalidInputError("Invalid request, Body cannot be empty")
 
+        # a watch request carries the key in its create_request
+        if body.get("create_request") is not None:
+            body = body["create_request"]
+
         # extract key
         if body.get("key") is None:
             logger.debug("key not found in the body")
             raise InvalidInputError("Invalid request, key not found in the body")
 
-        backend_key = Authoriser._decode_to_bytes(body["key"]).decode()
+        key = Authoriser._decode_to_bytes(body["key"])
+        backend_key = key.decode()
         logger.debug(f"Request received to access to backend key {backend_key}")
 
+        # a range request reaches every key up to its range_end, it must stay within the prefix of its key
+        prefix = False
+        if body.get("range_end") is not None:
+            range_end = Authoriser._decode_to_bytes(body["range_end"])
+            if range_end == b"\0" or range_end > Authoriser._prefix_end(key):
+                logger.debug(f"Range of backend key {backend_key} goes beyond its prefix")
+                return False
+            prefix = True
+
         # check it's an allowed resource
-        return self._is_backend_key_allowed(username, backend_key)
+        return self._is_backend_key_allowed(username, backend_key, prefix)
 
-    def _is_backend_key_allowed(self, username: str, backend_key: str):
+    def _is_backend_key_allowed(self, username: str, backend_key: str, prefix: bool = False):
         """
         :param username:
         :param backend_key:
+        :param prefix: if True the whole key space starting with backend_key is requested
         :return:
         - True if authorised
         - False if not authorised
@@ -164,6 +180,10 @@ class Authoriser:
         - AuthorisationUnavailableException if the ECPDS server is unreachable
         - InternalSystemError otherwise
         """
+        # the status index of a key space is readable by who can read the key space
+        if self.index_prefix and backend_key.startswith(self.index_prefix + "/"):
+            backend_key = backend_key[len(self.index_prefix) :]
+
         # first check if we are accessing to a open key space, open to everyone
         if len(list(filter(lambda x: backend_key.startswith(x), self.open_keys))) > 0:
             return True
@@ -174,7 +194,11 @@ class Authoriser:
             logger.debug(f"Destination allowed: {allowed_destinations}")
 
             # extract the destination
-            destination = backend_key.split("/ec/diss/")[1].split("/")[0]
+            destination_path = backend_key.split("/ec/diss/")[1]
+            # a prefix not ending the destination would also reach the destinations starting with the same name
+            if prefix and "/" not in destination_path:
+                return False
+            destination = destination_path.split("/")[0]
             return destination in allowed_destinations
 
         # denied access to anything else
@@ -209,6 +233,20 @@ class Authoriser:
         """
         return base64.decodebytes(string.encode())
 
+    @staticmethod
+    def _prefix_end(key: bytes) -> bytes:
+        """
+        :param key:
+        :return: the end of the range of all the keys starting with key, b"\\0" if there is no end
+        """
+        s = bytearray(key)
+        while s and s[-1] == 0xFF:
+            s.pop()
+        if not s:
+            return b"\0"
+        s[-1] += 1
+        return bytes(s)
+
     @staticmethod
     def _incr_last_byte(path: str) -> bytes:
         """
@@ -22,6 +22,9 @@ class BackendAdapter:
     def __init__(self, config):
         backend_conf = config.backend
         self.url = f"{backend_conf['url']}{backend_conf['route']}"
+        self.watch_url = None
+        if backend_conf.get("watch_route"):
+            self.watch_url = f"{backend_conf['url']}{backend_conf['watch_route']}"
         self.req_timeout = backend_conf["req_timeout"]
 
         # assign explicitly a decorator to monitor the forwarding
@@ -30,8 +33,10 @@ class BackendAdapter:
                 config.monitoring, tlm_type=AvisoAuthMetricType.auth_resp_time.name, tlm_name="be"
             )
             self.forward = self.timed_forward
+            self.forward_stream = self.timed_forward_stream
         else:
             self.forward = self.forward_impl
+            self.forward_stream = self.forward_stream_impl
 
     def timed_forward(self, request):
         """
@@ -39,6 +44,13 @@ class BackendAdapter:
         """
         return self.timer(self.forward_impl, args=request)
 
+    def timed_forward_stream(self, request):
+        """
+        This method is an explicit decorator of the forward_stream_impl method to provide time performance monitoring.
+        Only the time to open the stream is collected
+        """
+        return self.timer(self.forward_stream_impl, args=request)
+
     def forward_impl(self, request):
         """
         This method forwards the request to the backend configured
@@ -46,14 +58,68 @@ class BackendAdapter:
         :return: response content from backend
         - InternalSystemError otherwise
         """
+        resp = self._post(self.url, request)
+
+        # just in case requests does not always raise an error
+        if resp.status_code != 200:
+            logger.debug(
+                f"Error in forwarding requests to backend {self.url}, status {resp.status_code}, {resp.reason}, "
+                f"{resp.content.decode()}"
+            )
+            raise InternalSystemError("Error connecting to backend, please contact the support team")
+        else:
+            return resp.content
+
+    def forward_stream_impl(self, request):
+        """
+        This method forwards a watch request to the backend configured and passes its streaming response through as
+        it arrives, without buffering it
+        :param request:
+        :return: generator of the response chunks from backend
+        - InternalSystemError otherwise
+        """
+        if self.watch_url is None:
+            raise InternalSystemError("Watch not available, please contact the support team")
+        resp = self._post(self.watch_url, request, stream=True)
+        if resp.status_code != 200:
+            logger.debug(
+                f"Error in forwarding requests to backend {self.watch_url}, status {resp.status_code}, {resp.reason}"
+            )
+            resp.close()
+            raise InternalSystemError("Error connecting to backend, please contact the support team")
+
+        def chunks():
+            try:
+                # chunk_size None returns the data as soon as it is received
+                for chunk in resp.iter_content(chunk_size=None):
+                    yield chunk
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+                # the client opens the stream again from the last revision received
+                logger.debug(f"Stream from backend {self.watch_url} interrupted, {str(err)}")
+            finally:
+                resp.close()
+
+        return chunks()
+
+    def _post(self, url, request, stream=False):
+        """
+        This method sends the request data to the backend url and translates any failure in the relevant exception
+        :param url: backend url
+        :param request:
+        :param stream: if True the response body is not read, this is left to the caller
+        :return: response from backend
+        - InvalidInputError if the request is not valid
+        - BackendUnavailableException if the backend is unreachable
+        - InternalSystemError otherwise
+        """
         if request.data is None:
             raise InvalidInputError("Invalid request, data cannot be empty")
         try:
-            resp = requests.post(self.url, data=request.data, timeout=self.req_timeout)
+            resp = requests.post(url, data=request.data, timeout=self.req_timeout, stream=stream)
             # raise an error for http cases
             resp.raise_for_status()
         except requests.exceptions.HTTPError as errh:
-            message = f"Error connecting to backend {self.url}, {str(errh)}"
+            message = f"Error connecting to backend {url}, {str(errh)}"
             if resp.status_code == 400 and "required revision has been compacted" in resp.json().get("error"):
                 raise InvalidInputError("History not available")
             if resp.status_code == 408 or (resp.status_code >= 500 and resp.status_code < 600):
@@ -63,18 +129,9 @@ class BackendAdapter:
                 logger.error(message)
                 raise InternalSystemError("Error connecting to backend, please contact the support team")
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
-            logger.warning(f"Error connecting to backend {self.url}, {str(err)}")
+            logger.warning(f"Error connecting to backend {url}, {str(err)}")
             raise BackendUnavailableException("Error connecting to backend")
         except Exception as e:
             logger.exception(e)
             raise InternalSystemError("Error connecting to backend, please contact the support team")
-
-        # just in case requests does not always raise an error
-        if resp.status_code != 200:
-            logger.debug(
-                f"Error in forwarding requests to backend {self.url}, status {resp.status_code}, {resp.reason}, "
-                f"{resp.content.decode()}"
-            )
-            raise InternalSystemError("Error connecting to backend, please contact the support team")
-        else:
-            return resp.content
+        return resp
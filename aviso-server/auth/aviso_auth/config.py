@@ -74,6 +74,7 @@ class Config:
             self.frontend = frontend
             self.cache = cache
             self.monitoring = monitoring
+            self._check_watch()
 
             logger.debug("Loading configuration completed")
 
@@ -98,6 +99,8 @@ class Config:
         authorisation_server["cache_timeout"] = 86400  # 1 day in seconds
         authorisation_server["open_keys"] = ["/ec/mars", "/ec/config/aviso"]
         authorisation_server["protected_keys"] = ["/ec/diss"]
+        # the status index of a key, under this prefix, is authorised as the key itself
+        authorisation_server["index_prefix"] = "/aviso/index"
         authorisation_server["username"] = None
         authorisation_server["password"] = None
         authorisation_server["monitor"] = False
@@ -107,6 +110,8 @@ class Config:
         backend["url"] = "http://127.0.0.1:2379"
         backend["req_timeout"] = 60  # seconds
         backend["route"] = "/v3/kv/range"
+        # set it, e.g. to "/v3/watch", to enable the streaming watch, it needs gunicorn with gthread or gevent workers
+        backend["watch_route"] = None
         backend["monitor"] = False
 
         # frontend
@@ -115,6 +120,9 @@ class Config:
         frontend["port"] = 8080
         frontend["server_type"] = "flask"
         frontend["workers"] = "1"
+        frontend["worker_class"] = "sync"  # gthread or gevent to serve the watch streams
+        frontend["threads"] = 1  # threads of each gthread worker, each watch stream holds one
+        frontend["timeout"] = 30  # seconds, a gthread or gevent worker is not killed by a long stream
 
         # main config
         config = {}
@@ -185,8 +193,16 @@ class Config:
             config["frontend"]["server_type"] = os.environ["AVISO_AUTH_FRONTEND_SERVER_TYPE"]
         if "AVISO_AUTH_FRONTEND_WORKERS" in os.environ:
             config["frontend"]["workers"] = int(os.environ["AVISO_AUTH_FRONTEND_WORKERS"])
+        if "AVISO_AUTH_FRONTEND_WORKER_CLASS" in os.environ:
+            config["frontend"]["worker_class"] = os.environ["AVISO_AUTH_FRONTEND_WORKER_CLASS"]
+        if "AVISO_AUTH_FRONTEND_THREADS" in os.environ:
+            config["frontend"]["threads"] = int(os.environ["AVISO_AUTH_FRONTEND_THREADS"])
+        if "AVISO_AUTH_FRONTEND_TIMEOUT" in os.environ:
+            config["frontend"]["timeout"] = int(os.environ["AVISO_AUTH_FRONTEND_TIMEOUT"])
         if "AVISO_AUTH_BACKEND_URL" in os.environ:
             config["backend"]["url"] = os.environ["AVISO_AUTH_BACKEND_URL"]
+        if "AVISO_AUTH_BACKEND_WATCH_ROUTE" in os.environ:
+            config["backend"]["watch_route"] = os.environ["AVISO_AUTH_BACKEND_WATCH_ROUTE"]
         if "AVISO_AUTH_BACKEND_MONITOR" in os.environ:
             config["backend"]["monitor"] = os.environ["AVISO_AUTH_BACKEND_MONITOR"]
         if "AVISO_AUTH_AUTHENTICATION_URL" in os.environ:
@@ -325,6 +341,18 @@ class Config:
         assert fe.get("workers") is not None, "frontend workers has not been configured"
         self._frontend = fe
 
+    def _check_watch(self):
+        """
+        A watch stream holds its worker for as long as it is open, a sync worker would then stop serving any other
+        request and be killed at its timeout
+        """
+        if not self.backend.get("watch_route") or self.frontend["server_type"] != "gunicorn":
+            return
+        worker_class = self.frontend.get("worker_class")
+        assert worker_class in ("gthread", "gevent"), "watch_route requires frontend worker_class gthread or gevent"
+        if worker_class == "gthread":
+            assert int(self.frontend.get("threads", 1)) > 1, "watch_route requires frontend threads greater than 1"
+
     @property
     def cache(self):
         return self._cache
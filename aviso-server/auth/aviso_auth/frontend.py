@@ -19,7 +19,7 @@ from aviso_monitoring import __version__ as monitoring_version
 from aviso_monitoring.collector.count_collector import UniqueCountCollector
 from aviso_monitoring.collector.time_collector import TimeCollector
 from aviso_monitoring.reporter.aviso_auth_reporter import AvisoAuthMetricType
-from flask import Flask, Response, render_template, request
+from flask import Flask, Response, render_template, request, stream_with_context
 from flask_caching import Cache
 
 
@@ -155,12 +155,26 @@ class Frontend:
             resp_content = timed_process_request()
             return Response(resp_content)
 
-        def process_request():
+        if self.config.backend.get("watch_route"):
+
+            @handler.route(self.config.backend["watch_route"], methods=["POST"])
+            def watch():
+                """
+                The route for the watch requests, the streaming response of the backend is passed through as it arrives
+                """
+                logger.info(
+                    f"New watch request received from {request.headers.get('X-Forwarded-For')}, "
+                    f"content: {request.data}"
+                )
+                chunks = timed_process_request(stream=True)
+                return Response(stream_with_context(chunks), mimetype="application/json")
+
+        def process_request(stream=False):
             """
             The main request processing flow:
              1. Authenticate
              2. Authorise
-             3. Forward to backend
+             3. Forward to backend, as a stream if requested
             """
             # (1) Authenticate request and increment user counter
             username = self.user_counter(self.authenticator.authenticate, args=request)
@@ -173,15 +187,19 @@ class Frontend:
             logger.debug("Request successfully authorised")
 
             # (3) Forward request to backend
-            resp_content = self.backend.forward(request)
-            logger.info("Request completed")
+            if stream:
+                resp_content = self.backend.forward_stream(request)
+                logger.info("Stream opened")
+            else:
+                resp_content = self.backend.forward(request)
+                logger.info("Request completed")
             return resp_content
 
-        def timed_process_request():
+        def timed_process_request(stream=False):
             """
             Wraps process_request in a time collector (self.timer).
             """
-            return self.timer(process_request)
+            return self.timer(process_request, args=stream)
 
         return handler
 
@@ -207,6 +225,9 @@ class Frontend:
             options = {
                 "bind": f"{self.config.frontend['host']}:{self.config.frontend['port']}",
                 "workers": self.config.frontend["workers"],
+                "worker_class": self.config.frontend.get("worker_class"),
+                "threads": self.config.frontend.get("threads"),
+                "timeout": self.config.frontend.get("timeout"),
                 "post_worker_init": self.post_worker_init,
             }
             GunicornServer(self.handler, options).run()
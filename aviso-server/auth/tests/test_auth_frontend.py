@@ -52,7 +52,7 @@ def prepost_module():
 
 def test_successful_request():
     logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
-    key = "/ec/diss/SCL"
+    key = "/ec/diss/SCL/"
     # encode key
     encoded_key = Authoriser._encode_to_str_base64(key)
     range_end = Authoriser._encode_to_str_base64(str(Authoriser._incr_last_byte(key), "utf-8"))
@@ -80,7 +80,7 @@ def test_successful_request():
 
 def test_bad_authorisation_header():
     logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
-    key = "/ec/diss/SCL"
+    key = "/ec/diss/SCL/"
     # encode key
     encoded_key = Authoriser._encode_to_str_base64(key)
     range_end = Authoriser._encode_to_str_base64(str(Authoriser._incr_last_byte(key), "utf-8"))
@@ -105,7 +105,7 @@ def test_bad_authorisation_header():
 
 def test_bad_authorisation_format():
     logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
-    key = "/ec/diss/SCL"
+    key = "/ec/diss/SCL/"
     # encode key
     encoded_key = Authoriser._encode_to_str_base64(key)
     range_end = Authoriser._encode_to_str_base64(str(Authoriser._incr_last_byte(key), "utf-8"))
@@ -133,7 +133,7 @@ def test_bad_authorisation_format():
 
 def test_bad_token():
     logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
-    key = "/ec/diss/SCL"
+    key = "/ec/diss/SCL/"
     # encode key
     encoded_key = Authoriser._encode_to_str_base64(key)
     range_end = Authoriser._encode_to_str_base64(str(Authoriser._incr_last_byte(key), "utf-8"))
@@ -217,7 +217,7 @@ def test_bad_backend_key():
 
 def test_no_token():
     logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
-    key = "/ec/diss/SCL"
+    key = "/ec/diss/SCL/"
     # encode key
     encoded_key = Authoriser._encode_to_str_base64(key)
     range_end = Authoriser._encode_to_str_base64(str(Authoriser._incr_last_byte(key), "utf-8"))
@@ -251,7 +251,7 @@ def test_no_body():
 
 def test_no_backend_key():
     logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
-    key = "/ec/diss/SCL"
+    key = "/ec/diss/SCL/"
     # encode key
     encoded_key = Authoriser._encode_to_str_base64(key)
     range_end = Authoriser._encode_to_str_base64(str(Authoriser._incr_last_byte(key), "utf-8"))
@@ -279,7 +279,7 @@ def test_no_backend_key():
 
 def test_bad_route():
     logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
-    key = "/ec/diss/SCL"
+    key = "/ec/diss/SCL/"
     # encode key
     encoded_key = Authoriser._encode_to_str_base64(key)
     range_end = Authoriser._encode_to_str_base64(str(Authoriser._incr_last_byte(key), "utf-8"))
@@ -107,3 +107,60 @@ def test_is_backend_key_allowed_other_fail():
     logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
     auth = Authoriser(conf())
     assert not auth._is_backend_key_allowed(valid_user(), "/ec/any")
+
+
+class RequestDict(dict):
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.__dict__ = self
+
+
+def range_request(key: str, range_end: bytes, watch: bool = False) -> RequestDict:
+    body = {"key": Authoriser._encode_to_str_base64(key), "range_end": Authoriser._encode_to_str_base64(range_end)}
+    if watch:
+        body = {"create_request": body}
+    return RequestDict(json=body)
+
+
+def test_is_authorised_prefix():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    auth = Authoriser(conf())
+    assert auth.is_authorised_impl(valid_user(), range_request("/ec/mars/", b"/ec/mars0"))
+    assert auth.is_authorised_impl(valid_user(), range_request("/ec/mars/", b"/ec/mars0", watch=True))
+    # a page of the range ends before the end of the prefix
+    assert auth.is_authorised_impl(valid_user(), range_request("/ec/mars/", b"/ec/mars/date=1"))
+
+
+def test_is_authorised_range_beyond_prefix_fail():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    auth = Authoriser(conf())
+    assert not auth.is_authorised_impl(valid_user(), range_request("/ec/mars/", b"/ec/z"))
+    assert not auth.is_authorised_impl(valid_user(), range_request("/ec/mars/", b"\0", watch=True))
+
+
+def test_is_authorised_prefix_of_destinations_fail():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    auth = Authoriser(conf())
+    # /ec/diss/SCL would also reach the destinations starting with SCL
+    assert not auth.is_authorised_impl(valid_user(), range_request("/ec/diss/SCL", b"/ec/diss/SCM"))
+
+
+def test_is_authorised_status_index():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    auth = Authoriser(conf())
+    # the status index of a key is authorised as the key itself
+    assert auth.is_authorised_impl(valid_user(), range_request("/aviso/index/ec/mars/", b"/aviso/index/ec/mars0"))
+    assert auth.is_authorised_impl(
+        valid_user(), range_request("/aviso/index/ec/diss/SCL/2026", b"/aviso/index/ec/diss/SCL/2027")
+    )
+    assert not auth.is_authorised_impl(
+        valid_user(), range_request("/aviso/index/ec/diss/fake_dest/", b"/aviso/index/ec/diss/fake_dest0")
+    )
+    assert not auth.is_authorised_impl(valid_user(), range_request("/aviso/index/", b"/aviso/index0"))
+
+
+def test_prefix_end():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    assert Authoriser._prefix_end(b"/ec/mars/") == b"/ec/mars0"
+    assert Authoriser._prefix_end(b"/ec/\xff") == b"/ec0"
+    assert Authoriser._prefix_end(b"\xff\xff") == b"\0"
@@ -317,3 +317,22 @@ def test_no_body():
         backend.forward_impl(request)
     except Exception as e:
         assert isinstance(e, InvalidInputError)
+
+
+def test_watch():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    key = "/ec/diss/SCL"
+    # encode key
+    encoded_key = Authoriser._encode_to_str_base64(key)
+    range_end = Authoriser._encode_to_str_base64(str(Authoriser._incr_last_byte(key), "utf-8"))
+    # create the body for the watch on the etcd sever
+    body = {"create_request": {"key": encoded_key, "range_end": range_end}}
+    request = RequestDict(data=json.dumps(body))
+
+    # make the call
+    backend = BackendAdapter(conf())
+    chunks = backend.forward_stream_impl(request)
+    # the first message confirms the creation of the watch
+    message = json.loads(next(chunks).decode().splitlines()[0])
+    assert message["result"]["created"]
+    chunks.close()
@@ -38,6 +38,26 @@ class TimeCollector(Collector):
             logger.debug("Time collected")
         return res
 
+    async def async_call(self, f, args=(), kwargs=None):
+        """
+        This method collects the time taken to execute the coroutine function, awaiting it.
+
+        Args:
+            f (Callable): Coroutine function to take the time of
+            args (tuple, or list): Function arguments
+            kwargs(dict): Function arguments
+        """
+        if type(args) is not tuple and type(args) is not list:
+            args = [args]
+        start = timer()
+        if not kwargs:
+            kwargs = {}
+        res = await f(*args, **kwargs)
+        if self.enabled:
+            self.tlm_buffer.append(timer() - start)
+            logger.debug("Time collected")
+        return res
+
     def aggregate_tlms(self, tlms):
         """
         This method aggregates the measurements collected in the buffer and create a tlm out of them.
@@ -6,6 +6,7 @@
 # granted to it by virtue of its status as an intergovernmental organisation
 # nor does it submit to any jurisdiction.
 
+import asyncio
 import json
 import os
 from time import sleep
@@ -23,6 +24,11 @@ def take_some_time(seconds=0.1, flag=False, flag2=True):
     return flag2
 
 
+async def take_some_time_async(seconds=0.1, flag=True):
+    await asyncio.sleep(seconds)
+    return flag
+
+
 telemetry_type = "test_time"
 
 collector_config = {
@@ -88,3 +94,15 @@ def test_calling_timer():
     timer(take_some_time, args=[0.1, False])
     timer(take_some_time, kwargs={"flag": True})
     timer(take_some_time, args=0.2, kwargs={"flag": True})
+
+
+def test_calling_async_timer():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+
+    # create the collector
+    timer = TimeCollector(Config(**collector_config), tlm_type=telemetry_type)
+
+    assert asyncio.run(timer.async_call(take_some_time_async, args=0.1))
+    assert not asyncio.run(timer.async_call(take_some_time_async, args=0.1, kwargs={"flag": False}))
+    assert len(timer.tlm_buffer) == 2
+    assert timer.tlm_buffer[0] >= 0.1
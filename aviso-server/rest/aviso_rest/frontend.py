@@ -18,8 +18,8 @@ from cloudevents.http import from_http
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import HTMLResponse, JSONResponse
 
+from pyaviso.client import AvisoClient
 from pyaviso.custom_exceptions import InvalidInputError
-from pyaviso.notification_manager import NotificationManager
 from pyaviso.version import __version__ as aviso_version
 
 app = FastAPI()
@@ -35,7 +35,8 @@ class Frontend:
         :param config: Configuration object for the service.
         """
         self.config = config
-        self.notification_manager = NotificationManager()
+        # the schema and the engine are loaded once for all the notifications
+        self.client = AvisoClient(config.aviso)
         # Timer initialization is moved to an app startup event.
 
     def init_timer(self):
@@ -75,11 +76,11 @@ class Frontend:
                 return True
         return False
 
-    async def timed_notify(self, notification, config):
+    async def timed_notify(self, notification):
         """
-        This method allows to submit a notification to the store and to time it
+        This method allows to submit a notification to the store and to time it, without blocking the event loop
         """
-        return self.timer(self.notification_manager.notify, args=(notification, config))
+        return await self.timer.async_call(self.client.async_notify, args=(notification,))
 
     def run_server(self):
         logger.info(
@@ -111,6 +112,12 @@ async def startup_event():
     logger.info("Application startup: Timer initialized.")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Event handler for application shutdown."""
+    await frontend.client.aclose()
+
+
 @app.exception_handler(Exception)
 async def unicorn_exception_handler(request: Request, exc: Exception):
     """Handles unexpected exceptions globally."""
@@ -162,7 +169,7 @@ async def api_notify(request: Request):
         if frontend._skip_request(notification, frontend.config.skips):
             logger.info("Notification skipped")
             return {"message": "Notification skipped"}
-        response = await frontend.timed_notify(notification, config.aviso)
+        response = await frontend.timed_notify(notification)
         logger.info("Notification successfully submitted")
         return JSONResponse(content=response)
     except InvalidInputError as e:
@@ -24,4 +24,5 @@ SYSTEM_FOLDER = "/etc/aviso"
 # This is a thread-safe communication channel. It is used to tell the main thread when to terminate.
 exit_channel = Queue()
 
+from .client import AvisoClient  # noqa: F401, E402
 from .notification_manager import NotificationManager  # noqa: F401, E402
@@ -0,0 +1,169 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import asyncio
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from . import logger, user_config
+from .authentication.auth import Auth
+from .engine import EngineType
+from .engine import engine_factory as ef
+from .engine.engine import Engine
+from .notification_manager import NotificationManager
+
+# the configuration server is asked at most every this many seconds if the remote schema has changed
+SCHEMA_CHECK_INTERVAL = 60  # seconds
+
+
+class AvisoClient:
+    """
+    This class is a long-lived client to submit notifications and read their values, for applications sending many
+    notifications such as Aviso REST. Contrary to NotificationManager, that loads the schema and creates an engine at
+    every call, the client loads the schema once and holds the same engines, with their connections, for all the
+    calls. A remote schema is loaded again only if the service on the configuration server has changed, which is
+    checked at most every schema check interval with a request of the keys only.
+    """
+
+    def __init__(self, config: user_config.UserConfig = None, schema_check_interval: float = SCHEMA_CHECK_INTERVAL):
+        """
+        :param config: UserConfig object, the default configuration if None
+        :param schema_check_interval: min number of seconds between two checks of the remote schema revision
+        """
+        self.config = config if config is not None else user_config.UserConfig()
+        self.schema_check_interval = schema_check_interval
+        self._manager = NotificationManager()
+        self._schema: Dict = None
+        self._schema_rev: int = None
+        self._schema_checked = 0.0
+        self._schema_lock = threading.Lock()
+        self._config_manager = None
+        self._engine: Engine = None
+        self._async_engine = None
+        self._engine_lock = threading.Lock()
+        # metrics
+        self.schema_loads = 0
+
+    @property
+    def schema(self) -> Dict:
+        """
+        :return: the event listener schema, loaded again only if the remote one has changed
+        """
+        with self._schema_lock:
+            now = time.monotonic()
+            if self._schema is not None and (
+                not self.config.remote_schema or now - self._schema_checked < self.schema_check_interval
+            ):
+                return self._schema
+            self._schema_checked = now
+            rev = self._schema_revision()
+            if self._schema is None or rev != self._schema_rev:
+                logger.debug(f"Loading schema at revision {rev}...")
+                self._schema = self.config.schema_parser.parser().load(self.config)
+                self._schema_rev = rev
+                self.schema_loads += 1
+            return self._schema
+
+    @property
+    def engine(self) -> Engine:
+        """
+        :return: the engine to the notification server, created the first time
+        """
+        with self._engine_lock:
+            if self._engine is None:
+                engine_factory = ef.EngineFactory(self.config.notification_engine, Auth.get_auth(self.config))
+                self._engine = engine_factory.create_engine()
+            return self._engine
+
+    def key(self, params: Dict) -> Tuple[str, str, str]:
+        """
+        Generate a key to send to the notification server with the params passed and complying to the current schema
+        :param params: parameters to use in the key
+        :return: tuple of leaf key, root key and admin key
+        """
+        return self._manager.key(params, self.config, self.schema)
+
+    def value(self, params: Dict) -> str:
+        """
+        :param params: parameters to use in the key
+        :return: the value on the server corresponding to the key generated with the parameters passed
+        """
+        key, _, _ = self.key(params)
+        kvs = self.engine.pull(key=key, prefix=False)
+        assert len(kvs) < 2, "Error in retrieving value from key, more than one value returned"
+        if len(kvs) == 0:
+            logger.debug("No value returned")
+        else:
+            return kvs[0]["value"].decode()
+
+    def notify(self, notification: Dict) -> bool:
+        """
+        Send a notification to the server, see NotificationManager.notify
+        :param notification: dictionary of the notification ready to submit
+        :return: True if the notification has been submitted
+        """
+        logger.debug(f"Calling notify with the following notification {notification}...")
+        kvs, base_key, admin_key, ttl = self._manager._notification_kvs(dict(notification), self.config, self.schema)
+        self.engine.push_with_status(
+            kvs, base_key=base_key, admin_key=admin_key, message=f"notification to key {kvs[0]['key']}", ttl=ttl
+        )
+        return True
+
+    def notify_many(self, notifications: List[Dict]) -> List[bool]:
+        """
+        Send many notifications to the server, see NotificationManager.notify_many
+        :param notifications: list of dictionaries of the notifications ready to submit
+        :return: list telling for each notification if it has been submitted
+        """
+        logger.debug(f"Calling notify many with {len(notifications)} notifications...")
+        return self._manager._notify_many(notifications, self.config, self.schema, self.engine)
+
+    async def async_notify(self, notification: Dict) -> bool:
+        """
+        This method is the asyncio variant of notify. With the etcd_rest engine the notification is submitted without
+        blocking the running loop by an asyncio engine bound to it, the other engines are executed in the default
+        executor of the loop
+        :param notification: dictionary of the notification ready to submit
+        :return: True if the notification has been submitted
+        """
+        logger.debug(f"Calling async notify with the following notification {notification}...")
+        loop = asyncio.get_running_loop()
+        if self.config.notification_engine.type != EngineType.ETCD_REST:
+            return await loop.run_in_executor(None, self.notify, notification)
+
+        # the schema could be loaded from the configuration server
+        schema = await loop.run_in_executor(None, lambda: self.schema)
+        kvs, base_key, admin_key, ttl = self._manager._notification_kvs(dict(notification), self.config, schema)
+        if self._async_engine is None:
+            engine_factory = ef.EngineFactory(self.config.notification_engine, Auth.get_auth(self.config))
+            self._async_engine = engine_factory.create_async_engine()
+        await self._async_engine.push_with_status(
+            kvs, base_key=base_key, admin_key=admin_key, message=f"notification to key {kvs[0]['key']}", ttl=ttl
+        )
+        return True
+
+    async def aclose(self):
+        """
+        This method closes the connections of the asyncio engine, from the loop where it has been used
+        """
+        if self._async_engine is not None:
+            await self._async_engine.close()
+            self._async_engine = None
+
+    def _schema_revision(self) -> int:
+        """
+        :return: revision of the last change of the remote schema, None if the schema is local
+        """
+        if not self.config.remote_schema:
+            return None
+        if self._config_manager is None:
+            from .service_config_manager import ServiceConfigManager
+
+            self._config_manager = ServiceConfigManager(self.config)
+        return self._config_manager.revision(self.config.notification_engine.service)
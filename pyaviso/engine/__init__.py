@@ -6,7 +6,17 @@
 # granted to it by virtue of its status as an intergovernmental organisation
 # nor does it submit to any jurisdiction.
 
-__all__ = ["engine", "engine_factory", "etcd_grpc_engine", "etcd_rest_engine", "file_based_engine", "EngineType"]
+__all__ = [
+    "engine",
+    "engine_factory",
+    "etcd_grpc_engine",
+    "etcd_rest_engine",
+    "file_based_engine",
+    "EngineType",
+    "ListenMode",
+    "CheckpointMode",
+    "QueuePolicy",
+]
 
 import importlib
 from enum import Enum
@@ -28,3 +38,45 @@ class EngineType(Enum):
     def get_class(self):
         module = importlib.import_module("pyaviso.engine." + self.value[0])
         return getattr(module, self.value[1])
+
+
+class ListenMode(Enum):
+    """
+    This Enum describes how the engine receives new notifications from the server. WATCH relies on a server stream,
+    if the engine supports it, while POLLING periodically queries the server for changes
+    """
+
+    WATCH = "watch"
+    POLLING = "polling"
+
+    def __str__(self):
+        return self.value
+
+
+class CheckpointMode(Enum):
+    """
+    This Enum describes when the engine saves the last revision received. RECEIVED saves it as soon as the
+    notifications are received, TRIGGERED only once all their triggers have succeeded, so that a notification whose
+    trigger failed is received again after a restart
+    """
+
+    RECEIVED = "received"
+    TRIGGERED = "triggered"
+
+    def __str__(self):
+        return self.value
+
+
+class QueuePolicy(Enum):
+    """
+    This Enum describes what happens to a notification whose triggers are executed in background when the queue of the
+    triggers is full. BLOCK waits for room in the queue, DROP discards the notification and SPILL saves it to disk until
+    there is room again
+    """
+
+    BLOCK = "block"
+    DROP = "drop"
+    SPILL = "spill"
+
+    def __str__(self):
+        return self.value
@@ -0,0 +1,712 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import asyncio
+import inspect
+import json
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import aiohttp
+
+from .. import logger
+from ..authentication.auth import Auth
+from ..custom_exceptions import EngineException, EngineHistoryNotAvailableError
+from ..user_config import EngineConfig
+from . import CheckpointMode, EngineType, ListenMode
+from .etcd_engine import MAX_KV_RETURNED, MAX_STATUS_ATTEMPTS
+from .etcd_rest_engine import EtcdRestEngine
+from .polling_policy import PollingPolicy
+from .session_pool import DEFAULT_POOL_SIZE
+
+
+class AsyncEtcdRestEngine:
+    """
+    This class is the asyncio counterpart of EtcdRestEngine. The requests to the server are coroutines executed by the
+    event loop of the caller, built on aiohttp, and each key listened is a task of the same loop, therefore a single
+    thread can listen to thousands of keys. The callbacks can be coroutine functions or plain functions, in the latter
+    case they must not block. The sessions are bound to the loop where they are first used, the engine has to be
+    closed from the same loop.
+    """
+
+    def __init__(self, config: EngineConfig, auth: Auth):
+        # the blocking engine provides the encoding of the requests, the local state and the history search
+        self._engine = EtcdRestEngine(config, auth)
+        self._base_url = self._engine._base_url
+        self._token_manager = self._engine._token_manager
+        self._pool_size = DEFAULT_POOL_SIZE if config.pool_size is None else config.pool_size
+        self._keep_alive = config.keep_alive
+        self._session: Optional[aiohttp.ClientSession] = None
+        # watch streams hold their connection, they get a session without limit of connections
+        self._watch_session: Optional[aiohttp.ClientSession] = None
+        self._auth_lock: Optional[asyncio.Lock] = None
+        # keys listened, each one with the task listening to it
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # polling policy of each key listened
+        self._polling_policies: Dict[str, PollingPolicy] = {}
+
+    @property
+    def engine_type(self) -> EngineType:
+        return self._engine.engine_type
+
+    @property
+    def host(self) -> str:
+        return self._engine.host
+
+    @property
+    def port(self) -> int:
+        return self._engine.port
+
+    @property
+    def auth(self) -> Auth:
+        return self._engine.auth
+
+    @property
+    def listen_mode(self) -> ListenMode:
+        return self._engine.listen_mode
+
+    @property
+    def catchup(self) -> bool:
+        return self._engine.catchup
+
+    @property
+    def timeout(self) -> int:
+        return self._engine.timeout
+
+    @property
+    def automatic_retry_delay(self) -> int:
+        return self._engine.automatic_retry_delay
+
+    async def __aenter__(self) -> "AsyncEtcdRestEngine":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+        await self.close()
+
+    async def close(self):
+        """
+        This method closes the HTTP sessions of the engine. They are created again on demand afterwards
+        """
+        for session in (self._session, self._watch_session):
+            if session is not None:
+                await session.close()
+        self._session = None
+        self._watch_session = None
+
+    async def pull(
+        self,
+        key: str,
+        key_only: bool = False,
+        rev: int = None,
+        prefix: bool = True,
+        min_rev: int = None,
+        max_rev: int = None,
+    ) -> List[Dict[str, any]]:
+        """
+        This method implements a query to the notification server for all the key-values associated to the key as input.
+        This key by default is a prefix, it can therefore return a set of key-values
+        :param key: input in the query
+        :param key_only: if True no values are returned
+        :param rev: revision to pull
+        :param prefix: if true the function will retrieve all the KV pairs starting with the key passed
+        :param min_rev: if provided it filters for only KV pairs with mod_revision >= to min_rev
+        :param max_rev: if provided it filters for only KV pairs with mod_revision <= to max_rev
+        :return: List of key-value pairs formatted as dictionary
+        """
+        kvs = self.pull_iter(key, key_only=key_only, rev=rev, prefix=prefix, min_rev=min_rev, max_rev=max_rev)
+        return [kv async for kv in kvs]
+
+    async def pull_iter(
+        self,
+        key: str,
+        key_only: bool = False,
+        rev: int = None,
+        prefix: bool = True,
+        min_rev: int = None,
+        max_rev: int = None,
+        page_size: int = MAX_KV_RETURNED,
+    ) -> AsyncIterator[Dict[str, any]]:
+        """
+        This method implements the same query of pull but it requests the key-values to the server in pages of
+        page_size elements and yields them as soon as decoded. All pages are read from the same revision of the server
+        :param key: input in the query
+        :param key_only: if True no values are returned
+        :param rev: revision to pull
+        :param prefix: if true the function will retrieve all the KV pairs starting with the key passed
+        :param min_rev: if provided it filters for only KV pairs with mod_revision >= to min_rev
+        :param max_rev: if provided it filters for only KV pairs with mod_revision <= to max_rev
+        :param page_size: max number of key-values requested to the server at each call
+        :return: asynchronous iterator over the key-value pairs formatted as dictionary
+        """
+        logger.debug(f"Calling pull for {key}...")
+        range_end = self._range_end(key) if prefix else None
+        encoded_key = self._engine._encode_to_str_base64(key)
+
+        while True:
+            # create the body for the get range on the etcd sever, order them newest first
+            body = {
+                "key": encoded_key,
+                "range_end": range_end,
+                "limit": page_size,
+                "sort_order": "DESCEND",
+                "sort_target": "KEY",
+                "keys_only": key_only,
+                "revision": rev,
+                "min_mod_revision": min_rev,
+                "max_mod_revision": max_rev,
+            }
+            resp_body = await self._range(key, body)
+
+            raw_kvs = resp_body.get("kvs", [])
+            for kv in raw_kvs:
+                yield self._engine._parse_raw_kv(kv, key_only)
+
+            if not prefix or not resp_body.get("more") or len(raw_kvs) == 0:
+                break
+            # next page holds the keys preceding the last one received, from the same revision of the first page
+            range_end = raw_kvs[-1]["key"]
+            if not rev:
+                rev = int(resp_body["header"]["revision"])
+
+    async def push(self, kvs: List[Dict[str, any]], ks_delete: List[str] = None, ttl: int = None) -> bool:
+        """
+        Method to submit a list of key-value pairs and delete a list of keys from the server as a single transaction
+        :param kvs: List of KV pair
+        :param ks_delete: List of keys to delete before the push of the new ones. Note that each key is read as a folder
+        :param ttl: time to leave of the keys pushed, once expired the keys will be deleted
+        :return: True if successful
+        """
+        logger.debug("Calling push...")
+        lease = await self._pooled_lease(ttl) if ttl else None
+        body = self._engine._txn_body(kvs, ks_delete, lease)
+        try:
+            resp_body = await self._call("kv/txn", body, "execute the transaction")
+        except EngineException:
+            if lease:  # the lease could be unknown to the server, a new one is granted next time
+                self._engine._lease_pool.discard(lease)
+            raise
+        logger.debug(f"Transaction completed, new server revision {resp_body.get('header', {}).get('revision')}")
+        return True
+
+    async def delete(self, key: str, prefix: bool = True) -> List[Dict[str, bytes]]:
+        """
+        This method deletes all the keys associated to this key, the key is a prefix as default
+        :param key: key prefix to delete
+        :param prefix: if true the function will delete all the KV pairs starting with the key passed
+        :return: kvs deleted
+        """
+        logger.debug(f"Calling delete for {key}...")
+        body = {
+            "key": self._engine._encode_to_str_base64(key),
+            "range_end": self._range_end(key) if prefix else None,
+            "prev_kv": True,
+        }
+        resp_body = await self._call("kv/deleterange", body, f"delete key {key}")
+        return [self._engine._parse_raw_kv(kv) for kv in resp_body.get("prev_kvs", [])]
+
+    async def push_with_status(
+        self,
+        kvs: List[Dict[str, any]],
+        base_key: str,
+        message: str = "",
+        admin_key: str = None,
+        ks_delete: List[str] = None,
+        ttl: int = None,
+    ) -> bool:
+        """
+        Method to submit a list of key-value pairs and delete a list of keys from the server as a
+        single transaction. This method also updates the status of the base key.
+        :param kvs: List of KV pair
+        :param base_key: base key where to push the status
+        :param message: message to be part of the status update
+        :param admin_key: admin key to push together with the status
+        :param ks_delete: List of keys to delete before the push of the new ones. Note that each key is read as a folder
+        :param ttl: time to leave of the keys pushed, once expired the keys will be deleted
+        :return: True if successful
+        """
+        lease = await self._pooled_lease(ttl) if ttl else None
+        # the status is linked to the current one as last known by the process, see EtcdRestEngine._push_with_statuses
+        old_status_kvs = await self._blocking(self._engine._status_cache.current, base_key)
+        for attempt in range(MAX_STATUS_ATTEMPTS):
+            if old_status_kvs is None:  # never seen by the process
+                old_status_kvs = await self.pull(base_key, prefix=False)
+            # the first status of an hour is indexed, whose lease could be granted
+            body, new_statuses = await self._blocking(
+                self._engine._status_txn_body,
+                kvs,
+                {base_key: message},
+                {base_key: old_status_kvs},
+                [admin_key] if admin_key else [],
+                ks_delete,
+                lease,
+            )
+            try:
+                resp_body = await self._call("kv/txn", body, "execute the transaction")
+            except EngineException:
+                # the leases could be unknown to the server, new ones are granted next time
+                for txn_lease in self._engine._txn_leases(body, lease):
+                    self._engine._lease_pool.discard(txn_lease)
+                raise
+            old_statuses = await self._blocking(self._engine._status_txn_result, resp_body, new_statuses)
+            if old_statuses is None:
+                return True
+            old_status_kvs = old_statuses[base_key]
+            logger.debug("Status replaced by another client, pushing again")
+        raise EngineException("Not able to execute the transaction, the status is being replaced by other clients")
+
+    async def listen(
+        self,
+        keys: List[str],
+        callback: callable([str, str]),
+        from_date: datetime = None,
+        to_date: datetime = None,
+        polling: Dict[str, float] = None,
+        listener: str = None,
+        key_filter: callable([List[str]]) = None,
+    ) -> bool:
+        """
+        This method allows to listen for changes to specific keys. Note that the key is always considered as a prefix.
+        Each key is listened by a task of the running loop, see wait to follow their execution.
+
+        :param keys: keys to watch
+        :param callback: function or coroutine function to call for each notification received
+        :param from_date: date from when to request notifications, if None it will be from now
+        :param to_date: date until when to request notifications, if None it will be until now
+        :param polling: interval, min_interval and max_interval overriding the polling intervals of the engine
+        :param listener: name of the listener, the last revision received is saved separately for each listener and key
+        :param key_filter: function telling, for each key of a batch of notifications received, if the notification
+        has to be passed to the callback, see Engine.listen
+        :return: True if the listener is in execution
+        """
+        for key in keys:
+            logger.debug(f"Starting to listen to {key}")
+            self._polling_policies[key] = self._engine._polling_policy(polling)
+            self._tasks[key] = asyncio.create_task(
+                self._listen_key(key, callback, from_date, to_date, listener if listener else "", key_filter),
+                name=f"aviso-listen-{key}",
+            )
+        return True
+
+    async def stop(self, key: str = None) -> bool:
+        """
+        This method stops the listening of a key, if no key is provided all the keys are stopped
+
+        :param key: the key listened
+        :return: True if the listening is cancelled, False otherwise
+        """
+        if key is None:
+            tasks = list(self._tasks.values())
+            self._tasks.clear()
+            self._polling_policies.clear()
+        elif key in self._tasks:
+            tasks = [self._tasks.pop(key)]
+            self._polling_policies.pop(key, None)
+        else:
+            logger.debug(f"Cannot find listening of key {key}")
+            return False
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # the revisions received so far are not left waiting for the next commit
+        await self._blocking(self._engine._checkpoints.flush)
+        return True
+
+    async def wait(self):
+        """
+        This method waits until the listening of all the keys has completed, this happens only when a to_date is
+        defined, or until the listening of one of them fails. In the latter case all the keys are stopped
+        :raise EngineException: if the listening of a key has failed
+        """
+        while self._tasks:
+            done, _ = await asyncio.wait(list(self._tasks.values()), return_when=asyncio.FIRST_EXCEPTION)
+            for key, task in list(self._tasks.items()):
+                if task not in done:
+                    continue
+                del self._tasks[key]
+                self._polling_policies.pop(key, None)
+                if not task.cancelled() and task.exception() is not None:
+                    await self.stop()
+                    raise EngineException(f"Error while listening to key {key}: {task.exception()}")
+
+    def polling_intervals(self) -> Dict[str, float]:
+        """
+        :return: current polling interval of each key listened, in seconds
+        """
+        return {key: policy.interval for key, policy in self._polling_policies.items()}
+
+    async def _listen_key(
+        self,
+        key: str,
+        callback: callable([str, str]),
+        from_date: datetime = None,
+        to_date: datetime = None,
+        listener: str = "",
+        key_filter: callable([List[str]]) = None,
+    ):
+        """
+        This method implements the listening to a key, see EtcdEngine._polling. The history search and the revisions
+        saved are read and written by the blocking engine in the default executor of the loop
+        :param key: key to listen to as a prefix
+        :param callback: function or coroutine function to call for each notification received
+        :param from_date: date from when to request notifications, if None it will be from now
+        :param to_date: date until when to request notifications, if None it will be until now
+        :param listener: name of the listener, used to save the last revision received
+        :param key_filter: function telling for each key of a batch if the notification has to be passed to the callback
+        """
+
+        # revision of the first notification whose trigger failed, the last revision saved does not move past it
+        failed_rev = None
+
+        async def deliver(kvs, next_rev) -> int:
+            nonlocal failed_rev
+            for kv in kvs:
+                if next_rev < kv["mod_rev"] + 1:
+                    next_rev = kv["mod_rev"] + 1
+            selected = self._engine._select(kvs, key_filter)
+            if self._engine.checkpoint_mode == CheckpointMode.RECEIVED:
+                await self._blocking(self._engine._save_last_revision, next_rev, key, listener)
+                for kv in selected:
+                    await self._trigger(callback, kv)
+                return next_rev
+            # save current rev only once all the triggers succeeded, see EtcdEngine._polling
+            failed = [kv["mod_rev"] for kv in selected if not await self._trigger(callback, kv)]
+            if failed_rev is None:
+                if failed:
+                    failed_rev = min(failed)
+                    logger.warning(
+                        f"Trigger failed for key {key}, notifications will be received again from revision "
+                        f"{failed_rev} at the next start"
+                    )
+                    await self._blocking(self._engine._save_last_revision, failed_rev, key, listener)
+                else:
+                    await self._blocking(self._engine._save_last_revision, next_rev, key, listener)
+            return next_rev
+
+        final_rev = None
+        if from_date is None:
+            if self.catchup is None:
+                raise EngineException("catchup not defined for notification engine")
+            if self.catchup:
+                saved_rev = await self._blocking(self._engine._last_saved_revision, key, listener)
+            else:
+                saved_rev = -1
+                await self._blocking(self._engine._delete_saved_revision, key, listener)
+            if saved_rev != -1:
+                logger.info("Starting from last notification received")
+                next_rev = saved_rev
+            else:  # we start from now
+                next_rev = await self._latest_revision(key) + 1
+        else:
+            logger.info("Searching for past notifications...")
+            next_rev, final_rev = await self._blocking(self._engine._from_to_revisions, key, from_date, to_date)
+            if next_rev == -1 and final_rev == -1:
+                logger.warning("No history available in the time period selected")
+                return
+            elif not next_rev:
+                raise EngineException(f"History of key {key} not available")
+            logger.info("Search completed, retrieving...")
+
+        if to_date:  # end date defined, retrieve only past notifications
+            if final_rev:
+                async for kv in self.pull_iter(key, min_rev=next_rev, max_rev=final_rev):
+                    if kv["key"] == key:  # skip the status
+                        continue
+                    if key_filter is None or key_filter([kv["key"]])[0]:
+                        await self._trigger(callback, kv)
+            logger.info("Search and retrieval completed")
+        elif self.listen_mode == ListenMode.WATCH:
+            await self._watch(key, next_rev, deliver)
+        else:
+            await self._poll(key, next_rev, deliver)
+
+    @staticmethod
+    async def _blocking(fn: Callable, *args):
+        """
+        This method executes a function of the blocking engine doing file I/O, as the checkpoints and the status cache,
+        in the default executor of the loop so that the other tasks are not held
+        :param fn: function to execute
+        :param args: function arguments
+        :return: the result of the function
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    @staticmethod
+    async def _trigger(callback: callable([str, str]), kv: Dict[str, any]) -> bool:
+        """
+        :param callback: function or coroutine function to call
+        :param kv: notification received
+        :return: True if the callback succeeded
+        """
+        k = kv["key"]
+        logger.debug(f"Notification received for key {k}")
+        try:
+            result = callback(k, kv["value"].decode())
+            if inspect.isawaitable(result):
+                await result
+        except Exception as err:
+            logger.error(f"Error with notification trigger: {err}")
+            logger.debug("", exc_info=True)
+            return False
+        return True
+
+    async def _poll(self, key: str, next_rev: int, deliver):
+        """
+        This method queries the server for the changes of the key, waiting between consecutive queries the interval
+        defined by the polling policy of the key, until the key is stopped
+        :param key: key to poll as a prefix
+        :param next_rev: first revision to retrieve
+        :param deliver: coroutine function delivering a batch of key-values and returning the next revision to retrieve
+        """
+        policy = self._polling_policies.get(key) or self._engine._polling_policy()
+        while True:
+            received = 0
+            kvs = []
+            async for kv in self.pull_iter(key, min_rev=next_rev):
+                if kv["key"] == key:  # this is the status
+                    continue
+                kvs.append(kv)
+                received += 1
+                if len(kvs) == MAX_KV_RETURNED:
+                    next_rev = await deliver(kvs, next_rev)
+                    kvs = []
+            if len(kvs) > 0:
+                next_rev = await deliver(kvs, next_rev)
+            await asyncio.sleep(policy.next(received))
+
+    async def _watch(self, key: str, next_rev: int, deliver):
+        """
+        This method receives the changes of the key from the watch stream of the gRPC gateway, see
+        EtcdRestEngine._watch. If the server does not provide the stream this method falls back on the polling
+        :param key: key to watch as a prefix
+        :param next_rev: first revision to retrieve
+        :param deliver: coroutine function delivering a batch of key-values and returning the next revision to retrieve
+        """
+        range_end = self._range_end(key)
+        encoded_key = self._engine._encode_to_str_base64(key)
+        # the stream is opened again if idle for longer than the timeout, to detect stale connections
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=self.timeout)
+
+        while True:
+            body = {
+                "create_request": {
+                    "key": encoded_key,
+                    "range_end": range_end,
+                    "start_revision": next_rev,
+                    "progress_notify": True,
+                }
+            }
+            logger.debug(f"Opening watch stream for key {key} from revision {next_rev}")
+            try:
+                async with await self._post("watch", body, timeout=timeout, stream=True) as resp:
+                    if resp.status in (404, 405, 501):
+                        logger.warning(f"Watch not available on {self._base_url}watch, polling key {key}")
+                        break
+                    resp.raise_for_status()
+                    next_rev = await self._read_watch_stream(key, resp, next_rev, deliver)
+            except EngineHistoryNotAvailableError as e:
+                logger.warning(f"History compacted, watching key {key} from revision {e.args[0]}")
+                next_rev = e.args[0]
+                await self._blocking(self._engine._status_cache.compacted, next_rev - 1)
+            except asyncio.TimeoutError:
+                logger.debug(f"Watch stream for key {key} idle, opening it again")
+            except Exception as err:
+                logger.warning(f"Watch of key {key} interrupted, trying again in {self.automatic_retry_delay}s...")
+                logger.debug(f"Watch error: {err}", exc_info=True)
+                await asyncio.sleep(self.automatic_retry_delay)
+
+        await self._poll(key, next_rev, deliver)
+
+    async def _read_watch_stream(self, key: str, resp: aiohttp.ClientResponse, next_rev: int, deliver) -> int:
+        """
+        This method parses the newline-delimited messages of a watch stream and delivers the changes of the key as they
+        arrive. The messages are split here as they can be larger than the line limit of the aiohttp reader
+        :param key: key watched
+        :param resp: streaming response
+        :param next_rev: first revision expected
+        :param deliver: coroutine function delivering a batch of key-values and returning the next revision to retrieve
+        :return: the revision to watch from if the stream is opened again
+        """
+        buffer = b""
+        async for chunk in resp.content.iter_any():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if not line.strip():
+                    continue
+                kvs, next_rev = self._engine._watch_events(key, json.loads(line), next_rev)
+                if len(kvs) > 0:
+                    next_rev = await deliver(kvs, next_rev)
+        # the server has closed the stream
+        return next_rev
+
+    async def _range(self, key: str, body: Dict[str, any]) -> Dict[str, any]:
+        """
+        This method executes a range request, retrying until the server is reachable
+        :param key: key of the request, used for logging
+        :param body: body of the range request
+        :return: the response body
+        """
+        url = self._base_url + "kv/range"
+        while True:
+            try:
+                async with await self._post("kv/range", body) as resp:
+                    if resp.status == 408 or resp.status == 404 or 500 <= resp.status < 600:
+                        logger.debug(f"Not able to pull key {key}, status {resp.status}, trying again...")
+                    elif resp.status == 400 and any(
+                        m in await resp.text()
+                        for m in ("History not available", "required revision has been compacted")
+                    ):
+                        raise EngineHistoryNotAvailableError()
+                    elif resp.status >= 400:
+                        raise EngineException(
+                            f"Not able to pull key {key}, status {resp.status}, {resp.reason}, {await resp.text()}"
+                        )
+                    else:
+                        return await resp.json(content_type=None)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                logger.debug(f"Not able to pull key {key}, {str(err)}, trying again...")
+            logger.warning(f"Unable to connect to {url}, trying again in {self.automatic_retry_delay}s...")
+            await asyncio.sleep(self.automatic_retry_delay)
+
+    async def _call(self, path: str, body: Dict[str, any], action: str) -> Dict[str, any]:
+        """
+        This method executes a request that is not retried
+        :param path: path of the request, relative to the API base URL
+        :param body: request body
+        :param action: description of the request, used in the error message
+        :return: the response body
+        """
+        try:
+            async with await self._post(path, body) as resp:
+                resp.raise_for_status()
+                return await resp.json(content_type=None)
+        except Exception as err:
+            raise EngineException(f"Not able to {action}, {str(err)}")
+
+    async def _latest_revision(self, key: str) -> int:
+        """
+        :param: key used for the server request
+        :return: latest revision of the notification server.
+        """
+        resp_body = await self._range(key, {"key": self._engine._encode_to_str_base64(key), "keys_only": True})
+        if "header" not in resp_body:
+            raise EngineException("Error in reading server revision. Response does not contain header")
+        return int(resp_body["header"]["revision"])
+
+    async def _pooled_lease(self, ttl: int) -> str:
+        """
+        :param ttl: time to live of the keys to push
+        :return: id of the lease shared with the keys expiring at the same time, see LeasePool
+        """
+        pool = self._engine._lease_pool
+        lease = pool.cached(ttl)
+        if lease is None:
+            window, lease_ttl = pool.window_ttl(ttl)
+            lease = await self._lease(lease_ttl)
+            pool.add(window, lease, lease_ttl)
+        return lease
+
+    async def _lease(self, ttl: int) -> str:
+        """
+        This method requests a Lease for the TTL specified
+        :param ttl: Lease TTL
+        :return: lease id
+        """
+        resp_body = await self._call("lease/grant", {"TTL": ttl, "ID": 0}, "request a lease")
+        if "ID" not in resp_body:
+            logger.error(f"Not able to read lease id from {resp_body}")
+            raise EngineException("Not able to acquire lease")
+        return resp_body["ID"]
+
+    async def _post(
+        self, path: str, body: Dict[str, any], timeout: aiohttp.ClientTimeout = None, stream: bool = False
+    ) -> aiohttp.ClientResponse:
+        """
+        This method sends the request with the authentication header. If the server rejects the token, this is renewed
+        and the request is sent once more
+        :param path: path of the request, relative to the API base URL
+        :param body: request body
+        :param timeout: timeout of the request, if None the one of the engine
+        :param stream: if True the request is sent on the session reserved to the watch streams
+        :return: the server response, to be released by the caller
+        """
+        session = self._get_session(stream)
+        url = self._base_url + path
+        await self._authenticate()
+        header = self.auth.header()
+        resp = await session.post(url, json=body, headers=header, timeout=timeout)
+        if self._token_manager is not None and await self._token_rejected(resp):
+            logger.debug(f"Token rejected for {url}, authenticating again")
+            resp.release()
+            self._token_manager.invalidate(header.get("Authorization"))
+            await self._authenticate()
+            resp = await session.post(url, json=body, headers=self.auth.header(), timeout=timeout)
+        return resp
+
+    @staticmethod
+    async def _token_rejected(resp: aiohttp.ClientResponse) -> bool:
+        """
+        :param resp: server response
+        :return: True if the request failed because of an invalid or expired token
+        """
+        return resp.status == 401 or (resp.status >= 400 and "invalid auth token" in await resp.text())
+
+    async def _authenticate(self):
+        """
+        This method sets the internal token of the user, this is only done for Etcd authentication. The token is
+        shared with the blocking engines, it is requested to the server only if the cached one is expired or has been
+        rejected. Only one task of the loop authenticates at a time
+        """
+        if self._token_manager is None:
+            return
+        token = self._token_manager.cached()
+        if token is None:
+            if self._auth_lock is None:
+                self._auth_lock = asyncio.Lock()
+            async with self._auth_lock:
+                token = self._token_manager.cached()
+                if token is None:
+                    token = await self._request_token()
+                    self._token_manager.store(token)
+        self.auth.token = token
+
+    async def _request_token(self) -> str:
+        """
+        This method authenticates the user against the server
+        :return: the new token
+        """
+        logger.debug(f"Authenticating user {self.auth.username}...")
+        body = {"name": self.auth.username, "password": self.auth.password}
+        try:
+            async with self._get_session().post(self._base_url + "auth/authenticate", json=body) as resp:
+                resp.raise_for_status()
+                resp_body = await resp.json(content_type=None)
+        except Exception as err:
+            raise EngineException(f"Not able to authenticate {self.auth.username}, {str(err)}")
+        assert resp_body.get("token") is not None, "No token found in authentication response"
+        return resp_body["token"]
+
+    def _get_session(self, stream: bool = False) -> aiohttp.ClientSession:
+        """
+        :param stream: if True the session for the watch streams is returned
+        :return: the session of the engine, created the first time it is requested
+        """
+        if stream:
+            if self._watch_session is None:
+                self._watch_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+            return self._watch_session
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._pool_size, force_close=not self._keep_alive)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    def _range_end(self, key: str) -> str:
+        return self._engine._encode_to_str_base64(str(self._engine._incr_last_byte(key), "utf-8"))
@@ -0,0 +1,273 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Tuple
+
+from .. import HOME_FOLDER, logger
+from .engine import DATE_FORMAT
+
+CHECKPOINT_FOLDER = "etcd/last"
+CHECKPOINT_FILE = "checkpoints.db"
+# the revisions saved are committed together at most every this many seconds or this many revisions saved
+COMMIT_INTERVAL = 1.0  # seconds
+COMMIT_COUNT = 100
+
+Checkpoint = Tuple[str, str, str]
+
+
+class CheckpointStore:
+    """
+    This class saves the last revision received for each server, listener and key, so that every key listened
+    resumes from its own revision after a restart. The revisions are kept in a SQLite database in WAL mode, shared
+    by all the engines of the process and by the other processes of the user. Saving a revision only updates the
+    memory, the revisions saved in the meantime are committed together in a single transaction once the commit
+    interval has passed, by a timer if no other revision is saved, or the commit count is reached, when the listening
+    stops and when the process exits.
+    """
+
+    _stores: Dict[Tuple[str, float, int], "CheckpointStore"] = {}
+    _stores_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, path: str = None, commit_interval: float = None, commit_count: int = None) -> "CheckpointStore":
+        """
+        :param path: database file, by default in the home folder
+        :param commit_interval: max number of seconds a revision saved waits to be committed
+        :param commit_count: number of revisions saved after which they are committed
+        :return: the checkpoint store shared for this file and commit settings
+        """
+        if path is None:
+            path = os.path.join(os.path.expanduser(HOME_FOLDER), CHECKPOINT_FOLDER, CHECKPOINT_FILE)
+        if commit_interval is None:
+            commit_interval = COMMIT_INTERVAL
+        if commit_count is None:
+            commit_count = COMMIT_COUNT
+        with cls._stores_lock:
+            store = cls._stores.get((path, commit_interval, commit_count))
+            if store is None:
+                if not cls._stores:
+                    atexit.register(cls.close_all)
+                store = CheckpointStore(path, commit_interval, commit_count)
+                cls._stores[(path, commit_interval, commit_count)] = store
+            return store
+
+    @classmethod
+    def close_all(cls):
+        """
+        Commit the revisions pending and close all the stores of the process
+        """
+        with cls._stores_lock:
+            for store in cls._stores.values():
+                store.close()
+            cls._stores.clear()
+
+    def __init__(self, path: str, commit_interval: float = COMMIT_INTERVAL, commit_count: int = COMMIT_COUNT):
+        """
+        :param path: database file
+        :param commit_interval: max number of seconds a revision saved waits to be committed
+        :param commit_count: number of revisions saved after which they are committed
+        """
+        self.path = path
+        self.commit_interval = commit_interval
+        self.commit_count = commit_count
+        self._pending: Dict[Checkpoint, int] = {}
+        # revisions saved since the last commit, including the ones overwriting a revision pending
+        self._saved = 0
+        self._last_commit = time.monotonic()
+        self._conn = None
+        self._lock = threading.Lock()
+        # timer committing the revisions pending at the end of the commit interval
+        self._timer = None
+        # metrics
+        self.commits = 0
+
+    def revision(self, server: str, listener: str, key: str) -> int:
+        """
+        :param server: host and port of the server
+        :param listener: name of the listener
+        :param key: key listened
+        :return: the last revision saved or -1 if none
+        """
+        with self._lock:
+            checkpoint = (server, listener, key)
+            if checkpoint in self._pending:
+                return self._pending[checkpoint]
+            try:
+                row = (
+                    self._connection()
+                    .execute(
+                        "SELECT revision FROM checkpoints WHERE server = ? AND listener = ? AND key = ?", checkpoint
+                    )
+                    .fetchone()
+                )
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Error occurred while reading the last revision saved: {e}")
+                logger.debug("", exc_info=True)
+                return -1
+            return row[0] if row else -1
+
+    def latest(self, server: str, key: str) -> Tuple[str, int]:
+        """
+        :param server: host and port of the server
+        :param key: key listened
+        :return: the listener and the revision of the newest checkpoint saved for the key by any listener or None
+        """
+        with self._lock:
+            pending = [(c[1], rev) for c, rev in self._pending.items() if c[0] == server and c[2] == key]
+            if pending:
+                return pending[-1]
+            try:
+                row = (
+                    self._connection()
+                    .execute(
+                        "SELECT listener, revision FROM checkpoints WHERE server = ? AND key = ? "
+                        "ORDER BY date_time DESC LIMIT 1",
+                        (server, key),
+                    )
+                    .fetchone()
+                )
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Error occurred while reading the last revision saved: {e}")
+                logger.debug("", exc_info=True)
+                return None
+            return tuple(row) if row else None
+
+    def saved(self, server: str) -> bool:
+        """
+        :param server: host and port of the server
+        :return: True if any revision has been saved for the server
+        """
+        with self._lock:
+            if any(checkpoint[0] == server for checkpoint in self._pending):
+                return True
+            try:
+                row = self._connection().execute("SELECT 1 FROM checkpoints WHERE server = ?", (server,)).fetchone()
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Error occurred while reading the last revision saved: {e}")
+                logger.debug("", exc_info=True)
+                return False
+            return row is not None
+
+    def save(self, server: str, listener: str, key: str, rev: int):
+        """
+        :param server: host and port of the server
+        :param listener: name of the listener
+        :param key: key listened
+        :param rev: last revision received
+        """
+        with self._lock:
+            self._pending[(server, listener, key)] = rev
+            self._saved += 1
+            if self._saved >= self.commit_count or time.monotonic() - self._last_commit >= self.commit_interval:
+                self._commit()
+            self._schedule()
+
+    def delete(self, server: str, listener: str, key: str):
+        """
+        :param server: host and port of the server
+        :param listener: name of the listener
+        :param key: key listened
+        """
+        with self._lock:
+            checkpoint = (server, listener, key)
+            self._pending.pop(checkpoint, None)
+            try:
+                with self._connection() as conn:
+                    conn.execute("DELETE FROM checkpoints WHERE server = ? AND listener = ? AND key = ?", checkpoint)
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Deleting the last revision saved has failed: {e}")
+                logger.debug("", exc_info=True)
+
+    def flush(self) -> bool:
+        """
+        Commit the revisions pending
+        :return: True if committed
+        """
+        with self._lock:
+            return self._commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _commit(self) -> bool:
+        self._last_commit = time.monotonic()
+        self._saved = 0
+        if not self._pending:
+            return True
+        date_time = datetime.utcnow().strftime(DATE_FORMAT)
+        rows = [(*checkpoint, rev, date_time) for checkpoint, rev in self._pending.items()]
+        try:
+            with self._connection() as conn:
+                conn.executemany(
+                    "INSERT INTO checkpoints (server, listener, key, revision, date_time) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (server, listener, key) DO UPDATE SET "
+                    "revision = excluded.revision, date_time = excluded.date_time",
+                    rows,
+                )
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Saving of the last revisions has failed, they will be saved again: {e}")
+            logger.debug("", exc_info=True)
+            return False
+        self._pending.clear()
+        self.commits += 1
+        logger.debug(f"{len(rows)} last revisions committed")
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return True
+
+    def _schedule(self):
+        """
+        This method starts the timer committing the revisions pending once the commit interval has passed, so that
+        they do not wait for the next revision saved
+        """
+        if self._timer is None and self._pending:
+            self._timer = threading.Timer(self.commit_interval, self._timed_commit)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timed_commit(self):
+        with self._lock:
+            self._timer = None
+            self._commit()
+            # the revisions not committed are attempted again at the end of the next interval
+            self._schedule()
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        :return: the connection to the database, opened and initialised the first time
+        """
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS checkpoints (server TEXT, listener TEXT, key TEXT, revision INTEGER, "
+                    "date_time TEXT, PRIMARY KEY (server, listener, key))"
+                )
+                conn.commit()
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._conn = conn
+        return self._conn
@@ -7,20 +7,30 @@
 # nor does it submit to any jurisdiction.
 
 import getpass
+import itertools
 import json
 import os
 import threading
 from abc import ABC, abstractmethod
 from datetime import datetime
 from queue import Queue
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from .. import __version__, exit_channel, logger
 from ..authentication.auth import Auth
 from ..user_config import EngineConfig
 from . import EngineType
+from .polling_policy import PollingPolicy
+from .trigger_executor import TriggerExecutor
 
 DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+# limits of a single transaction, as the etcd defaults of max-txn-ops and max-request-bytes
+MAX_TXN_OPS = 128
+MAX_TXN_BYTES = 1536 * 1024
+# bytes reserved in a transaction for each status pushed
+STATUS_TXN_BYTES = 1024
+# number of notifications received passed at once to the filter of the keys listened
+FILTER_BATCH = 1000
 
 
 class Engine(ABC):
@@ -34,13 +44,34 @@ class Engine(ABC):
         self._host = config.host
         self._port = config.port
         self._polling_interval = config.polling_interval
+        self._min_polling_interval = config.min_polling_interval
+        self._max_polling_interval = config.max_polling_interval
         self._engine_type = config.type
         self.timeout = config.timeout
         self.catchup = config.catchup
         self._auth = auth
         self._https = config.https
         self.automatic_retry_delay = config.automatic_retry_delay
-        self._listeners = []
+        self.listen_mode = config.listen_mode
+        self.checkpoint_mode = config.checkpoint_mode
+        self._polling_workers = config.polling_workers
+        self._delivery_workers = config.delivery_workers
+        self._status_index = config.status_index
+        self._status_index_ttl = config.status_index_ttl
+        self._trigger_workers = config.trigger_workers
+        self._trigger_queue_size = config.trigger_queue_size
+        self._trigger_queue_policy = config.trigger_queue_policy
+        self._trigger_concurrency = config.trigger_concurrency
+        # keys listened, each one with the event stopping its listening
+        self._listeners: Dict[str, threading.Event] = {}
+        # polling policy of each key listened
+        self._polling_policies: Dict[str, PollingPolicy] = {}
+        # name of the listener of each key listened
+        self._listener_names: Dict[str, str] = {}
+        # filter of the notifications of each key listened, if any
+        self._key_filters: Dict[str, callable([List[str]])] = {}
+        # lane of each notification of each key listened, if its triggers are dispatched on ordered lanes
+        self._lanes: Dict[str, callable([str])] = {}
         # this is used to synchronise multiple listening threads accessing the state
         self._state_lock = threading.Lock()
         # this is used to synchronise multiple listening threads accessing the listeners list
@@ -89,6 +120,28 @@ class Engine(ABC):
         """
         pass
 
+    def pull_iter(
+        self,
+        key: str,
+        key_only: bool = False,
+        rev: int = None,
+        prefix: bool = True,
+        min_rev: int = None,
+        max_rev: int = None,
+    ) -> Iterator[Dict[str, any]]:
+        """
+        This method implements the same query of pull but returns an iterator over the key-values. Engines able to
+        retrieve the key-values incrementally override it to keep the memory bounded for large results
+        :param key: input in the query
+        :param key_only: if True no values are returned
+        :param rev: revision to pull
+        :param prefix: if true the function will retrieve all the KV pairs starting with the key passed
+        :param min_rev: if provided it filters for only KV pairs with mod_revision >= to min_rev
+        :param max_rev: if provided it filters for only KV pairs with mod_revision <= to max_rev
+        :return: iterator over the key-value pairs formatted as dictionary
+        """
+        yield from self.pull(key, key_only=key_only, rev=rev, prefix=prefix, min_rev=min_rev, max_rev=max_rev)
+
     @abstractmethod
     def push(self, kvs: List[Dict[str, any]], ks_delete: List[str] = None, ttl: int = None) -> bool:
         """
@@ -131,30 +184,39 @@ class Engine(ABC):
         pass
 
     def listen(
-        self, keys: List[str], callback: callable([str, str]), from_date: datetime = None, to_date: datetime = None
+        self,
+        keys: List[str],
+        callback: callable([str, str]),
+        from_date: datetime = None,
+        to_date: datetime = None,
+        polling: Dict[str, float] = None,
+        listener: str = None,
+        key_filter: callable([List[str]]) = None,
+        lane: callable([str]) = None,
     ) -> bool:
         """
         This method allows to listen for changes to specific keys. Note that the key is always considered as a prefix.
-        The listening is implemented with a background thread doing a active polling. Multiple listening threads can
-        be created by calling this method multiple times.
+        The listening of each key runs in the background, see _start_listening. Multiple listeners can be created by
+        calling this method multiple times.
 
         :param keys: keys to watch
         :param callback: function to trigger in case of changes
         :param from_date: date from when to request notifications, if None it will be from now
         :param to_date: date until when to request notifications, if None it will be until now
+        :param polling: interval, min_interval and max_interval overriding the polling intervals of the engine
+        :param listener: name of the listener, the last revision received is saved separately for each listener and key
+        :param key_filter: function telling, for each key of a batch of notifications received, if the notification
+        has to be passed to the callback. It allows to discard a whole batch before decoding the notifications
+        :param lane: function returning the lane of a notification from its key. When the triggers are executed in
+        background, the notifications of different lanes are triggered in parallel while each lane stays in order
         :return: True if the listener is in execution, False otherwise
         """
         logger.debug("Calling listen...")
         for key in keys:
             try:
-                # create a background thread for the polling
-                t = threading.Thread(target=self._polling, args=(key, callback, exit_channel, from_date, to_date))
-                t.setDaemon(True)
-                # adding the thread to the global list
-                logger.debug(f"Starting thread to listen to {key}")
-                self._add_listener(key)
-                t.start()
-                logger.debug(f"Thread {t.ident} started to listen to {key}")
+                logger.debug(f"Starting to listen to {key}")
+                self._add_listener(key, polling, listener, key_filter, lane)
+                self._start_listening(key, callback, from_date, to_date)
             except Exception as e:
                 logger.error(f"Error in listening to {key}: {e}")
                 logger.debug("", exc_info=True)
@@ -162,6 +224,21 @@ class Engine(ABC):
                 return False
         return True
 
+    def _start_listening(
+        self, key: str, callback: callable([str, str]), from_date: datetime = None, to_date: datetime = None
+    ):
+        """
+        This method starts the listening of a key in a background thread
+        :param key: key to listen to
+        :param callback: function to trigger in case of changes
+        :param from_date: date from when to request notifications, if None it will be from now
+        :param to_date: date until when to request notifications, if None it will be until now
+        """
+        t = threading.Thread(target=self._polling, args=(key, callback, exit_channel, from_date, to_date))
+        t.daemon = True
+        t.start()
+        logger.debug(f"Thread {t.ident} started to listen to {key}")
+
     def stop(self, key: str = None) -> bool:
         """
         This method is used to stop a listening thread. if no key is provided all the listening thread will be stopped
@@ -207,31 +284,161 @@ class Engine(ABC):
         :param ttl: time to leave of the keys pushed, once expired the keys will be deleted
         :return: True if successful
         """
+        return self._push_with_statuses(kvs, {base_key: message}, [admin_key] if admin_key else [], ks_delete, ttl)
+
+    def push_many_with_status(self, notifications: List[Tuple[List[Dict[str, any]], str, str, int]]) -> List[bool]:
+        """
+        Method to submit many notifications in as few transactions as the limits of the server allow. Each transaction
+        updates the status of each base key it writes to only once, the notifications of a failed transaction are
+        reported as not submitted while the following transactions are still attempted.
+        :param notifications: list of tuples: key-value pairs, base key, admin key, TTL of the keys pushed
+        :return: list telling for each notification if it has been submitted
+        """
+        results = [False] * len(notifications)
+        # a transaction attaches the same lease to all its keys, the notifications are grouped by TTL
+        by_ttl: Dict[int, List[int]] = {}
+        for i, notification in enumerate(notifications):
+            by_ttl.setdefault(notification[3], []).append(i)
+
+        for ttl, indexes in by_ttl.items():
+            for chunk in self._txn_chunks(notifications, indexes):
+                kvs = []
+                keys_by_base: Dict[str, List[str]] = {}
+                admin_keys: Dict[str, None] = {}
+                for i in chunk:
+                    n_kvs, base_key, admin_key, _ = notifications[i]
+                    kvs.extend(n_kvs)
+                    keys_by_base.setdefault(base_key, []).append(n_kvs[0]["key"])
+                    if admin_key:
+                        admin_keys[admin_key] = None
+                messages = {}
+                for base_key, keys in keys_by_base.items():
+                    if len(keys) == 1:
+                        messages[base_key] = f"notification to key {keys[0]}"
+                    else:
+                        messages[base_key] = f"{len(keys)} notifications, last to key {keys[-1]}"
+                try:
+                    submitted = self._push_with_statuses(kvs, messages, list(admin_keys), ttl=ttl)
+                except Exception as e:
+                    logger.error(f"Submission of {len(chunk)} notifications failed: {e}")
+                    logger.debug("", exc_info=True)
+                    continue
+                for i in chunk:
+                    results[i] = submitted
+        return results
+
+    @staticmethod
+    def _txn_chunks(
+        notifications: List[Tuple[List[Dict[str, any]], str, str, int]], indexes: List[int]
+    ) -> Iterator[List[int]]:
+        """
+        This method splits the notifications in chunks fitting in a transaction, counting the status and the admin key
+        of each base key once per chunk. A key can be written only once in a transaction
+        :param notifications: list of tuples: key-value pairs, base key, admin key, TTL of the keys pushed
+        :param indexes: indexes of the notifications to split, in order
+        :return: the indexes of the notifications of each chunk
+        """
+        chunk, ops, size, keys, base_keys, admin_keys = [], 0, 0, set(), set(), set()
+
+        def cost(kvs, base_key, admin_key) -> Tuple[int, int]:
+            n_ops = len(kvs)
+            n_size = sum(Engine._txn_bytes(kv) for kv in kvs)
+            if base_key not in base_keys:  # status and status index
+                n_ops += 2
+                n_size += STATUS_TXN_BYTES
+            if admin_key and admin_key not in admin_keys:
+                n_ops += 1
+                n_size += Engine._txn_bytes({"key": admin_key, "value": "None"})
+            return n_ops, n_size
+
+        for i in indexes:
+            kvs, base_key, admin_key, _ = notifications[i]
+            n_ops, n_size = cost(kvs, base_key, admin_key)
+            if chunk and (
+                ops + n_ops > MAX_TXN_OPS or size + n_size > MAX_TXN_BYTES or any(kv["key"] in keys for kv in kvs)
+            ):
+                yield chunk
+                chunk, ops, size, keys, base_keys, admin_keys = [], 0, 0, set(), set(), set()
+                n_ops, n_size = cost(kvs, base_key, admin_key)
+            chunk.append(i)
+            ops += n_ops
+            size += n_size
+            keys.update(kv["key"] for kv in kvs)
+            base_keys.add(base_key)
+            if admin_key:
+                admin_keys.add(admin_key)
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def _txn_bytes(kv: Dict[str, any]) -> int:
+        """
+        :param kv: key-value pair to push
+        :return: estimate of the bytes taken in a transaction request, key and value are base64 encoded
+        """
+        value = kv["value"] if isinstance(kv["value"], bytes) else str(kv["value"]).encode()
+        return (len(kv["key"].encode()) + len(value)) * 4 // 3 + 64
+
+    def _push_with_statuses(
+        self,
+        kvs: List[Dict[str, any]],
+        statuses: Dict[str, str],
+        admin_keys: List[str],
+        ks_delete: List[str] = None,
+        ttl: int = None,
+    ) -> bool:
+        """
+        Method to submit a list of key-value pairs together with the status of each base key, as a single transaction
+        :param kvs: List of KV pair
+        :param statuses: message of the status to push for each base key
+        :param admin_keys: admin keys to push together with the statuses
+        :param ks_delete: List of keys to delete before the push of the new ones. Note that each key is read as a folder
+        :param ttl: time to leave of the keys pushed, once expired the keys will be deleted
+        :return: True if successful
+        """
+        for base_key, message in statuses.items():
+            kvs = kvs + self._status_kvs(base_key, message)
+        kvs = kvs + [{"key": admin_key, "value": "None"} for admin_key in admin_keys]
+        return self.push(kvs, ks_delete, ttl)
+
+    def _status_kvs(
+        self, base_key: str, message: str = "", old_status_kvs: List[Dict[str, any]] = None
+    ) -> List[Dict[str, any]]:
+        """
+        :param base_key: base key where to push the status
+        :param message: message to be part of the status update
+        :param old_status_kvs: current status of the base key, pulled from the server if not passed
+        :return: key-values of the index and of the new status of the base key, linked to the current one. The status
+        is the last one
+        """
         # create the status payload
-        status = {
-            "etcd_user": getattr(self.auth, "username", None),
-            "message": message,
-            "unix_user": getpass.getuser(),
-            "aviso_version": __version__,
-            "engine": self._engine_type.name,
-            "hostname": os.uname().nodename,
-            "date_time": datetime.utcnow().strftime(DATE_FORMAT),
-        }
+        status = self._new_status(message)
 
         # update the status with the revision of the current status. This helps creating a linked list
-        old_status_kvs = self.pull(base_key, prefix=False)
+        if old_status_kvs is None:
+            old_status_kvs = self.pull(base_key, prefix=False)
         if len(old_status_kvs) == 1:
             self._status_as_linked_list(status, old_status_kvs)
+        kvs = list(self._status_index_kvs(base_key, status, old_status_kvs))
 
         status_kv = {"key": base_key, "value": json.dumps(status)}  # push it as a json
         kvs.append(status_kv)
+        return kvs
 
-        if admin_key:
-            # prepare the admin key value pair
-            admin_kv = {"key": admin_key, "value": "None"}
-            kvs.append(admin_kv)
-
-        return self.push(kvs, ks_delete, ttl)
+    def _new_status(self, message: str = "") -> Dict[str, any]:
+        """
+        :param message: message to be part of the status update
+        :return: the status payload of a base key, not yet linked to the previous one
+        """
+        return {
+            "etcd_user": getattr(self.auth, "username", None),
+            "message": message,
+            "unix_user": getpass.getuser(),
+            "aviso_version": __version__,
+            "engine": self._engine_type.name,
+            "hostname": os.uname().nodename,
+            "date_time": datetime.utcnow().strftime(DATE_FORMAT),
+        }
 
     def _status_as_linked_list(self, new_status, old_status_kvs):
         if "mod_rev" in old_status_kvs[0]:  # test engine does not have it
@@ -251,14 +458,131 @@ class Engine(ABC):
                 # new day -> use the previous status as last_prev_day
                 new_status["last_prev_day_rev"] = new_status["prev_rev"]
 
-    def _add_listener(self, key: str):
+    def _status_index_kvs(
+        self, base_key: str, new_status: Dict[str, any], old_status_kvs: List[Dict[str, any]]
+    ) -> List[Dict[str, any]]:
+        """
+        :param base_key: base key where the status is pushed
+        :param new_status: status about to be pushed
+        :param old_status_kvs: current status of the base key, if any
+        :return: key-values indexing the new status, to push together with it. None by default
+        """
+        return []
+
+    def polling_intervals(self) -> Dict[str, float]:
+        """
+        :return: current polling interval of each key listened, in seconds
+        """
         with self._listeners_lock:
-            self._listeners.append(key)
+            return {key: policy.interval for key, policy in self._polling_policies.items()}
+
+    def trigger_metrics(self) -> Dict[str, float]:
+        """
+        :return: depth of the queue of the triggers executed in background and wait time of the notifications in it,
+        see TriggerExecutor.metrics. Empty if the triggers are executed in the listening thread
+        """
+        executor = self._trigger_executor()
+        return executor.metrics() if executor is not None else {}
+
+    def trigger_concurrency(self, lanes: int = None) -> int:
+        """
+        :param lanes: number of lanes the triggers of the listener are dispatched on, if any
+        :return: max number of notifications of a listener whose triggers are executed at the same time
+        """
+        if not self._trigger_workers:
+            return 1
+        concurrency = (self._trigger_concurrency or 1) if lanes is None else lanes
+        return min(self._trigger_workers, concurrency)
+
+    def _polling_policy(self, polling: Dict[str, float] = None) -> PollingPolicy:
+        """
+        :param polling: interval, min_interval and max_interval overriding the ones of the engine
+        :return: a new polling policy
+        """
+        polling = polling if polling else {}
+        return PollingPolicy(
+            polling.get("interval", self._polling_interval),
+            min_interval=polling.get("min_interval", self._min_polling_interval),
+            max_interval=polling.get("max_interval", self._max_polling_interval),
+        )
+
+    def _add_listener(
+        self,
+        key: str,
+        polling: Dict[str, float] = None,
+        listener: str = None,
+        key_filter: callable([List[str]]) = None,
+        lane: callable([str]) = None,
+    ):
+        policy = self._polling_policy(polling)
+        with self._listeners_lock:
+            self._listeners[key] = threading.Event()
+            self._polling_policies[key] = policy
+            self._listener_names[key] = listener if listener else ""
+            if key_filter is not None:
+                self._key_filters[key] = key_filter
+            if lane is not None:
+                self._lanes[key] = lane
 
     def _remove_all_listeners(self):
         with self._listeners_lock:
+            for stop in self._listeners.values():
+                stop.set()
             self._listeners.clear()
+            self._polling_policies.clear()
+            self._listener_names.clear()
+            self._key_filters.clear()
+            self._lanes.clear()
 
     def _remove_listener(self, key: str):
         with self._listeners_lock:
-            self._listeners.remove(key)
+            self._polling_policies.pop(key, None)
+            self._listener_names.pop(key, None)
+            self._key_filters.pop(key, None)
+            self._lanes.pop(key, None)
+            stop = self._listeners.pop(key, None)
+            if stop is not None:
+                stop.set()
+
+    @staticmethod
+    def _select(
+        notifications: Iterable[Dict[str, any]], key_filter: callable([List[str]]) = None
+    ) -> Iterator[Dict[str, any]]:
+        """
+        This method filters the notifications received in batches, see listen
+        :param notifications: notifications received, as key-value pairs
+        :param key_filter: function telling for each key of a batch if the notification has to be passed on
+        :return: the notifications selected, in the same order
+        """
+        if key_filter is None:
+            yield from notifications
+            return
+        notifications = iter(notifications)
+        while True:
+            batch = list(itertools.islice(notifications, FILTER_BATCH))
+            if not batch:
+                return
+            selected = key_filter([kv["key"] for kv in batch])
+            discarded = len(batch) - sum(selected)
+            if discarded:
+                logger.debug(f"{discarded} of {len(batch)} notifications discarded by the filter")
+            yield from itertools.compress(batch, selected)
+
+    def _trigger_executor(self) -> Optional[TriggerExecutor]:
+        """
+        :return: the executor of the triggers shared across the process, None if the triggers are executed in the
+        listening thread
+        """
+        if not self._trigger_workers:
+            return None
+        return TriggerExecutor.get(self._trigger_workers, self._trigger_queue_size, self._trigger_queue_policy)
+
+    def _wait_stop(self, key: str, timeout: float = None) -> bool:
+        """
+        This method waits until the listening of the key is stopped or the timeout expires
+        :param key: key listened
+        :param timeout: seconds to wait, if None it waits until the listening is stopped
+        :return: True if the listening of the key is stopped
+        """
+        stop = self._listeners.get(key)
+        return stop is None or stop.wait(timeout)
@@ -58,3 +58,18 @@ class EngineFactory:
             return engine_class(config=self._conf, auth=self._auth)
         except Exception as e:
             raise EngineException(f"Error in creating the engine {engine_class.__name__}: {e}")
+
+    def create_async_engine(self):
+        """
+        :return: an instance of the asyncio engine, available only to connect to the REST API of the server
+        """
+        if self._conf.type != EngineType.ETCD_REST:
+            raise EngineException(f"Configuration error - Engine: {self._conf.type} is not available for asyncio")
+        logger.debug(f"Setting up asyncio REST interface to the etcd server {self._conf.host}:{self._conf.port}")
+        # the module is imported only here as it requires aiohttp
+        from .async_etcd_rest_engine import AsyncEtcdRestEngine
+
+        try:
+            return AsyncEtcdRestEngine(config=self._conf, auth=self._auth)
+        except Exception as e:
+            raise EngineException(f"Error in creating the engine {AsyncEtcdRestEngine.__name__}: {e}")
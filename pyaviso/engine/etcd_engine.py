@@ -7,23 +7,36 @@
 # nor does it submit to any jurisdiction.
 
 import fcntl
+import itertools
 import json
 import os
-import time
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import CancelledError, Future
 from datetime import datetime
 from queue import Queue
-from typing import Any, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-from .. import HOME_FOLDER, logger
+from .. import HOME_FOLDER, exit_channel, logger
 from ..authentication.auth import Auth
 from ..custom_exceptions import EngineException, EngineHistoryNotAvailableError
 from ..user_config import EngineConfig
+from . import CheckpointMode, ListenMode
+from .checkpoint_store import CheckpointStore
 from .engine import DATE_FORMAT, Engine
+from .lease_pool import LeasePool
+from .polling_scheduler import PollingScheduler
+from .status_cache import StatusCache
 
 MAX_KV_RETURNED = 10000
+# max number of times the statuses are pushed again after being replaced by another client in the meantime
+MAX_STATUS_ATTEMPTS = 5
 LOCAL_STATE_FOLDER = "etcd/last"
 LAST_REVISION_FILE = "revision.json"
+# reserved prefix of the status index, outside the key space of the event types so it is never listened to. Readable
+# through aviso-auth as the base key it indexes
+STATUS_INDEX_PREFIX = "/aviso/index"
+STATUS_INDEX_FORMAT = "%Y%m%d%H"
 
 
 class EtcdEngine(Engine, ABC):
@@ -34,6 +47,14 @@ class EtcdEngine(Engine, ABC):
 
     def __init__(self, config: EngineConfig, auth: Auth):
         super(EtcdEngine, self).__init__(config, auth)
+        # statuses read at past revisions, shared with the other engines of the process talking to the same server
+        self._status_cache = StatusCache.get(self._server_id())
+        # last revision received for each key listened, shared with the other engines and processes
+        self._checkpoints = CheckpointStore.get(
+            commit_interval=config.checkpoint_interval, commit_count=config.checkpoint_count
+        )
+        # leases of the keys pushed with a TTL, shared by the keys expiring close to each other
+        self._lease_pool = LeasePool.get(self._server_id(), config.lease_window)
 
     @abstractmethod
     def _latest_revision(self, key: str) -> int:
@@ -52,6 +73,24 @@ class EtcdEngine(Engine, ABC):
         """
         pass
 
+    def _start_listening(
+        self, key: str, callback: callable([str, str]), from_date: datetime = None, to_date: datetime = None
+    ):
+        """
+        This method starts the listening of a key. When polling, the key is handled by the scheduler shared by all the
+        keys of the process once caught up, otherwise a thread is started to hold the stream of the key
+        :param key: key to listen to
+        :param callback: function to trigger in case of changes
+        :param from_date: date from when to request notifications, if None it will be from now
+        :param to_date: date until when to request notifications, if None it will be until now
+        """
+        if self.listen_mode == ListenMode.POLLING:
+            scheduler = PollingScheduler.get(self._polling_workers, self._delivery_workers)
+            # the catch-up may retry for as long as the server is unreachable, it does not hold the polling workers
+            scheduler.detach(key, self._polling, key, callback, exit_channel, from_date, to_date)
+        else:
+            super(EtcdEngine, self)._start_listening(key, callback, from_date, to_date)
+
     def _polling(
         self,
         key: str,
@@ -61,7 +100,7 @@ class EtcdEngine(Engine, ABC):
         to_date: datetime = None,
     ):
         """
-        This method implements the active polling
+        This method implements the listening to a key, by watching or polling the server depending on the listen mode
         :param key: key to watch as a prefix
         :param callback: function to call if any change happen
         :param channel: global communication channel among threads
@@ -70,16 +109,125 @@ class EtcdEngine(Engine, ABC):
         :return:
         """
 
-        def trigger_callback(notifications):
-            for notification in notifications:
+        listener = self._listener_names.get(key, "")
+        key_filter = self._key_filters.get(key)
+        lane = self._lanes.get(key)
+        # revision of the first notification whose trigger failed, the last revision saved does not move past it
+        failed_rev = None
+        # the triggers are executed in background if the engine has workers for them, in order for each listener or,
+        # if the listener has lanes, in order for each lane
+        executor = self._trigger_executor()
+        group = listener if listener else key
+        concurrency = (self._trigger_concurrency or 1) if lane is None else 1
+        # revisions of the notifications whose triggers are running in background, with their number, and the revision
+        # following the last notification delivered. The revision saved is the lowest one not yet triggered
+        running_revs: Dict[int, int] = {}
+        delivered_rev = None
+        saved_rev = None
+        checkpoint_lock = threading.Lock()
+
+        def run_callback(k: str, v: str) -> bool:
+            try:
+                callback(k, v)
+                return True
+            except Exception as err:
+                logger.error(f"Error with notification trigger: {err}")
+                logger.debug("", exc_info=True)
+                return False
+
+        def trigger_callback(notifications, wait: bool = True, track: bool = False) -> Optional[int]:
+            first_failed_rev = None
+            pending: List[Tuple[int, Optional[Future]]] = []
+            for notification in self._select(notifications, key_filter):
                 v = notification["value"].decode()
                 k = notification["key"]
                 logger.debug(f"Notification received for key {k}")
-                try:
-                    callback(k, v)
-                except Exception as err:
-                    logger.error(f"Error with notification trigger: {err}")
-                    logger.debug("", exc_info=True)
+                if executor is not None:
+                    k_group = group if lane is None else f"{group}/{lane(k)}"
+                    future = executor.submit(k_group, run_callback, k, v, limit=concurrency)
+                    if track:
+                        track_trigger(notification["mod_rev"], future)
+                    pending.append((notification["mod_rev"], future))
+                elif not run_callback(k, v):
+                    # the notifications are not in revision order
+                    if first_failed_rev is None or notification["mod_rev"] < first_failed_rev:
+                        first_failed_rev = notification["mod_rev"]
+            if wait:
+                # a notification dropped by the executor counts as failed
+                for mod_rev, future in pending:
+                    if not EtcdEngine._triggered(future):
+                        if first_failed_rev is None or mod_rev < first_failed_rev:
+                            first_failed_rev = mod_rev
+            return first_failed_rev
+
+        def track_trigger(mod_rev: int, future: Optional[Future]):
+            with checkpoint_lock:
+                running_revs[mod_rev] = running_revs.get(mod_rev, 0) + 1
+            if future is None:  # dropped by the executor
+                trigger_done(mod_rev, None)
+            else:
+                future.add_done_callback(lambda f: trigger_done(mod_rev, f))
+
+        def trigger_done(mod_rev: int, future: Optional[Future]):
+            nonlocal failed_rev
+            # a notification dropped by the executor counts as failed
+            triggered = EtcdEngine._triggered(future)
+            with checkpoint_lock:
+                running_revs[mod_rev] -= 1
+                if running_revs[mod_rev] == 0:
+                    del running_revs[mod_rev]
+                if not triggered and (failed_rev is None or mod_rev < failed_rev):
+                    if failed_rev is None:
+                        logger.warning(
+                            f"Trigger failed for key {key}, notifications will be received again from revision "
+                            f"{mod_rev} at the next start"
+                        )
+                    failed_rev = mod_rev
+                save_checkpoint()
+
+        def save_checkpoint():
+            nonlocal saved_rev
+            # called with the checkpoint lock held
+            if delivered_rev is None:
+                return
+            rev = min([delivered_rev, *running_revs])
+            if failed_rev is not None:
+                rev = min(rev, failed_rev)
+            if saved_rev is None or rev > saved_rev:
+                self._save_last_revision(rev, key, listener)
+                saved_rev = rev
+
+        def deliver(kvs, next_rev) -> int:
+            nonlocal failed_rev, delivered_rev
+            # update the current revision
+            for kv in kvs:
+                if next_rev < kv["mod_rev"] + 1:
+                    next_rev = kv["mod_rev"] + 1
+            if self.checkpoint_mode == CheckpointMode.RECEIVED:
+                # save current rev
+                self._save_last_revision(next_rev, key, listener)
+                # trigger the callback, without waiting for the triggers executed in background
+                trigger_callback(kvs, wait=False)
+            elif executor is not None:
+                # trigger the callback without waiting, the revision saved advances as the triggers complete
+                trigger_callback(kvs, wait=False, track=True)
+                with checkpoint_lock:
+                    delivered_rev = next_rev
+                    save_checkpoint()
+            elif failed_rev is None:
+                # trigger the callback and save current rev only if all the triggers succeeded
+                failed_rev = trigger_callback(kvs)
+                if failed_rev is None:
+                    self._save_last_revision(next_rev, key, listener)
+                else:
+                    logger.warning(
+                        f"Trigger failed for key {key}, notifications will be received again from revision "
+                        f"{failed_rev} at the next start"
+                    )
+                    self._save_last_revision(failed_rev, key, listener)
+            else:
+                trigger_callback(kvs)
+            return next_rev
 
         try:
             # initialise the revisions
@@ -90,14 +238,14 @@ class EtcdEngine(Engine, ABC):
                 if self.catchup is None:
                     raise EngineException("catchup not defined for notification engine")
                 if self.catchup:  # we start from the saved one
-                    saved_rev = self._last_saved_revision()
+                    saved_rev = self._last_saved_revision(key, listener)
                     if saved_rev != -1:
                         logger.info("Starting from last notification received")
                         next_rev = saved_rev
                     else:  # if it's the first time we start from now
                         next_rev = self._latest_revision(key) + 1
                 else:  # delete the saved state
-                    self._delete_saved_revision()
+                    self._delete_saved_revision(key, listener)
                     # we start from now
                     next_rev = self._latest_revision(key) + 1
 
@@ -118,14 +266,9 @@ class EtcdEngine(Engine, ABC):
             # check end date
             if to_date:  # end date defined, retrieve only past notifications
                 if final_rev:
-                    kvs = self.pull(key, min_rev=next_rev, max_rev=final_rev)
-                    # remove the status from the result
-                    for kv in kvs:
-                        if kv["key"] == key:  # this is the status
-                            kvs.remove(kv)
-                            break
-                    # trigger the callback
-                    trigger_callback(kvs)
+                    kvs = self.pull_iter(key, min_rev=next_rev, max_rev=final_rev)
+                    # trigger the callback as the notifications arrive, skipping the status
+                    trigger_callback(kv for kv in kvs if kv["key"] != key)
                 # de-register this pooling thread as we have finished
                 self.stop(key)
                 logger.info("Search and retrieval completed")
@@ -134,41 +277,132 @@ class EtcdEngine(Engine, ABC):
                     channel.put(True)
                     return
 
-            else:  # no end date defined, start the polling for new notifications
-                while key in self._listeners:  # this is the stop condition
-                    # retrieve any change since the last revision
-                    kvs = self.pull(key, min_rev=next_rev)
-                    # remove the status from the result
-                    for kv in kvs:
-                        if kv["key"] == key:  # this is the status
-                            kvs.remove(kv)
-                            break
-                    if len(kvs) > 0:
-                        # update the current revision
-                        for kv in kvs:
-                            if next_rev < kv["mod_rev"] + 1:
-                                next_rev = kv["mod_rev"] + 1
-                        # save current rev
-                        self._save_last_revision(next_rev)
-                        # trigger the callback
-                        trigger_callback(kvs)
-                    # wait the polling interval before trying again
-                    time.sleep(self._polling_interval)
+            else:  # no end date defined, start listening for new notifications
+                if self.listen_mode == ListenMode.WATCH:
+                    self._watch(key, next_rev, deliver)
+                else:
+                    self._poll(key, next_rev, deliver)
 
         except Exception as e:
             logger.error(f"Error while listening to key {key}: {e}")
             logger.debug("", exc_info=True)
             channel.put(False)
 
-    def _last_saved_revision(self) -> int:
+    @staticmethod
+    def _triggered(future: Optional[Future]) -> bool:
+        """
+        This method waits for the triggers of a notification executed in background
+        :param future: future of the execution, None if the notification has been dropped
+        :return: True if the triggers have succeeded
+        """
+        if future is None:
+            return False
+        try:
+            return future.result()
+        except CancelledError:
+            return False
+
+    def _poll(self, key: str, next_rev: int, deliver: callable([List[Dict[str, any]], int])):
         """
-        This method is used to read the last revision saved to file in the home folder
+        This method registers the key with the polling scheduler, that queries the server for the changes of the key
+        every polling interval until the key is removed from the listeners. The interval adapts to the activity of the
+        key as defined by its polling policy. The changes are delivered outside the polling workers, and the key is
+        polled again only once they have been delivered. It returns without waiting
+        :param key: key to poll as a prefix
+        :param next_rev: first revision to retrieve
+        :param deliver: function delivering a batch of key-values and returning the next revision to retrieve
+        """
+        stop = self._listeners.get(key)
+        if stop is None:  # already stopped
+            return
+        policy = self._polling_policies.get(key) or self._polling_policy()
+
+        scheduler = PollingScheduler.get(self._polling_workers, self._delivery_workers)
+
+        def poll_once():
+            try:
+                # retrieve any change since the last revision, skipping the status
+                changes = (kv for kv in self.pull_iter(key, min_rev=next_rev) if kv["key"] != key)
+                first = next(changes, None)
+            except Exception as e:
+                logger.error(f"Error while listening to key {key}: {e}")
+                logger.debug("", exc_info=True)
+                exit_channel.put(False)
+                return None
+            if first is None:
+                # wait the polling interval before trying again
+                return policy.next(0)
+            # the triggers may take long, they are executed in a thread of the key while the other keys keep polling
+            scheduler.detach(key, deliver_all, itertools.chain([first], changes))
+            return None
+
+        def deliver_all(changes):
+            nonlocal next_rev
+            received = 0
+            try:
+                # deliver the changes in batches to keep the memory bounded
+                kvs = []
+                for kv in changes:
+                    kvs.append(kv)
+                    received += 1
+                    if len(kvs) == MAX_KV_RETURNED:
+                        next_rev = deliver(kvs, next_rev)
+                        kvs = []
+                if len(kvs) > 0:
+                    next_rev = deliver(kvs, next_rev)
+            except Exception as e:
+                logger.error(f"Error while listening to key {key}: {e}")
+                logger.debug("", exc_info=True)
+                exit_channel.put(False)
+                return
+            # wait the polling interval before trying again, shorter if the key is busy
+            scheduler.schedule(key, poll_once, stop, policy.next(received))
+
+        scheduler.schedule(key, poll_once, stop)
+
+    def _watch(self, key: str, next_rev: int, deliver: callable([List[Dict[str, any]], int])):
+        """
+        This method receives the changes of the key from a server stream, until the key is removed from the listeners.
+        Engines not able to stream the changes fall back on the polling
+        :param key: key to watch as a prefix
+        :param next_rev: first revision to retrieve
+        :param deliver: function delivering a batch of key-values and returning the next revision to retrieve
+        """
+        logger.debug(f"Watch not available for {type(self).__name__}, polling key {key}")
+        self._poll(key, next_rev, deliver)
+
+    def _last_saved_revision(self, key: str = "", listener: str = "") -> int:
+        """
+        This method is used to read the last revision saved for a key listened. A listener changed since its last run
+        starts from the newest revision saved for the same key by any listener, while the revision saved in the single
+        file of the previous versions is used until the first revision is saved for the server
+        :param key: key listened
+        :param listener: name of the listener
         :return: last revision or -1 if no revision could be read
         """
-        # build the path where the last revision is saved
+        last_rev = self._checkpoints.revision(self._server_id(), listener, key)
+        if last_rev != -1:
+            logger.debug(f"Last revision saved for key {key} is {last_rev}")
+            return last_rev
+
+        latest = self._checkpoints.latest(self._server_id(), key)
+        if latest is not None:
+            other, last_rev = latest
+            logger.warning(
+                f"No revision saved for listener {listener} on key {key}, starting from the revision {last_rev} "
+                f"saved by listener {other}"
+            )
+            return last_rev
+        if self._checkpoints.saved(self._server_id()):
+            logger.warning(
+                f"No revision saved for key {key} while others are saved for the server, "
+                f"listener {listener} starts from now"
+            )
+
+        # build the path where the last revision was saved
         full_home_path = os.path.expanduser(HOME_FOLDER)
         full_rev_path = os.path.join(full_home_path, LOCAL_STATE_FOLDER, LAST_REVISION_FILE)
-        if os.path.exists(full_rev_path):
+        if os.path.exists(full_rev_path) and not self._checkpoints.saved(self._server_id()):
             try:
                 with open(full_rev_path, "r") as f:
                     # acquire a file lock to avoid concurrency among processes
@@ -186,11 +420,16 @@ class EtcdEngine(Engine, ABC):
         # default return
         return -1
 
-    def _delete_saved_revision(self):
+    def _delete_saved_revision(self, key: str = "", listener: str = ""):
         """
-        This method is used to delete the file where the last revision is saved
+        This method is used to delete the last revision saved for a key listened, together with the file where the
+        previous versions saved the last revision
+        :param key: key listened
+        :param listener: name of the listener
         """
-        # build the path where the last revision is saved
+        self._checkpoints.delete(self._server_id(), listener, key)
+
+        # build the path where the last revision was saved
         full_home_path = os.path.expanduser(HOME_FOLDER)
         full_state_path = os.path.join(full_home_path, LOCAL_STATE_FOLDER)
         full_rev_path = os.path.join(full_state_path, LAST_REVISION_FILE)
@@ -206,47 +445,28 @@ class EtcdEngine(Engine, ABC):
                     logger.debug("", exc_info=True)
                     return False
 
-    def _save_last_revision(self, rev: int) -> bool:
+    def _save_last_revision(self, rev: int, key: str = "", listener: str = "") -> bool:
         """
-        This method is used to save to file the revision passed as the last revision pulled
+        This method is used to save the revision passed as the last revision pulled for a key listened. The revision
+        is committed together with the ones saved in the meantime, see CheckpointStore
         :param rev: last revision to save
+        :param key: key listened
+        :param listener: name of the listener
         :return: True if saved otherwise False
         """
         if rev is not None:
-            rev_dict = {
-                "last_revision": rev,
-                "date_time": datetime.utcnow().strftime(DATE_FORMAT),
-                "server_host": self.host,
-                "server_port": self.port,
-            }
-            # build the path where the last revision will be saved
-            full_home_path = os.path.expanduser(HOME_FOLDER)
-            full_state_path = os.path.join(full_home_path, LOCAL_STATE_FOLDER)
-
-            with self._state_lock:  # multiple listing threads could access this simultaneously
-                if not os.path.exists(full_state_path):
-                    try:
-                        os.makedirs(full_state_path, exist_ok=True)
-                    except OSError:
-                        logger.warning(f"Cannot create the directory for the last revision: {full_state_path}")
-                        logger.debug("", exc_info=True)
-                        return False
-                try:
-                    full_rev_path = os.path.join(full_state_path, LAST_REVISION_FILE)
-                    with open(full_rev_path, "w") as f:
-                        # acquire a file lock to avoid concurrency among processes
-                        fcntl.lockf(f, fcntl.LOCK_EX)
-                        # write the revision in the file
-                        json.dump(rev_dict, f)
-                        # release file lock
-                        fcntl.lockf(f, fcntl.LOCK_UN)
-                    logger.debug(f"Last revision pulled {rev} has been successfully saved")
-                except Exception:
-                    logger.warning(f"Saving of the last revision has failed: {full_state_path}")
-                    logger.debug("", exc_info=True)
-                    return False
+            self._checkpoints.save(self._server_id(), listener, key, rev)
         return True
 
+    def _server_id(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def stop(self, key: str = None) -> bool:
+        stopped = super(EtcdEngine, self).stop(key)
+        # the revisions received so far are not left waiting for the next commit
+        self._checkpoints.flush()
+        return stopped
+
     def _retrieve_status_history(self, key, rev=None) -> Tuple[int, Any, int, Any]:
         """
         :param key: key for which to return the status
@@ -254,13 +474,20 @@ class EtcdEngine(Engine, ABC):
         :return: a tuple: status's revision, status's date, previous status's revision,
         revision of the last status of the previous day
         """
+        if rev is not None:  # a status at a past revision never changes
+            status = self._status_cache.status(key, rev)
+            if status is not None:
+                return status
         try:
             kvs = self.pull(key=key, prefix=False, rev=rev)
         # in case of retrieving a compacted revision we will get a 400 error with a proper reason
         except EngineHistoryNotAvailableError:
             logger.debug(f"Revision {rev} too old for current history")
+            self._status_cache.compacted(rev)
             return rev, None, rev, None  # return in a way that is clear that we arrived at the end of the history
 
+        if rev is None:  # the statuses cached have to belong to the history of the current one
+            self._status_cache.validate(key, kvs[0]["mod_rev"] if kvs else -1)
         # look inside what returned
         if len(kvs) == 0:
             return -1, None, -1, None
@@ -273,6 +500,8 @@ class EtcdEngine(Engine, ABC):
             s_prev_rev = -1  # this means that this is the first revision of the status. We cannot go further back
         s_date = datetime.strptime(s["date_time"], DATE_FORMAT)
         s_last_prev_day_rev = s.get("last_prev_day_rev")
+        if rev is not None:
+            self._status_cache.store(key, rev, (s_rev, s_date, s_prev_rev, s_last_prev_day_rev))
         return s_rev, s_date, s_prev_rev, s_last_prev_day_rev
 
     def _from_to_revisions(self, key: str, from_date: datetime, to_date: datetime = None) -> Tuple[Any, Any]:
@@ -314,7 +543,12 @@ class EtcdEngine(Engine, ABC):
                 to_rev = from_rev
                 return from_rev, to_rev
 
-        # if we have not returned yet search for older status revisions
+        # if we have not returned yet search for older status revisions, starting from the index if available
+        if self._status_index:
+            revisions = self._indexed_from_to_revisions(key, from_date, to_date, status_rev, status_date)
+            if revisions is not None:
+                return revisions
+            logger.debug(f"Status index not available for key {key}, navigating the whole history")
 
         # check if we are inside the interval
         if to_date and status_date < to_date:
@@ -354,6 +588,133 @@ class EtcdEngine(Engine, ABC):
 
         return from_rev, to_rev
 
+    def _indexed_from_to_revisions(
+        self, key: str, from_date: datetime, to_date: datetime, status_rev: int, status_date: datetime
+    ) -> Optional[Tuple[Any, Any]]:
+        """
+        This methods search for revisions corresponding to the interval (from_date, to_date) navigating the history
+        only from the first status of the hour following each date, as found in the status index
+        :param key:
+        :param from_date:
+        :param to_date:
+        :param status_rev: revision of the current status
+        :param status_date: date of the current status
+        :return: a tuple: revision just after from_date, revision just before to_date. None if the key is not indexed
+        """
+        try:
+            from_start_rev = self._status_index_start(key, from_date)
+            if from_start_rev == -1:
+                return None
+            to_start_rev = self._status_index_start(key, to_date) if to_date else None
+        except EngineException as e:
+            logger.debug(f"Cannot read the status index of key {key}: {e}")
+            return None
+
+        # check if we are inside the interval
+        to_rev = None
+        if to_date:
+            if status_date >= to_date:
+                status_rev, status_date = self._status_before(key, to_date, to_start_rev, inclusive=False)
+            if status_date is not None and status_date < to_date:
+                to_rev = status_rev
+
+        status_rev, status_date = self._status_before(key, from_date, from_start_rev)
+        if status_date is None or status_date <= from_date:  # we went out of the interval
+            # save the revision in from_rev but increment it so we stay just inside the interval
+            from_rev = status_rev + 1
+        else:  # it is the last point but we are inside the interval
+            from_rev = status_rev
+        if to_date and to_rev is None:  # this means there are no point inside the interval - limit case
+            logger.debug("No keys found")
+            return -1, -1
+
+        return from_rev, to_rev
+
+    def _status_before(self, key: str, date: datetime, rev: int = None, inclusive: bool = True) -> Tuple[int, Any]:
+        """
+        This method navigates the status history back from the status at rev to the last status before date
+        :param key: key for which to navigate the status history
+        :param date: date to reach
+        :param rev: revision of the status to start from, the current status if None
+        :param inclusive: if True a status at date is also considered before it
+        :return: a tuple: revision and date of the status found. If the history ends before date it is the last status
+        available, with date None if compacted
+        """
+        status_rev, status_date, status_prev_rev, status_last_prev_day_rev = self._retrieve_status_history(key, rev)
+        while (
+            status_date is not None
+            and (status_date > date if inclusive else status_date >= date)
+            and status_prev_rev != -1
+        ):
+            if status_date.date() == date.date():  # same day
+                # go back one revision
+                rev = status_prev_rev
+            elif status_last_prev_day_rev:
+                # go back to the revision of the last of the previous day -> we skip a day
+                rev = status_last_prev_day_rev
+            else:  # it is the last point of history
+                logger.warning("Reached the end of history available")
+                break
+            status_rev, status_date, status_prev_rev, status_last_prev_day_rev = self._retrieve_status_history(key, rev)
+        if status_date is None:  # we reached a compacted revision
+            logger.warning("Reached the end of history available")
+        return status_rev, status_date
+
+    def _status_index_start(self, key: str, date: datetime) -> Optional[int]:
+        """
+        This method looks up the status index for the first status pushed in an hour following date. The index is
+        searched in the day, the month and the year of date before being searched entirely
+        :param key: base key of the statuses
+        :param date: date to search from
+        :return: revision of the status found, None if no status is indexed after date, -1 if the key is not indexed
+        """
+        prefix = self._status_index_key(key)
+        hour = date.strftime(STATUS_INDEX_FORMAT)
+        kvs = []
+        for length in (8, 6, 4, 0):
+            kvs = self.pull(prefix + hour[:length], key_only=True)
+            # the bucket keys have a fixed width so they sort as their dates
+            buckets = sorted((kv["key"][len(prefix) :], kv["create_rev"]) for kv in kvs)
+            for bucket, rev in buckets:
+                if bucket > hour:
+                    # the bucket has been created together with the first status of its hour
+                    return rev
+        return None if kvs else -1
+
+    def _status_index_key(self, base_key: str, date: datetime = None) -> str:
+        """
+        :param base_key: base key of the statuses
+        :param date: date of the status
+        :return: key of the index bucket of the hour of date, the prefix of all the buckets of base_key if date is None
+        """
+        prefix = f"{STATUS_INDEX_PREFIX}{base_key.rstrip('/')}/"
+        return prefix + date.strftime(STATUS_INDEX_FORMAT) if date else prefix
+
+    def _status_index_kvs(
+        self, base_key: str, new_status: Dict[str, any], old_status_kvs: List[Dict[str, any]]
+    ) -> List[Dict[str, any]]:
+        """
+        The status index is made of a key per hour under the reserved prefix, created together with the first status of
+        that hour. The creation revision of the key is therefore the revision of that status. The key expires after the
+        TTL of the index, with its own lease whatever the TTL of the notifications pushed with it.
+        :param base_key: base key where the status is pushed
+        :param new_status: status about to be pushed
+        :param old_status_kvs: current status of the base key, if any
+        :return: the key of the hour of the new status if this is its first status, nothing otherwise
+        """
+        if not self._status_index:
+            return []
+        new_date_time = datetime.strptime(new_status["date_time"], DATE_FORMAT)
+        if len(old_status_kvs) == 1:
+            old_status = json.loads(old_status_kvs[0]["value"].decode())
+            old_date_time = datetime.strptime(old_status["date_time"], DATE_FORMAT)
+            if old_date_time.strftime(STATUS_INDEX_FORMAT) == new_date_time.strftime(STATUS_INDEX_FORMAT):
+                return []
+        kv = {"key": self._status_index_key(base_key, new_date_time), "value": new_status["date_time"]}
+        if self._status_index_ttl:
+            kv["lease"] = self._lease_pool.lease(self._status_index_ttl, self._lease)
+        return [kv]
+
     def _incr_last_byte(self, path: str) -> bytes:
         """
         This function determines the end of the range required for a range call with the etcd3 API
@@ -6,17 +6,24 @@
 # granted to it by virtue of its status as an intergovernmental organisation
 # nor does it submit to any jurisdiction.
 
-from typing import Dict, List
+import threading
+from queue import Empty, Queue
+from typing import Dict, Iterator, List
 
 import grpc
 from etcd3 import Etcd3Client, etcdrpc
+from etcd3.events import PutEvent
+from etcd3.exceptions import RevisionCompactedError
 
 from .. import logger
 from ..authentication.auth import Auth
 from ..authentication.etcd_auth import EtcdAuth
 from ..custom_exceptions import EngineException, EngineHistoryNotAvailableError
 from ..user_config import EngineConfig
-from .etcd_engine import MAX_KV_RETURNED, EtcdEngine
+from .etcd_engine import MAX_KV_RETURNED, MAX_STATUS_ATTEMPTS, EtcdEngine
+
+# seconds between consecutive checks of the stop condition while waiting for changes
+WATCH_STOP_CHECK = 1
 
 
 class EtcdGrpcEngine(EtcdEngine):
@@ -27,6 +34,8 @@ class EtcdGrpcEngine(EtcdEngine):
 
     def __init__(self, config: EngineConfig, auth: Auth):
         super(EtcdGrpcEngine, self).__init__(config, auth)
+        # this is used to synchronise multiple watching threads re-initialising the server
+        self._server_lock = threading.Lock()
         self._initialise_server()
         self._listening_list = []
         # set base url
@@ -60,6 +69,30 @@ class EtcdGrpcEngine(EtcdEngine):
         :param max_rev: if provided it filters for only KV pairs with mod_revision <= to max_rev
         :return: List of key-value pairs formatted as dictionary
         """
+        return list(self.pull_iter(key, key_only=key_only, rev=rev, prefix=prefix, min_rev=min_rev, max_rev=max_rev))
+
+    def pull_iter(
+        self,
+        key: str,
+        key_only: bool = False,
+        rev: int = None,
+        prefix: bool = True,
+        min_rev: int = None,
+        max_rev: int = None,
+        page_size: int = MAX_KV_RETURNED,
+    ) -> Iterator[Dict[str, any]]:
+        """
+        This method implements the same query of pull but it requests the key-values to the server in pages of
+        page_size elements and yields them as soon as decoded. All pages are read from the same revision of the server
+        :param key: input in the query
+        :param key_only: if True no values are returned
+        :param rev: revision to pull
+        :param prefix: if true the function will retrieve all the KV pairs starting with the key passed
+        :param min_rev: if provided it filters for only KV pairs with mod_revision >= to min_rev
+        :param max_rev: if provided it filters for only KV pairs with mod_revision <= to max_rev
+        :param page_size: max number of key-values requested to the server at each call
+        :return: iterator over the key-value pairs formatted as dictionary
+        """
         logger.debug(f"Calling pull for {key}...")
 
         # determine the range_end
@@ -73,13 +106,42 @@ class EtcdGrpcEngine(EtcdEngine):
             key=key, range_end=range_end, sort_order="descend", sort_target="key", keys_only=key_only
         )
 
-        range_request.limit = MAX_KV_RETURNED
+        range_request.limit = page_size
         if rev:
             range_request.revision = rev
         if min_rev:
             range_request.min_mod_revision = min_rev
         if max_rev:
             range_request.max_mod_revision = max_rev
+
+        n_kvs = 0
+        while True:
+            range_result = self._range(key, range_request)
+
+            # parse the result to return just key-value pairs
+            for kv in range_result.kvs:
+                new_kv = self._parse_raw_kv(kv, key_only)
+                n_kvs += 1
+                logger.debug(f"Key: {new_kv['key']} pulled successfully")
+                yield new_kv
+
+            if not prefix or not range_result.more or len(range_result.kvs) == 0:
+                break
+            # next page holds the keys preceding the last one received, from the same revision of the first page
+            range_request.range_end = range_result.kvs[-1].key
+            if not range_request.revision:
+                range_request.revision = range_result.header.revision
+            logger.debug(f"More keys available for {key}, requesting next page at revision {range_request.revision}")
+
+        logger.debug(f"{n_kvs} keys found")
+
+    def _range(self, key: str, range_request):
+        """
+        This method executes a range request, re-initialising the connection if the token has expired
+        :param key: key of the request, used for logging
+        :param range_request: range request to execute
+        :return: the range response
+        """
         # make the call
         logger.debug(f"Pull request: {range_request}")
         try_again = True
@@ -105,17 +167,7 @@ class EtcdGrpcEngine(EtcdEngine):
                 else:
                     raise EngineException(e)
         logger.debug(f"Query for {key} completed")
-
-        # parse the result to return just key-value pairs
-        new_kvs: List[Dict[str, bytes]] = []
-        logger.debug("Building key-value list")
-        for kv in range_result.kvs:
-            new_kv = self._parse_raw_kv(kv, key_only)
-            new_kvs.append(new_kv)
-            logger.debug(f"Key: {new_kv['key']} pulled successfully")
-
-        logger.debug(f"{len(new_kvs)} keys found")
-        return new_kvs
+        return range_result
 
     def delete(self, key: str, prefix: bool = True) -> List[Dict[str, bytes]]:
         """
@@ -171,19 +223,99 @@ class EtcdGrpcEngine(EtcdEngine):
     def push(self, kvs: List[Dict[str, any]], ks_delete: List[str] = None, ttl: int = None) -> bool:
         """
         Method to submit a list of key-value pairs and delete a list of keys from the server as a single transaction
-        :param kvs: List of KV pair
+        :param kvs: List of KV pair, a pair can carry its own lease
         :param ks_delete: List of keys to delete before the push of the new ones. Note that each key is read as a folder
         :param ttl: time to leave of the keys pushed, once expired the keys will be deleted
         :return: True if successful
         """
         logger.debug("Calling push...")
+        txn_response = self._txn(kvs, ks_delete, ttl)
+        assert txn_response.succeeded, "Not able to execute the transaction"
+        return True
+
+    def _push_with_statuses(
+        self,
+        kvs: List[Dict[str, any]],
+        statuses: Dict[str, str],
+        admin_keys: List[str],
+        ks_delete: List[str] = None,
+        ttl: int = None,
+    ) -> bool:
+        """
+        This method pushes the key-value pairs and the statuses in a single transaction, linking each status to the
+        current one as last known by the process, see EtcdRestEngine._push_with_statuses. The transaction compares the
+        MOD revision of each status and, if another client has replaced it in the meantime, it returns the current one
+        so that the push is attempted again linking to it.
+        :param kvs: List of KV pair
+        :param statuses: message of the status to push for each base key
+        :param admin_keys: admin keys to push together with the statuses
+        :param ks_delete: List of keys to delete before the push of the new ones. Note that each key is read as a folder
+        :param ttl: time to leave of the keys pushed, once expired the keys will be deleted
+        :return: True if successful
+        """
+        logger.debug("Calling push with status...")
+        admin_kvs = [{"key": admin_key, "value": "None"} for admin_key in admin_keys]
+        old_statuses = {base_key: self._status_cache.current(base_key) for base_key in statuses}
+        for attempt in range(MAX_STATUS_ATTEMPTS):
+            status_kvs = []
+            new_statuses = {}
+            compare = []
+            failure = []
+            for base_key, message in statuses.items():
+                if old_statuses[base_key] is None:  # never seen by the process
+                    old_statuses[base_key] = self.pull(base_key, prefix=False)
+                base_kvs = self._status_kvs(base_key, message, old_statuses[base_key])
+                status_kvs.extend(base_kvs)
+                new_statuses[base_key] = base_kvs[-1]
+                # the current status is still the one linked, a missing key has revision 0
+                mod_rev = old_statuses[base_key][0]["mod_rev"] if old_statuses[base_key] else 0
+                compare.append(
+                    etcdrpc.Compare(
+                        key=base_key.encode(),
+                        result=etcdrpc.Compare.EQUAL,
+                        target=etcdrpc.Compare.MOD,
+                        mod_revision=mod_rev,
+                    )
+                )
+                # otherwise return the current status
+                failure.append(etcdrpc.RequestOp(request_range=etcdrpc.RangeRequest(key=base_key.encode())))
+            txn_response = self._txn(kvs + status_kvs + admin_kvs, ks_delete, ttl, compare, failure)
+            if txn_response.succeeded:
+                rev = int(txn_response.header.revision)
+                for base_key, kv in new_statuses.items():
+                    status = [{"key": base_key, "value": kv["value"].encode(), "mod_rev": rev}]
+                    self._status_cache.set_current(base_key, status)
+                return True
+            for base_key, resp in zip(new_statuses, txn_response.responses):
+                old_statuses[base_key] = [self._parse_raw_kv(kv) for kv in resp.response_range.kvs]
+                self._status_cache.set_current(base_key, old_statuses[base_key])
+            logger.debug("Status replaced by another client, pushing again")
+        raise EngineException("Not able to execute the transaction, the status is being replaced by other clients")
+
+    def _txn(
+        self,
+        kvs: List[Dict[str, any]],
+        ks_delete: List[str] = None,
+        ttl: int = None,
+        compare: List[etcdrpc.Compare] = None,
+        failure: List[etcdrpc.RequestOp] = None,
+    ) -> etcdrpc.TxnResponse:
+        """
+        :param kvs: List of KV pair, a pair can carry its own lease
+        :param ks_delete: List of keys to delete before the push of the new ones. Note that each key is read as a folder
+        :param ttl: time to leave of the keys pushed, once expired the keys will be deleted
+        :param compare: conditions of the transaction, the keys are pushed only if all of them hold
+        :param failure: operations executed if any of the conditions does not hold
+        :return: the response of the transaction
+        """
         logger.debug("Preparing the transaction statement")
         ops = []
 
-        # check if we need to request a lease for the ttl
+        # check if we need a lease for the ttl, shared with the keys expiring at the same time
+        lease = None
         if ttl:
             try:
-                lease = self._lease(ttl)
+                lease = self._lease_pool.lease(ttl, self._lease)
             except EngineException:
                 raise EngineException("Not able to push keys")
 
@@ -201,12 +333,12 @@ class EtcdGrpcEngine(EtcdEngine):
             k = kv["key"]
             v = kv["value"]
             put = self._server._build_put_request(k, v)
-            if ttl:
-                put.lease = lease
+            if kv.get("lease", lease):
+                put.lease = kv.get("lease", lease)
             request_op = etcdrpc.RequestOp(request_put=put)
             ops.append(request_op)
 
-        transaction_request = etcdrpc.TxnRequest(success=ops)
+        transaction_request = etcdrpc.TxnRequest(compare=compare, success=ops, failure=failure)
 
         # commit transaction
         # logger.debug(f"Committing the transaction statement: {ops}")
@@ -227,8 +359,10 @@ class EtcdGrpcEngine(EtcdEngine):
                     logger.debug(f"Error {e}, trying again", exc_info=True)
                     self._initialise_server()
                 else:
+                    # the leases could be unknown to the server, new ones are granted next time
+                    for txn_lease in {kv.get("lease", lease) for kv in kvs} - {None}:
+                        self._lease_pool.discard(txn_lease)
                     raise e
-        assert txn_response.succeeded, "Not able to execute the transaction"
         logger.debug("Transaction completed")
         # read the header
         if hasattr(txn_response, "header"):
@@ -236,7 +370,7 @@ class EtcdGrpcEngine(EtcdEngine):
             rev = int(h.revision)
             logger.debug(f"New server revision {rev}")
 
-        return True
+        return txn_response
 
     def lock(self, lock_id: str):
         """
@@ -367,6 +501,88 @@ class EtcdGrpcEngine(EtcdEngine):
         else:
             raise EngineException("Not able to acquire lease")
 
+    def _watch(self, key: str, next_rev: int, deliver: callable([List[Dict[str, any]], int])):
+        """
+        This method receives the changes of the key from the etcd Watch stream, until the key is removed from the
+        listeners. The watches of all the keys are multiplexed on the single stream of the client. The watch starts
+        from next_rev therefore the changes missed are received first. If the stream breaks the watch is created again
+        from the last revision received, if this revision has been compacted it resumes from the oldest one available
+        :param key: key to watch as a prefix
+        :param next_rev: first revision to retrieve
+        :param deliver: function delivering a batch of key-values and returning the next revision to retrieve
+        """
+        # the responses are handed over by the client thread, the callback is therefore executed by this thread
+        responses = Queue()
+        watch_id = None
+        server = None
+        try:
+            while key in self._listeners:  # this is the stop condition
+                if watch_id is None:
+                    server = self._server
+                    try:
+                        watch_id = server.add_watch_callback(
+                            key, responses.put, range_end=self._incr_last_byte(key), start_revision=next_rev
+                        )
+                        logger.debug(f"Watch {watch_id} created for key {key} from revision {next_rev}")
+                    except RevisionCompactedError as e:
+                        logger.warning(f"History compacted, watching key {key} from revision {e.compacted_revision}")
+                        next_rev = e.compacted_revision
+                        self._status_cache.compacted(next_rev - 1)
+                        continue
+                    except Exception as e:
+                        self._watch_error(server, key, e)
+                        continue
+
+                try:
+                    response = responses.get(timeout=WATCH_STOP_CHECK)
+                except Empty:
+                    continue
+
+                if isinstance(response, RevisionCompactedError):
+                    # the watch has been cancelled by the server
+                    logger.warning(f"History compacted, watching key {key} from revision {response.compacted_revision}")
+                    next_rev = response.compacted_revision
+                    self._status_cache.compacted(next_rev - 1)
+                    watch_id = None
+                elif isinstance(response, Exception):
+                    # the stream is broken, the client has dropped all its watches
+                    watch_id = None
+                    self._watch_error(server, key, response)
+                else:
+                    kvs = []
+                    for event in response.events:
+                        # the status and the deletions are not notifications
+                        if isinstance(event, PutEvent) and event.key.decode() != key:
+                            kvs.append(self._parse_raw_kv(event))
+                        next_rev = max(next_rev, event.mod_revision + 1)
+                    if len(kvs) > 0:
+                        next_rev = deliver(kvs, next_rev)
+        finally:
+            if watch_id is not None:
+                try:
+                    server.cancel_watch(watch_id)
+                except Exception:
+                    logger.debug(f"Not able to cancel watch {watch_id}", exc_info=True)
+
+    def _watch_error(self, server: Etcd3Client, key: str, err: Exception):
+        """
+        This method handles the errors of the Watch stream. If the token is expired the client is re-initialised, once
+        for all the watching threads, otherwise it waits before letting the caller try again
+        :param server: client in use when the error occurred
+        :param key: key watched
+        :param err: error received
+        """
+        code = err.code() if isinstance(err, grpc.RpcError) and hasattr(err, "code") else None
+        if code == grpc.StatusCode.UNAUTHENTICATED:
+            logger.debug(f"Error {err}, trying again", exc_info=True)
+            with self._server_lock:
+                if self._server is server:
+                    self._initialise_server()
+        else:
+            logger.warning(f"Watch of key {key} interrupted, trying again in {self.automatic_retry_delay}s...")
+            logger.debug(f"Watch error: {err}")
+            self._wait_stop(key, self.automatic_retry_delay)
+
     def _parse_raw_kv(self, kv, key_only: bool = False) -> Dict[str, any]:
         """
         Internal method to translate the kv pair coming from the etcd server into a dictionary that fits better this
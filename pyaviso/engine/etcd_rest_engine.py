@@ -8,18 +8,23 @@
 
 import base64
 import http.client
+import json
 import logging
+import socket
 import time
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
 import requests
+import urllib3
 
 from .. import logger
 from ..authentication.auth import Auth
 from ..authentication.etcd_auth import EtcdAuth
 from ..custom_exceptions import EngineException, EngineHistoryNotAvailableError
 from ..user_config import EngineConfig
-from .etcd_engine import MAX_KV_RETURNED, EtcdEngine
+from .etcd_engine import MAX_KV_RETURNED, MAX_STATUS_ATTEMPTS, EtcdEngine
+from .session_pool import SessionPool
+from .token_manager import TokenManager
 
 
 class EtcdRestEngine(EtcdEngine):
@@ -35,6 +40,15 @@ class EtcdRestEngine(EtcdEngine):
             self._base_url = f"https://{self._host}:{self._port}/v3/"
         else:
             self._base_url = f"http://{self._host}:{self._port}/v3/"
+        # connections are pooled and shared with any other engine talking to the same server
+        self._session = SessionPool.from_config(self._base_url, config)
+        # the token is cached and shared with any other engine authenticating the same user
+        if type(self.auth) == EtcdAuth:  # noqa: E721
+            self._token_manager = TokenManager.get(self._base_url, self.auth.username)
+        else:
+            self._token_manager = None
+        # watch streams currently open, by key
+        self._watch_streams: Dict[str, requests.Response] = {}
 
     def pull(
         self,
@@ -56,9 +70,31 @@ class EtcdRestEngine(EtcdEngine):
         :param max_rev: if provided it filters for only KV pairs with mod_revision <= to max_rev
         :return: List of key-value pairs formatted as dictionary
         """
-        logger.debug(f"Calling pull for {key}...")
+        return list(self.pull_iter(key, key_only=key_only, rev=rev, prefix=prefix, min_rev=min_rev, max_rev=max_rev))
 
-        url = self._base_url + "kv/range"
+    def pull_iter(
+        self,
+        key: str,
+        key_only: bool = False,
+        rev: int = None,
+        prefix: bool = True,
+        min_rev: int = None,
+        max_rev: int = None,
+        page_size: int = MAX_KV_RETURNED,
+    ) -> Iterator[Dict[str, any]]:
+        """
+        This method implements the same query of pull but it requests the key-values to the server in pages of
+        page_size elements and yields them as soon as decoded. All pages are read from the same revision of the server
+        :param key: input in the query
+        :param key_only: if True no values are returned
+        :param rev: revision to pull
+        :param prefix: if true the function will retrieve all the KV pairs starting with the key passed
+        :param min_rev: if provided it filters for only KV pairs with mod_revision >= to min_rev
+        :param max_rev: if provided it filters for only KV pairs with mod_revision <= to max_rev
+        :param page_size: max number of key-values requested to the server at each call
+        :return: iterator over the key-value pairs formatted as dictionary
+        """
+        logger.debug(f"Calling pull for {key}...")
 
         # determine the range_end
         if prefix:
@@ -72,25 +108,55 @@ class EtcdRestEngine(EtcdEngine):
         # encode key
         encoded_key = self._encode_to_str_base64(key)
 
-        # create the body for the get range on the etcd sever, order them newest first
-        body = {
-            "key": encoded_key,
-            "range_end": range_end,
-            "limit": MAX_KV_RETURNED,
-            "sort_order": "DESCEND",
-            "sort_target": "KEY",
-            "keys_only": key_only,
-            "revision": rev,
-            "min_mod_revision": min_rev,
-            "max_mod_revision": max_rev,
-        }
+        n_kvs = 0
+        while True:
+            # create the body for the get range on the etcd sever, order them newest first
+            body = {
+                "key": encoded_key,
+                "range_end": range_end,
+                "limit": page_size,
+                "sort_order": "DESCEND",
+                "sort_target": "KEY",
+                "keys_only": key_only,
+                "revision": rev,
+                "min_mod_revision": min_rev,
+                "max_mod_revision": max_rev,
+            }
+            resp_body = self._range(key, body)
+
+            # parse the result to return just key-value pairs
+            raw_kvs = resp_body.get("kvs", [])
+            for kv in raw_kvs:
+                new_kv = self._parse_raw_kv(kv, key_only)
+                n_kvs += 1
+                logger.debug(f"Key: {new_kv['key']} pulled successfully")
+                yield new_kv
+
+            if not prefix or not resp_body.get("more") or len(raw_kvs) == 0:
+                break
+            # next page holds the keys preceding the last one received, from the same revision of the first page
+            range_end = raw_kvs[-1]["key"]
+            if not rev:
+                rev = int(resp_body["header"]["revision"])
+            logger.debug(f"More keys available for {key}, requesting next page at revision {rev}")
+
+        logger.debug(f"{n_kvs} keys found")
+
+    def _range(self, key: str, body: Dict[str, any]) -> Dict[str, any]:
+        """
+        This method executes a range request, retrying until the server is reachable
+        :param key: key of the request, used for logging
+        :param body: body of the range request
+        :return: the response body
+        """
+        url = self._base_url + "kv/range"
         # make the call
         logger.debug(f"Pull request: {body}")
 
         # start an infinite loop of request if the server side is unreachable
         while True:
             try:
-                resp = requests.post(url, json=body, headers=self.auth.header(), timeout=self.timeout)
+                resp = self._post(url, body)
                 resp.raise_for_status()
             except requests.exceptions.HTTPError as err:
                 if (
@@ -124,19 +190,146 @@ class EtcdRestEngine(EtcdEngine):
             break
 
         logger.debug(f"Query for {key} completed")
+        return resp.json()
 
-        # parse the result to return just key-value pairs
-        new_kvs: List[Dict[str, bytes]] = []
-        resp_body = resp.json()
-        if "kvs" in resp_body:
-            logger.debug("Building key-value list")
-            for kv in resp_body["kvs"]:
-                new_kv = self._parse_raw_kv(kv, key_only)
-                new_kvs.append(new_kv)
-                logger.debug(f"Key: {new_kv['key']} pulled successfully")
+    def _watch(self, key: str, next_rev: int, deliver: callable([List[Dict[str, any]], int])):
+        """
+        This method receives the changes of the key from the watch stream of the gRPC gateway, until the key is removed
+        from the listeners. The stream is a long-lived response made of newline-delimited JSON messages, parsed as they
+        arrive. The watch starts from next_rev therefore the changes missed are received first. Every time the stream
+        is interrupted it is opened again from the last revision received. If the server does not provide the stream
+        this method falls back on the polling
+        :param key: key to watch as a prefix
+        :param next_rev: first revision to retrieve
+        :param deliver: function delivering a batch of key-values and returning the next revision to retrieve
+        """
+        url = self._base_url + "watch"
+        range_end = self._encode_to_str_base64(str(self._incr_last_byte(key), "utf-8"))
+        encoded_key = self._encode_to_str_base64(key)
+
+        while key in self._listeners:  # this is the stop condition
+            body = {
+                "create_request": {
+                    "key": encoded_key,
+                    "range_end": range_end,
+                    "start_revision": next_rev,
+                    "progress_notify": True,
+                }
+            }
+            logger.debug(f"Opening watch stream for key {key} from revision {next_rev}")
+            try:
+                self._authenticate()
+                resp = self._post(url, body, stream=True)
+                self._watch_streams[key] = resp
+                if resp.status_code in (404, 405, 501):
+                    logger.warning(f"Watch not available on {url}, polling key {key}")
+                    resp.close()
+                    return self._poll(key, next_rev, deliver)
+                resp.raise_for_status()
+                next_rev = self._read_watch_stream(key, resp, next_rev, deliver)
+            except EngineHistoryNotAvailableError as e:
+                logger.warning(f"History compacted, watching key {key} from revision {e.args[0]}")
+                next_rev = e.args[0]
+                self._status_cache.compacted(next_rev - 1)
+            except Exception as err:
+                if key not in self._listeners:
+                    break  # the stream has been closed by stop
+                if self._read_timed_out(err):
+                    # no changes for a while, the stream is opened again to detect stale connections
+                    logger.debug(f"Watch stream for key {key} idle, opening it again")
+                    continue
+                logger.warning(f"Watch of key {key} interrupted, trying again in {self.automatic_retry_delay}s...")
+                logger.debug(f"Watch error: {err}", exc_info=True)
+                self._wait_stop(key, self.automatic_retry_delay)
+            finally:
+                stream = self._watch_streams.pop(key, None)
+                if stream is not None:
+                    stream.close()
+
+    def _read_watch_stream(
+        self, key: str, resp: requests.Response, next_rev: int, deliver: callable([List[Dict[str, any]], int])
+    ) -> int:
+        """
+        This method parses the messages of a watch stream and delivers the changes of the key as they arrive
+        :param key: key watched
+        :param resp: streaming response
+        :param next_rev: first revision expected
+        :param deliver: function delivering a batch of key-values and returning the next revision to retrieve
+        :return: the revision to watch from if the stream is opened again
+        """
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            message = json.loads(line)
+            kvs, next_rev = self._watch_events(key, message, next_rev)
+            if len(kvs) > 0:
+                next_rev = deliver(kvs, next_rev)
+        # the server has closed the stream
+        return next_rev
+
+    def _watch_events(self, key: str, message: Dict[str, any], next_rev: int) -> Tuple[List[Dict[str, any]], int]:
+        """
+        This method parses a message of a watch stream
+        :param key: key watched
+        :param message: message decoded from the stream
+        :param next_rev: first revision expected
+        :return: the key-values changed, the status excluded, and the revision to watch from if the stream is opened
+        again
+        """
+        if "error" in message:
+            raise EngineException(f"Watch of key {key} failed, {message['error'].get('message')}")
+        result = message.get("result", {})
+        if int(result.get("compact_revision", 0)) > 0:
+            # the watch has been cancelled by the server
+            raise EngineHistoryNotAvailableError(int(result["compact_revision"]))
+        if result.get("canceled"):
+            raise EngineException(f"Watch of key {key} cancelled by the server, {result.get('cancel_reason')}")
+        kvs = []
+        for event in result.get("events", []):
+            next_rev = max(next_rev, int(event["kv"]["mod_revision"]) + 1)
+            # deletions are not notifications, their kv has only key and revision
+            if event.get("type", "PUT") != "PUT":
+                continue
+            kv = self._parse_raw_kv(event["kv"])
+            if kv["key"] != key:  # this is the status
+                kvs.append(kv)
+        return kvs, next_rev
+
+    @staticmethod
+    def _read_timed_out(err: Exception) -> bool:
+        """
+        :param err: error raised while reading a streaming response
+        :return: True if no data has been received within the timeout
+        """
+        if isinstance(err, requests.exceptions.ReadTimeout):
+            return True
+        # requests reports a timeout while streaming the body as a connection error
+        return isinstance(err, requests.exceptions.ConnectionError) and any(
+            isinstance(arg, urllib3.exceptions.ReadTimeoutError) for arg in err.args
+        )
+
+    @staticmethod
+    def _interrupt_stream(stream: requests.Response):
+        """
+        This method unblocks the thread reading the stream. Closing the response would wait for the read in progress
+        to complete, the socket is shut down instead
+        :param stream: streaming response
+        """
+        try:
+            stream.raw.connection.sock.shutdown(socket.SHUT_RDWR)
+        except (AttributeError, OSError):
+            logger.debug("Not able to shut down the watch stream", exc_info=True)
 
-        logger.debug(f"{len(new_kvs)} keys found")
-        return new_kvs
+    def _remove_listener(self, key: str):
+        super(EtcdRestEngine, self)._remove_listener(key)
+        stream = self._watch_streams.get(key)
+        if stream is not None:
+            self._interrupt_stream(stream)
+
+    def _remove_all_listeners(self):
+        super(EtcdRestEngine, self)._remove_all_listeners()
+        for stream in list(self._watch_streams.values()):
+            self._interrupt_stream(stream)
 
     def delete(self, key: str, prefix: bool = True) -> List[Dict[str, bytes]]:
         """
@@ -166,7 +359,7 @@ class EtcdRestEngine(EtcdEngine):
         # make the call
         logger.debug(f"Deleting key range associated to key {key}")
         try:
-            resp = requests.post(url, json=body, headers=self.auth.header(), timeout=self.timeout)
+            resp = self._post(url, body)
             resp.raise_for_status()
         except Exception as err:
             raise EngineException(f"Not able to delete key {key}, {str(err)}")
@@ -199,10 +392,163 @@ class EtcdRestEngine(EtcdEngine):
         # first authenticate and use the token for the header
         self._authenticate()
 
-        # check if we need to request a lease for the ttl
-        if ttl:
-            lease = self._lease(ttl)
+        # check if we need a lease for the ttl, shared with the keys expiring at the same time
+        lease = self._lease_pool.lease(ttl, self._lease) if ttl else None
+
+        body = self._txn_body(kvs, ks_delete, lease)
+        self._commit_txn(url, body, lease)
+        return True
+
+    def _push_with_statuses(
+        self,
+        kvs: List[Dict[str, any]],
+        statuses: Dict[str, str],
+        admin_keys: List[str],
+        ks_delete: List[str] = None,
+        ttl: int = None,
+    ) -> bool:
+        """
+        This method pushes the key-value pairs and the statuses in a single transaction, linking each status to the
+        current one as last known by the process. The transaction succeeds only if the current statuses have not been
+        replaced in the meantime, otherwise it returns them and it is attempted again linking to them. A status is
+        therefore read only the first time it is pushed by the process or if another client has pushed it since.
+        :param kvs: List of KV pair
+        :param statuses: message of the status to push for each base key
+        :param admin_keys: admin keys to push together with the statuses
+        :param ks_delete: List of keys to delete before the push of the new ones. Note that each key is read as a folder
+        :param ttl: time to leave of the keys pushed, once expired the keys will be deleted
+        :return: True if successful
+        """
+        logger.debug("Calling push with status...")
+        url = self._base_url + "kv/txn"
+
+        # first authenticate and use the token for the header
+        self._authenticate()
+
+        # check if we need a lease for the ttl, shared with the keys expiring at the same time
+        lease = self._lease_pool.lease(ttl, self._lease) if ttl else None
+
+        old_statuses = {base_key: self._status_cache.current(base_key) for base_key in statuses}
+        for attempt in range(MAX_STATUS_ATTEMPTS):
+            for base_key, old_status_kvs in old_statuses.items():
+                if old_status_kvs is None:  # never seen by the process
+                    old_statuses[base_key] = self.pull(base_key, prefix=False)
+            body, new_statuses = self._status_txn_body(kvs, statuses, old_statuses, admin_keys, ks_delete, lease)
+            resp_body = self._commit_txn(url, body, lease)
+            old_statuses = self._status_txn_result(resp_body, new_statuses)
+            if old_statuses is None:
+                return True
+            logger.debug("Status replaced by another client, pushing again")
+        raise EngineException("Not able to execute the transaction, the status is being replaced by other clients")
+
+    def _status_txn_body(
+        self,
+        kvs: List[Dict[str, any]],
+        statuses: Dict[str, str],
+        old_statuses: Dict[str, List[Dict[str, any]]],
+        admin_keys: List[str],
+        ks_delete: List[str] = None,
+        lease: str = None,
+    ) -> Tuple[Dict[str, any], Dict[str, Dict[str, any]]]:
+        """
+        :param kvs: List of KV pair
+        :param statuses: message of the status to push for each base key
+        :param old_statuses: current status of each base key, empty if there is none
+        :param admin_keys: admin keys to push together with the statuses
+        :param ks_delete: List of keys to delete before the push of the new ones. Note that each key is read as a folder
+        :param lease: lease to attach to the keys pushed
+        :return: a tuple: body of the transaction request, new status key-value of each base key
+        """
+        status_kvs = []
+        new_statuses = {}
+        compares = []
+        failure = []
+        for base_key, message in statuses.items():
+            old_status_kvs = old_statuses[base_key]
+            base_kvs = self._status_kvs(base_key, message, old_status_kvs)
+            status_kvs.extend(base_kvs)
+            new_statuses[base_key] = base_kvs[-1]
+            # the current status is still the one linked, a missing key has revision 0
+            k = self._encode_to_str_base64(base_key)
+            mod_rev = old_status_kvs[0]["mod_rev"] if old_status_kvs else 0
+            compares.append({"key": k, "target": "MOD", "result": "EQUAL", "mod_revision": mod_rev})
+            # otherwise return the current status
+            failure.append({"requestRange": {"key": k}})
+        admin_kvs = [{"key": admin_key, "value": "None"} for admin_key in admin_keys]
+        body = self._txn_body(kvs + status_kvs + admin_kvs, ks_delete, lease)
+        body["compare"] = compares
+        body["failure"] = failure
+        return body, new_statuses
+
+    def _status_txn_result(
+        self, resp_body: Dict[str, any], new_statuses: Dict[str, Dict[str, any]]
+    ) -> Optional[Dict[str, List[Dict[str, any]]]]:
+        """
+        This method updates the current statuses known by the process with the result of a status transaction
+        :param resp_body: response of the transaction request
+        :param new_statuses: new status key-value of each base key, as pushed by the transaction
+        :return: None if the transaction succeeded, otherwise the current status of each base key
+        """
+        if resp_body.get("succeeded"):
+            rev = int(resp_body["header"]["revision"])
+            for base_key, kv in new_statuses.items():
+                status_kvs = [{"key": base_key, "value": kv["value"].encode(), "mod_rev": rev}]
+                self._status_cache.set_current(base_key, status_kvs)
+            return None
+        old_statuses = {}
+        for base_key, resp in zip(new_statuses, resp_body.get("responses", [])):
+            raw_kvs = resp.get("response_range", {}).get("kvs", [])
+            old_statuses[base_key] = [self._parse_raw_kv(kv) for kv in raw_kvs]
+            self._status_cache.set_current(base_key, old_statuses[base_key])
+        return old_statuses
+
+    def _commit_txn(self, url: str, body: Dict[str, any], lease: str = None) -> Dict[str, any]:
+        """
+        :param url: transaction endpoint
+        :param body: body of the transaction request
+        :param lease: lease attached to the keys pushed, if any
+        :return: body of the transaction response
+        """
+        # commit transaction
+        # logger.debug(f"Committing the transaction statement: {body}")
+        try:
+            resp = self._post(url, body)
+            resp.raise_for_status()
+        except Exception as err:
+            # the leases could be unknown to the server, new ones are granted next time
+            for txn_lease in self._txn_leases(body, lease):
+                self._lease_pool.discard(txn_lease)
+            raise EngineException(f"Not able to execute the transaction, {str(err)}")
+
+        logger.debug("Transaction completed")
+        resp_body = resp.json()
+        # read the header
+        if "header" in resp_body:
+            h = resp_body["header"]
+            rev = int(h["revision"])
+            logger.debug(f"New server revision {rev}")
+
+        return resp_body
+
+    @staticmethod
+    def _txn_leases(body: Dict[str, any], lease: str = None) -> Set[str]:
+        """
+        :param body: body of the transaction request
+        :param lease: lease attached to the keys pushed, if any
+        :return: all the leases attached to the keys of the transaction
+        """
+        leases = {op["requestPut"].get("lease") for op in body.get("success", []) if "requestPut" in op}
+        leases.add(lease)
+        leases.discard(None)
+        return leases
 
+    def _txn_body(self, kvs: List[Dict[str, any]], ks_delete: List[str] = None, lease: str = None) -> Dict[str, any]:
+        """
+        :param kvs: List of KV pair, a pair can carry its own lease
+        :param ks_delete: List of keys to delete before the push of the new ones. Note that each key is read as a folder
+        :param lease: lease to attach to the keys pushed
+        :return: body of the transaction request
+        """
         logger.debug("Preparing the transaction statement")
         ops = []
         # first delete the keys requested
@@ -219,50 +565,68 @@ class EtcdRestEngine(EtcdEngine):
             k = self._encode_to_str_base64(kv["key"])
             v = self._encode_to_str_base64(kv["value"])
             put = {"requestPut": {"key": k, "value": v}}
-            if ttl:
-                put["requestPut"]["lease"] = lease
+            if kv.get("lease", lease):
+                put["requestPut"]["lease"] = kv.get("lease", lease)
             ops.append(put)
 
-        body = {"success": ops}
-        # commit transaction
-        # logger.debug(f"Committing the transaction statement: {body}")
-        try:
-            resp = requests.post(url, json=body, headers=self.auth.header(), timeout=self.timeout)
-            resp.raise_for_status()
-        except Exception as err:
-            raise EngineException(f"Not able to execute the transaction, {str(err)}")
+        return {"success": ops}
 
-        logger.debug("Transaction completed")
-        resp_body = resp.json()
-        # read the header
-        if "header" in resp_body:
-            h = resp_body["header"]
-            rev = int(h["revision"])
-            logger.debug(f"New server revision {rev}")
+    def _authenticate(self) -> bool:
+        """
+        This method sets the internal token of the user, this is only done for Etcd authentication. The token is
+        requested to the server only if the cached one is expired or has been rejected
+        :return: True if successfully authenticated
+        """
+        if self._token_manager is not None:
+            self.auth.token = self._token_manager.token(self._request_token)
 
         return True
 
-    def _authenticate(self) -> bool:
+    def _request_token(self) -> str:
         """
-        This method authenticates  the user and set the internal token, this is only done for Etcd authentication
-        :return: True if successfully authenticated
+        This method authenticates the user against the server
+        :return: the new token
         """
-        if type(self.auth) == EtcdAuth:  # noqa: E721
-            logger.debug(f"Authenticating user {self.auth.username}...")
+        logger.debug(f"Authenticating user {self.auth.username}...")
 
-            url = self._base_url + "auth/authenticate"
-            body = {"name": self.auth.username, "password": self.auth.password}
-            try:
-                resp = requests.post(url, json=body, headers=self.auth.header(), timeout=self.timeout)
-                resp.raise_for_status()
-            except Exception as err:
-                raise EngineException(f"Not able to authenticate {self.auth.username}, {str(err)}")
-            assert resp.json().get("token") is not None, "No token found in authentication response"
-            self.auth.token = resp.json()["token"]
+        url = self._base_url + "auth/authenticate"
+        body = {"name": self.auth.username, "password": self.auth.password}
+        try:
+            resp = self._session.post(url, json=body, timeout=self.timeout)
+            resp.raise_for_status()
+        except Exception as err:
+            raise EngineException(f"Not able to authenticate {self.auth.username}, {str(err)}")
+        assert resp.json().get("token") is not None, "No token found in authentication response"
 
-            logger.debug(f"User {self.auth.username} successfully authenticated")
+        logger.debug(f"User {self.auth.username} successfully authenticated")
+        return resp.json()["token"]
 
-        return True
+    def _post(self, url: str, body: Dict[str, any], stream: bool = False) -> requests.Response:
+        """
+        This method sends the request with the authentication header. If the server rejects the token, this is renewed
+        and the request is sent once more
+        :param url: URL of the request
+        :param body: request body
+        :param stream: if True the response body is not read, this is left to the caller
+        :return: the server response
+        """
+        header = self.auth.header()
+        resp = self._session.post(url, json=body, headers=header, timeout=self.timeout, stream=stream)
+        if self._token_manager is not None and self._token_rejected(resp):
+            logger.debug(f"Token rejected for {url}, authenticating again")
+            resp.close()
+            self._token_manager.invalidate(header.get("Authorization"))
+            self._authenticate()
+            resp = self._session.post(url, json=body, headers=self.auth.header(), timeout=self.timeout, stream=stream)
+        return resp
+
+    @staticmethod
+    def _token_rejected(resp: requests.Response) -> bool:
+        """
+        :param resp: server response
+        :return: True if the request failed because of an invalid or expired token
+        """
+        return resp.status_code == 401 or (resp.status_code >= 400 and "invalid auth token" in resp.text)
 
     def _latest_revision(self, key: str) -> int:
         """
@@ -282,7 +646,7 @@ class EtcdRestEngine(EtcdEngine):
         # make the call
         while True:
             try:
-                resp = requests.post(url, json=body, headers=self.auth.header(), timeout=self.timeout)
+                resp = self._post(url, body)
                 resp.raise_for_status()
             except requests.exceptions.HTTPError as err:
                 if resp.status_code == 408 or (resp.status_code >= 500 and resp.status_code < 600):
@@ -336,7 +700,7 @@ class EtcdRestEngine(EtcdEngine):
 
         # make the call
         try:
-            resp = requests.post(url, json=body, headers=self.auth.header(), timeout=self.timeout)
+            resp = self._post(url, body)
             resp.raise_for_status()
         except Exception as err:
             raise EngineException(f"Not able to request a lease, {str(err)}")
@@ -228,7 +228,7 @@ class FileBasedEngine(Engine):
                 def on_modified(self, event):
                     if not event.is_directory:
                         kvs = self._engine.pull(key=event.src_path)
-                        for kv in kvs:
+                        for kv in self._engine._select(kvs, self._engine._key_filters.get(key)):
                             k = kv["key"]
                             v = kv["value"].decode()
                             if kv["key"].endswith("status"):
@@ -256,8 +256,7 @@ class FileBasedEngine(Engine):
             t.start()
 
             # Stop condition
-            while key in self._listeners:
-                time.sleep(0.1)
+            self._wait_stop(key)
             observer.stop()
             observer.join()
 
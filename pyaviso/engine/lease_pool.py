@@ -0,0 +1,168 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import math
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Optional, Tuple
+
+from .. import logger
+
+# keys pushed with a TTL expiring within this many seconds of each other share the same lease
+LEASE_WINDOW = 60  # seconds
+
+
+class LeasePool:
+    """
+    This class shares the leases of the keys pushed with a TTL, instead of granting a lease per push. The time is
+    divided in windows and the keys expiring in the same window are attached to the same lease, that expires at the end
+    of the window. A key therefore lives at least its TTL and at most one window longer. The lease of a window is
+    granted the first time a key expires in it and it is forgotten once expired, so the leases rotate as the time
+    passes. The pool is shared per server across the process.
+    """
+
+    _pools: Dict[Tuple[str, float], "LeasePool"] = {}
+    _pools_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, server: str, window: float = None) -> "LeasePool":
+        """
+        :param server: host and port of the server
+        :param window: seconds of the window sharing a lease, 0 to grant a lease per push
+        :return: the lease pool shared for this server and window
+        """
+        if window is None:
+            window = LEASE_WINDOW
+        with cls._pools_lock:
+            pool = cls._pools.get((server, window))
+            if pool is None:
+                pool = LeasePool(window)
+                cls._pools[(server, window)] = pool
+            return pool
+
+    @classmethod
+    def reset_all(cls):
+        """
+        Forget all the leases of the process, the leases granted expire on the server
+        """
+        with cls._pools_lock:
+            cls._pools.clear()
+
+    def __init__(self, window: float = LEASE_WINDOW):
+        """
+        :param window: seconds of the window sharing a lease, 0 to grant a lease per push
+        """
+        self.window = window
+        # lease of each window, with its expiry time
+        self._leases: Dict[int, Tuple[str, float]] = {}
+        # lease of each window being granted, awaited by the other pushes expiring in the window
+        self._granting: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        # metrics
+        self.grants = 0
+
+    @property
+    def live(self) -> int:
+        """
+        :return: number of leases of the pool not yet expired
+        """
+        with self._lock:
+            self._prune()
+            return len(self._leases)
+
+    def lease(self, ttl: int, grant: callable([int])) -> str:
+        """
+        :param ttl: time to live of the keys to push, in seconds
+        :param grant: function granting a lease on the server for the TTL passed and returning its id
+        :return: id of the lease to attach to the keys
+        """
+        with self._lock:
+            lease = self._cached(ttl)
+            if lease is not None:
+                return lease
+            window, lease_ttl = self.window_ttl(ttl)
+            granting = self._granting.get(window) if window is not None else None
+            if granting is None:
+                granting = Future()
+                if window is not None:
+                    self._granting[window] = granting
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            # the lease of this window is being granted by another push
+            return granting.result()
+
+        # the lease is granted out of the lock so that a slow grant does not hold the pushes to the other windows
+        try:
+            lease = grant(lease_ttl)
+        except BaseException as e:
+            with self._lock:
+                self._granting.pop(window, None)
+            granting.set_exception(e)
+            raise
+        with self._lock:
+            self._granting.pop(window, None)
+            self._add(window, lease, lease_ttl)
+        granting.set_result(lease)
+        return lease
+
+    def cached(self, ttl: int) -> Optional[str]:
+        """
+        :param ttl: time to live of the keys to push, in seconds
+        :return: id of the lease of the window where the keys expire, None if it has not been granted yet
+        """
+        with self._lock:
+            return self._cached(ttl)
+
+    def add(self, window: Optional[int], lease: str, lease_ttl: int):
+        """
+        :param window: window of the lease, as returned by window_ttl
+        :param lease: id of the lease granted
+        :param lease_ttl: TTL of the lease granted
+        """
+        with self._lock:
+            self._add(window, lease, lease_ttl)
+
+    def discard(self, lease: str):
+        """
+        Forget a lease, for instance because the server does not know it anymore
+        :param lease: id of the lease
+        """
+        with self._lock:
+            self._leases = {w: entry for w, entry in self._leases.items() if entry[0] != lease}
+
+    def window_ttl(self, ttl: int) -> Tuple[Optional[int], int]:
+        """
+        :param ttl: time to live of the keys to push, in seconds
+        :return: a tuple: window where the keys expire, None if the leases are not shared, and TTL of the lease to
+        grant for it
+        """
+        if not self.window:
+            return None, ttl
+        now = time.time()
+        window = math.ceil((now + ttl) / self.window)
+        return window, max(ttl, math.ceil(window * self.window - now))
+
+    def _cached(self, ttl: int) -> Optional[str]:
+        if not self.window:
+            return None
+        self._prune()
+        entry = self._leases.get(self.window_ttl(ttl)[0])
+        return entry[0] if entry else None
+
+    def _add(self, window: Optional[int], lease: str, lease_ttl: int):
+        self.grants += 1
+        if window is not None:
+            logger.debug(f"Lease {lease} shared by the keys expiring in the next {lease_ttl}s")
+            self._leases[window] = (lease, time.time() + lease_ttl)
+
+    def _prune(self):
+        now = time.time()
+        self._leases = {w: entry for w, entry in self._leases.items() if entry[1] > now}
@@ -0,0 +1,53 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import random
+
+BACKOFF_FACTOR = 2
+JITTER = 0.1
+
+
+class PollingPolicy:
+    """
+    This class decides how long to wait before polling a key again. The interval drops to the minimum as soon as a
+    poll returns notifications and grows exponentially, with some jitter, while the key is idle, up to the maximum.
+    When the minimum and the maximum are not defined the key is polled at a fixed interval.
+    """
+
+    def __init__(self, interval: float, min_interval: float = None, max_interval: float = None):
+        """
+        :param interval: interval before the first poll is repeated, in seconds
+        :param min_interval: interval used right after receiving notifications, in seconds
+        :param max_interval: interval reached after a long time without notifications, in seconds
+        """
+        if min_interval is None:
+            min_interval = interval if max_interval is None else min(interval, max_interval)
+        if max_interval is None:
+            max_interval = max(interval, min_interval)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        assert 0 < self.min_interval <= self.max_interval, "Polling interval bounds not valid"
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+
+    @property
+    def adaptive(self) -> bool:
+        return self.min_interval < self.max_interval
+
+    def next(self, received: int) -> float:
+        """
+        :param received: number of notifications returned by the last poll
+        :return: seconds to wait before the next poll
+        """
+        if not self.adaptive:
+            return self.interval
+        if received > 0:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * BACKOFF_FACTOR, self.max_interval)
+        # the jitter only shortens the wait, to spread the keys backing off together without exceeding the bounds
+        return max(self.interval * (1 - JITTER * random.random()), self.min_interval)
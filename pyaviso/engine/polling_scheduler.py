@@ -0,0 +1,225 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from queue import Queue
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from .. import logger
+
+DEFAULT_WORKERS = 8
+DEFAULT_DETACHED_WORKERS = 16
+
+
+class _Task:
+    """
+    Periodic task of a key. It is executed by one worker at a time, therefore the executions of the same key never
+    overlap
+    """
+
+    __slots__ = ("key", "run", "stop")
+
+    def __init__(self, key: str, run: Callable[[], Optional[float]], stop: threading.Event):
+        self.key = key
+        self.run = run
+        self.stop = stop
+
+
+class PollingScheduler:
+    """
+    This class schedules the polling of all the keys listened in the process. A single thread keeps the tasks in a heap
+    ordered by due time and hands them over to a small pool of workers doing the I/O. Each key is stopped by its own
+    event; a stopped task is dropped as soon as it is due, without waiting for the polling interval. The workers only
+    issue the polling requests, the longer executions of a key, as its catch-up or the triggers of its notifications,
+    are detached to a second pool of workers so that they never hold the polling of the other keys. The detached
+    executions of the same key are run one at a time, in order.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, detached_workers: int = DEFAULT_DETACHED_WORKERS):
+        """
+        :param workers: number of threads executing the tasks
+        :param detached_workers: number of threads executing the detached functions
+        """
+        self.workers = DEFAULT_WORKERS if workers is None else workers
+        self.detached_workers = DEFAULT_DETACHED_WORKERS if detached_workers is None else detached_workers
+        self._heap: List[Tuple[float, int, _Task]] = []
+        self._counter = itertools.count()  # tie-breaker for tasks due at the same time
+        self._cond = threading.Condition()
+        self._jobs = Queue()
+        # detached executions waiting for each key, a key is in the queue as long as it has any
+        self._detached: Dict[str, Deque[Tuple[Callable, Tuple]]] = {}
+        self._detached_keys = Queue()
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+
+    @classmethod
+    def get(cls, workers: int = None, detached_workers: int = None) -> "PollingScheduler":
+        """
+        :param workers: number of threads executing the tasks, used only when the scheduler is first created
+        :param detached_workers: number of threads executing the detached functions, as workers
+        :return: the scheduler shared across the process
+        """
+        with cls._instance_lock:
+            if cls._instance is None or cls._instance._closed:
+                cls._instance = PollingScheduler(workers, detached_workers)
+            return cls._instance
+
+    @classmethod
+    def reset(cls):
+        """
+        Shut down the shared scheduler. A new one is created on demand afterwards
+        """
+        with cls._instance_lock:
+            if cls._instance is not None:
+                cls._instance.shutdown()
+                cls._instance = None
+
+    def schedule(self, key: str, run: Callable[[], Optional[float]], stop: threading.Event, delay: float = 0):
+        """
+        This method registers a periodic task. The task returns the number of seconds to wait before its next
+        execution, or None when it has completed
+        :param key: key the task belongs to, used for logging
+        :param run: task to execute
+        :param stop: event stopping the task
+        :param delay: seconds to wait before the first execution
+        """
+        self._start()
+        self._push(_Task(key, run, stop), delay)
+
+    def detach(self, key: str, fn: Callable, *args):
+        """
+        This method executes a function once, outside the workers of the tasks. The detached executions of a key are
+        executed one at a time, in the order they are detached
+        :param key: key the execution belongs to
+        :param fn: function to execute
+        :param args: function arguments
+        """
+        self._start()
+        with self._cond:
+            if self._closed:
+                return
+            queue = self._detached.get(key)
+            if queue is not None:
+                queue.append((fn, args))
+                return
+            self._detached[key] = deque([(fn, args)])
+        self._detached_keys.put(key)
+
+    def pending(self) -> int:
+        """
+        :return: number of tasks waiting to be due, stopped tasks included until they are dropped
+        """
+        with self._cond:
+            return len(self._heap)
+
+    def shutdown(self):
+        """
+        This method stops the scheduling thread and the workers. The tasks in execution are completed
+        """
+        with self._cond:
+            self._closed = True
+            self._heap.clear()
+            self._cond.notify_all()
+            self._detached.clear()
+        for _ in range(self.workers):
+            self._jobs.put(None)
+        for _ in range(self.detached_workers):
+            self._detached_keys.put(None)
+        self._threads.clear()
+
+    def _start(self):
+        with self._cond:
+            if self._threads:
+                return
+            logger.debug(f"Starting polling scheduler with {self.workers} workers")
+            self._threads.append(threading.Thread(target=self._schedule_loop, name="aviso-scheduler", daemon=True))
+            for i in range(self.workers):
+                self._threads.append(threading.Thread(target=self._work_loop, name=f"aviso-worker-{i}", daemon=True))
+            for i in range(self.detached_workers):
+                self._threads.append(
+                    threading.Thread(target=self._detached_loop, name=f"aviso-detached-{i}", daemon=True)
+                )
+            for t in self._threads:
+                t.start()
+
+    def _push(self, task: _Task, delay: float):
+        with self._cond:
+            if self._closed or task.stop.is_set():
+                return
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), task))
+            # wake up the scheduling thread only if this is the new earliest task
+            if self._heap[0][2] is task:
+                self._cond.notify()
+
+    def _schedule_loop(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, _, task = self._heap[0]
+                now = time.monotonic()
+                if due > now:
+                    self._cond.wait(due - now)
+                    continue
+                heapq.heappop(self._heap)
+            if task.stop.is_set():
+                logger.debug(f"Polling of key {task.key} stopped")
+                continue
+            self._jobs.put((self._execute, (task,)))
+
+    def _work_loop(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:  # shutdown
+                return
+            fn, args = job
+            try:
+                fn(*args)
+            except Exception as e:
+                logger.error(f"Error in polling worker: {e}")
+                logger.debug("", exc_info=True)
+
+    def _detached_loop(self):
+        while True:
+            key = self._detached_keys.get()
+            if key is None:  # shutdown
+                return
+            with self._cond:
+                queue = self._detached.get(key)
+                if not queue:  # cleared by the shutdown
+                    continue
+                fn, args = queue[0]
+            try:
+                fn(*args)
+            except Exception as e:
+                logger.error(f"Error in detached execution of key {key}: {e}")
+                logger.debug("", exc_info=True)
+            with self._cond:
+                queue.popleft()
+                if queue and self._detached.get(key) is queue:
+                    # the next execution of the key waits for its turn after the other keys
+                    self._detached_keys.put(key)
+                elif self._detached.get(key) is queue:
+                    del self._detached[key]
+
+    def _execute(self, task: _Task):
+        if task.stop.is_set():
+            return
+        delay = task.run()
+        if delay is not None:
+            self._push(task, delay)
@@ -0,0 +1,106 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import threading
+from typing import Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .. import logger
+from ..user_config import EngineConfig
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 0.5
+
+
+class SessionPool:
+    """
+    This class holds the HTTP sessions shared across the process. Sessions are keyed by endpoint and pool settings,
+    therefore all the engines talking to the same server re-use the same pool of keep-alive connections.
+    Sessions are thread-safe for the way they are used by the engines and can be shared among polling threads.
+    """
+
+    _sessions: Dict[Tuple, requests.Session] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def session(
+        cls,
+        base_url: str,
+        pool_size: int = None,
+        keep_alive: bool = True,
+        max_retries: int = None,
+        retry_backoff: float = None,
+    ) -> requests.Session:
+        """
+        :param base_url: URL prefix the session is used for, connections are pooled per host
+        :param pool_size: max number of connections kept open towards the host
+        :param keep_alive: if False every request closes its connection once completed
+        :param max_retries: number of times a failed connection attempt is retried before raising
+        :param retry_backoff: backoff factor in seconds between consecutive connection attempts
+        :return: the session shared for these settings, created the first time it is requested
+        """
+        pool_size = DEFAULT_POOL_SIZE if pool_size is None else pool_size
+        max_retries = DEFAULT_MAX_RETRIES if max_retries is None else max_retries
+        retry_backoff = DEFAULT_RETRY_BACKOFF if retry_backoff is None else retry_backoff
+        session_key = (base_url, pool_size, keep_alive, max_retries, retry_backoff)
+        with cls._lock:
+            session = cls._sessions.get(session_key)
+            if session is None:
+                logger.debug(f"Creating HTTP session for {base_url} with pool size {pool_size}")
+                session = cls._create_session(pool_size, keep_alive, max_retries, retry_backoff)
+                cls._sessions[session_key] = session
+            return session
+
+    @classmethod
+    def from_config(cls, base_url: str, config: EngineConfig) -> requests.Session:
+        """
+        :param base_url: URL prefix the session is used for
+        :param config: engine configuration holding the pool settings
+        :return: the session shared for the engine configuration
+        """
+        return cls.session(
+            base_url,
+            pool_size=config.pool_size,
+            keep_alive=config.keep_alive,
+            max_retries=config.max_retries,
+            retry_backoff=config.retry_backoff,
+        )
+
+    @classmethod
+    def close_all(cls):
+        """
+        Close all the sessions and their connections. New sessions are created on demand afterwards
+        """
+        with cls._lock:
+            for session in cls._sessions.values():
+                session.close()
+            cls._sessions.clear()
+
+    @staticmethod
+    def _create_session(pool_size: int, keep_alive: bool, max_retries: int, retry_backoff: float) -> requests.Session:
+        # only the connection phase is retried here, HTTP errors are handled by the caller
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=retry_backoff,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if not keep_alive:
+            session.headers["Connection"] = "close"
+        return session
@@ -0,0 +1,249 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import fcntl
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .. import HOME_FOLDER, logger
+from .engine import DATE_FORMAT
+
+STATUS_CACHE_FOLDER = "etcd/status"
+# above this number of statuses the cache file is rewritten with the most recent ones only
+MAX_CACHED_STATUSES = 100000
+
+Status = Tuple[int, Any, int, Any]
+
+
+class StatusCache:
+    """
+    This class caches the statuses of the base keys as found at a given revision of the server. A status read at a
+    past revision never changes, so the history navigated once is not requested again, neither by the other listeners
+    of the process nor by the following runs. The cache is shared per server across the process and saved as a log of
+    JSON lines in the home folder, where the other processes append as well. The statuses older than the compaction
+    revision are discarded as soon as the server reports it, the ones of a key are discarded if its current status is
+    found older than them, as it happens when the server is re-created. The cache also keeps in memory the current
+    status of the keys last pushed, so that the next status can be linked to it without reading it again.
+    """
+
+    _caches: Dict[str, "StatusCache"] = {}
+    _caches_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, server: str) -> "StatusCache":
+        """
+        :param server: host and port of the server
+        :return: the status cache shared for this server
+        """
+        with cls._caches_lock:
+            cache = cls._caches.get(server)
+            if cache is None:
+                file_name = server.replace("/", "_").replace(":", "_") + ".jsonl"
+                path = os.path.join(os.path.expanduser(HOME_FOLDER), STATUS_CACHE_FOLDER, file_name)
+                cache = StatusCache(path)
+                cls._caches[server] = cache
+            return cache
+
+    @classmethod
+    def reset_all(cls):
+        """
+        Forget all the caches loaded by the process, the files are kept
+        """
+        with cls._caches_lock:
+            cls._caches.clear()
+
+    def __init__(self, path: str, max_statuses: int = MAX_CACHED_STATUSES):
+        """
+        :param path: file where the cache is saved
+        :param max_statuses: max number of statuses kept in the file
+        """
+        self.path = path
+        self.max_statuses = max_statuses
+        self._statuses: Dict[Tuple[str, int], Status] = {}
+        # most recent status revision cached for each key
+        self._last_status_revs: Dict[str, int] = {}
+        self._compact_rev = 0
+        # current status of each key as last pushed or read by the process, not saved to the file
+        self._current: Dict[str, List[Dict[str, any]]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        # metrics
+        self.hits = 0
+        self.misses = 0
+
+    def status(self, key: str, rev: int) -> Optional[Status]:
+        """
+        :param key: base key of the status
+        :param rev: revision at which the status is requested
+        :return: a tuple: status's revision, status's date, previous status's revision, revision of the last status of
+        the previous day. None if not cached
+        """
+        with self._lock:
+            self._load()
+            status = self._statuses.get((key, rev))
+            if status is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return status
+
+    def store(self, key: str, rev: int, status: Status):
+        """
+        :param key: base key of the status
+        :param rev: revision at which the status has been requested
+        :param status: a tuple: status's revision, status's date, previous status's revision, revision of the last
+        status of the previous day
+        """
+        with self._lock:
+            self._load()
+            if rev <= self._compact_rev or (key, rev) in self._statuses:
+                return
+            self._add(key, rev, status)
+            self._append(self._entry(key, rev, status))
+
+    def current(self, key: str) -> Optional[List[Dict[str, any]]]:
+        """
+        :param key: base key of the status
+        :return: the current status of the key as last known by the process, as returned by a pull, None if unknown.
+        It could have been replaced on the server since
+        """
+        with self._lock:
+            return self._current.get(key)
+
+    def set_current(self, key: str, status_kvs: List[Dict[str, any]]):
+        """
+        :param key: base key of the status
+        :param status_kvs: current status of the key as returned by a pull, empty if there is none
+        """
+        with self._lock:
+            self._current[key] = status_kvs
+
+    def validate(self, key: str, status_rev: int):
+        """
+        Discard the statuses of a key if they cannot belong to the history of its current status
+        :param key: base key of the status
+        :param status_rev: revision of the current status, -1 if there is none
+        """
+        with self._lock:
+            self._load()
+            if self._last_status_revs.get(key, -1) <= status_rev:
+                return
+            logger.debug(f"Current status of {key} older than the ones cached, discarding them")
+            self._reset(key)
+            self._append({"key": key, "reset": True})
+
+    def compacted(self, rev: int):
+        """
+        Discard the statuses no longer available on the server
+        :param rev: revision reported as compacted by the server
+        """
+        with self._lock:
+            self._load()
+            if rev is None or rev <= self._compact_rev:
+                return
+            logger.debug(f"Discarding the statuses cached up to the compacted revision {rev}")
+            self._discard(rev)
+            self._append({"compacted": rev})
+
+    def _add(self, key: str, rev: int, status: Status):
+        self._statuses[(key, rev)] = status
+        self._last_status_revs[key] = max(self._last_status_revs.get(key, -1), status[0])
+
+    def _reset(self, key: str):
+        self._statuses = {k: s for k, s in self._statuses.items() if k[0] != key}
+        self._last_status_revs.pop(key, None)
+
+    def _discard(self, rev: int):
+        self._compact_rev = rev
+        self._statuses = {k: s for k, s in self._statuses.items() if k[1] > rev}
+
+    def _load(self):
+        """
+        This method reads the cache file the first time the cache is used. The file is rewritten if it has grown
+        beyond the max number of statuses
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        lines = 0
+        try:
+            with open(self.path, "r") as f:
+                fcntl.lockf(f, fcntl.LOCK_SH)
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:  # a line partially written
+                        continue
+                    if "compacted" in entry:
+                        if entry["compacted"] > self._compact_rev:
+                            self._discard(entry["compacted"])
+                    elif "reset" in entry:
+                        self._reset(entry["key"])
+                    elif entry["rev"] > self._compact_rev:
+                        date = datetime.strptime(entry["date_time"], DATE_FORMAT)
+                        status = (entry["status_rev"], date, entry["prev_rev"], entry["last_prev_day_rev"])
+                        self._add(entry["key"], entry["rev"], status)
+                fcntl.lockf(f, fcntl.LOCK_UN)
+            logger.debug(f"{len(self._statuses)} statuses loaded from the cache {self.path}")
+        except Exception as e:
+            logger.warning(f"Error occurred while reading the status cache: {e}")
+            logger.debug("", exc_info=True)
+            return
+        if lines > self.max_statuses:
+            self._rewrite()
+
+    def _rewrite(self):
+        """
+        This method rewrites the cache file with the most recent statuses only
+        """
+        recent = sorted(self._statuses.items(), key=lambda item: item[0][1])[-(self.max_statuses // 2) :]
+        self._statuses = dict(recent)
+        try:
+            tmp_path = f"{self.path}.{os.getpid()}"
+            with open(tmp_path, "w") as f:
+                f.write(json.dumps({"compacted": self._compact_rev}) + "\n")
+                for (key, rev), status in recent:
+                    f.write(json.dumps(self._entry(key, rev, status)) + "\n")
+            os.replace(tmp_path, self.path)
+            logger.debug(f"Status cache {self.path} rewritten with {len(recent)} statuses")
+        except Exception as e:
+            logger.warning(f"Error occurred while rewriting the status cache: {e}")
+            logger.debug("", exc_info=True)
+
+    @staticmethod
+    def _entry(key: str, rev: int, status: Status) -> Dict[str, any]:
+        s_rev, s_date, s_prev_rev, s_last_prev_day_rev = status
+        return {
+            "key": key,
+            "rev": rev,
+            "status_rev": s_rev,
+            "date_time": s_date.strftime(DATE_FORMAT),
+            "prev_rev": s_prev_rev,
+            "last_prev_day_rev": s_last_prev_day_rev,
+        }
+
+    def _append(self, entry: Dict[str, any]):
+        """
+        :param entry: line to append to the cache file
+        """
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                # acquire a file lock to avoid interleaving the lines of different processes
+                fcntl.lockf(f, fcntl.LOCK_EX)
+                f.write(json.dumps(entry) + "\n")
+                fcntl.lockf(f, fcntl.LOCK_UN)
+        except Exception as e:
+            logger.warning(f"Error occurred while saving the status cache: {e}")
+            logger.debug("", exc_info=True)
@@ -0,0 +1,145 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import base64
+import json
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from .. import logger
+
+# etcd default --auth-token-ttl for simple tokens
+DEFAULT_TOKEN_TTL = 300  # seconds
+# the token is renewed this many seconds before its expiry to avoid using it while it expires
+EXPIRY_MARGIN = 10  # seconds
+
+
+class TokenManager:
+    """
+    This class caches the authentication token of a user towards a server. The token is shared by all the engines and
+    polling threads of the process and it is requested again only when expired or when the server rejects it. If
+    several threads find the token expired at the same time only one of them authenticates, the others wait and re-use
+    the new token.
+    """
+
+    _managers: Dict[Tuple[str, str], "TokenManager"] = {}
+    _managers_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, base_url: str, username: str) -> "TokenManager":
+        """
+        :param base_url: URL of the server the token is used for
+        :param username: user the token belongs to
+        :return: the token manager shared for this server and user
+        """
+        with cls._managers_lock:
+            manager = cls._managers.get((base_url, username))
+            if manager is None:
+                manager = TokenManager()
+                cls._managers[(base_url, username)] = manager
+            return manager
+
+    @classmethod
+    def reset_all(cls):
+        """
+        Forget all the cached tokens and metrics
+        """
+        with cls._managers_lock:
+            cls._managers.clear()
+
+    def __init__(self, ttl: int = DEFAULT_TOKEN_TTL):
+        """
+        :param ttl: validity in seconds assumed for tokens not carrying their own expiry
+        """
+        self._ttl = ttl
+        self._token = None
+        self._expiry = 0
+        self._lock = threading.Lock()
+        # metrics
+        self.authentications = 0
+        self.invalidations = 0
+        self.cache_hits = 0
+
+    def token(self, authenticate: Callable[[], str]) -> str:
+        """
+        :param authenticate: function requesting a new token to the server, called only if the cached one is not valid
+        :return: a valid token
+        """
+        token = self.cached()
+        if token is not None:
+            return token
+        with self._lock:
+            # another thread may have refreshed the token while we were waiting for the lock
+            token = self.cached()
+            if token is not None:
+                return token
+            new_token = authenticate()
+            self.store(new_token)
+            return new_token
+
+    def cached(self) -> Optional[str]:
+        """
+        :return: the cached token if still valid, None otherwise
+        """
+        token = self._token
+        if token is not None and time.time() < self._expiry:
+            self.cache_hits += 1
+            return token
+        return None
+
+    def store(self, token: str):
+        """
+        Cache a token just acquired. This is used by the callers that cannot block while authenticating
+        :param token: new token
+        """
+        self.authentications += 1
+        self._expiry = self._token_expiry(token)
+        self._token = token
+        logger.debug(f"New token acquired, {self.authentications} authentications made so far")
+
+    def invalidate(self, token: str):
+        """
+        Discard the token passed, typically because rejected by the server. If the cached token has already been
+        replaced the call has no effect, this way only the first of the threads rejected causes a new authentication
+        :param token: token rejected
+        """
+        with self._lock:
+            if token is not None and token == self._token:
+                logger.debug("Token rejected by the server, it will be renewed")
+                self._token = None
+                self._expiry = 0
+                self.invalidations += 1
+
+    def metrics(self) -> Dict[str, int]:
+        """
+        :return: counters of the authentications made, tokens invalidated and requests served by the cached token
+        """
+        return {
+            "authentications": self.authentications,
+            "invalidations": self.invalidations,
+            "cache_hits": self.cache_hits,
+        }
+
+    def _token_expiry(self, token: str) -> float:
+        """
+        :param token: token just acquired
+        :return: time after which the token has to be renewed. JWT tokens carry their own expiry, simple tokens are
+        assumed to last the default TTL
+        """
+        expiry = time.time() + self._ttl
+        parts = token.split(".") if token else []
+        if len(parts) == 3:
+            try:
+                payload = parts[1] + "=" * (-len(parts[1]) % 4)
+                claims = json.loads(base64.urlsafe_b64decode(payload))
+                if "exp" in claims:
+                    expiry = float(claims["exp"])
+            except Exception:
+                logger.debug("Could not read the token expiry, using the default TTL", exc_info=True)
+        return expiry - EXPIRY_MARGIN
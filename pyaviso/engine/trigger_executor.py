@@ -0,0 +1,315 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from .. import HOME_FOLDER, logger
+from . import QueuePolicy
+
+TRIGGER_FOLDER = "triggers"
+# notifications waiting in memory for their triggers, across all the listeners
+DEFAULT_QUEUE_SIZE = 1000
+# triggers of the same listener executed at the same time, 1 keeps the notifications in order
+DEFAULT_CONCURRENCY = 1
+
+
+class _Job:
+    """
+    Execution of the triggers of a notification
+    """
+
+    __slots__ = ("fn", "args", "future", "submitted")
+
+    def __init__(self, fn: Callable, args: Tuple, future: Future, submitted: float):
+        self.fn = fn
+        self.args = args
+        self.future = future
+        self.submitted = submitted
+
+
+class TriggerExecutor:
+    """
+    This class executes the triggers of the notifications in background, so that a slow trigger does not hold the
+    listening of its key. Each listener has its own queue, whose jobs are executed in order by at most the concurrency
+    of the listener at a time, while the workers are shared by all the listeners of the process. The number of jobs
+    waiting is bounded: once the queue is full, the listening either waits for room, drops the notification or saves it
+    to a spill file in the home folder, read back in order as the queue empties. The spill file only lives as long as
+    the process, the notifications not yet triggered at exit are received again only when checkpointing the triggered
+    ones.
+    """
+
+    _executors: Dict[Tuple[int, int, QueuePolicy], "TriggerExecutor"] = {}
+    _executors_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, workers: int, queue_size: int = None, policy: QueuePolicy = None) -> "TriggerExecutor":
+        """
+        :param workers: number of threads executing the triggers
+        :param queue_size: max number of notifications waiting in memory
+        :param policy: what to do with a notification when the queue is full
+        :return: the executor shared for these settings across the process
+        """
+        queue_size = DEFAULT_QUEUE_SIZE if queue_size is None else queue_size
+        policy = QueuePolicy.BLOCK if policy is None else policy
+        with cls._executors_lock:
+            executor = cls._executors.get((workers, queue_size, policy))
+            if executor is None:
+                executor = TriggerExecutor(workers, queue_size, policy)
+                cls._executors[(workers, queue_size, policy)] = executor
+            return executor
+
+    @classmethod
+    def shutdown_all(cls):
+        """
+        Shut down all the executors of the process, the notifications waiting are discarded
+        """
+        with cls._executors_lock:
+            for executor in cls._executors.values():
+                executor.shutdown()
+            cls._executors.clear()
+
+    def __init__(
+        self,
+        workers: int,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        policy: QueuePolicy = QueuePolicy.BLOCK,
+        spill_path: str = None,
+    ):
+        """
+        :param workers: number of threads executing the triggers
+        :param queue_size: max number of notifications waiting in memory
+        :param policy: what to do with a notification when the queue is full
+        :param spill_path: file where the notifications are spilled, by default in the home folder
+        """
+        self.workers = workers
+        self.queue_size = queue_size
+        self.policy = policy
+        if spill_path is None:
+            file_name = f"spill-{os.getpid()}-{id(self)}.jsonl"
+            spill_path = os.path.join(os.path.expanduser(HOME_FOLDER), TRIGGER_FOLDER, file_name)
+        self.spill_path = spill_path
+        # jobs waiting of each listener, the listeners in the order they are served
+        self._queues: "OrderedDict[str, Deque[_Job]]" = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._limits: Dict[str, int] = {}
+        self._queued = 0
+        # jobs spilled to disk, with the functions and futures they refer to
+        self._spilled = 0
+        self._spill_fns: Dict[int, Callable] = {}
+        self._spill_futures: Dict[int, Future] = {}
+        self._spill_writer = None
+        self._spill_reader = None
+        self._counter = itertools.count()
+        # the workers wait for a job and the listening for room in the queue, each woken only when it can go on
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+        # metrics
+        self.dropped = 0
+        self.spills = 0
+        self.executed = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    @property
+    def depth(self) -> int:
+        """
+        :return: number of notifications waiting for their triggers, spilled ones included
+        """
+        with self._lock:
+            return self._queued + self._spilled
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        :return: the current depth of the queue and the wait time of the notifications, as a mean weighted towards
+        the most recent ones and as a max, in seconds, together with the counters of the executor
+        """
+        with self._lock:
+            return {
+                "depth": self._queued + self._spilled,
+                "spilled": self._spilled,
+                "running": sum(self._running.values()),
+                "executed": self.executed,
+                "dropped": self.dropped,
+                "spills": self.spills,
+                "wait_time": self.wait_time,
+                "max_wait_time": self.max_wait_time,
+            }
+
+    def submit(self, group: str, fn: Callable, *args, limit: int = DEFAULT_CONCURRENCY) -> Optional[Future]:
+        """
+        This method queues the execution of a function. When the queue is full it waits, drops the execution or spills
+        it, depending on the policy. The arguments of the spilled executions are saved as JSON
+        :param group: listener the execution belongs to, its executions are started in order
+        :param fn: function to execute
+        :param args: function arguments
+        :param limit: max number of executions of the group running at the same time
+        :return: the future of the execution, None if it has been dropped
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Trigger executor shut down")
+            self._start()
+            self._limits[group] = max(1, limit)
+            if self._spilled or self._queued >= self.queue_size:
+                if self.policy == QueuePolicy.DROP:
+                    self.dropped += 1
+                    logger.warning(f"Trigger queue full, notification of {group} dropped")
+                    return None
+                if self.policy == QueuePolicy.SPILL:
+                    self._spill(group, fn, args, future)
+                    return future
+                while self._queued >= self.queue_size and not self._closed:
+                    self._not_full.wait()
+            self._enqueue(group, _Job(fn, args, future, time.monotonic()))
+        return future
+
+    def shutdown(self):
+        """
+        This method stops the workers, the executions waiting are cancelled while the ones running are completed
+        """
+        with self._lock:
+            self._closed = True
+            for queue in self._queues.values():
+                for job in queue:
+                    job.future.cancel()
+            for future in self._spill_futures.values():
+                future.cancel()
+            self._queues.clear()
+            self._queued = 0
+            self._spilled = 0
+            self._close_spill()
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        self._threads.clear()
+
+    def _start(self):
+        if self._threads:
+            return
+        logger.debug(f"Starting trigger executor with {self.workers} workers")
+        for i in range(self.workers):
+            self._threads.append(threading.Thread(target=self._work_loop, name=f"aviso-trigger-{i}", daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def _enqueue(self, group: str, job: _Job):
+        queue = self._queues.get(group)
+        if queue is None:
+            queue = deque()
+            self._queues[group] = queue
+        queue.append(job)
+        self._queued += 1
+        self._not_empty.notify()
+
+    def _next(self) -> Tuple[Optional[str], Optional[_Job]]:
+        """
+        :return: the first job of the first listener below its concurrency, the listener is then served last
+        """
+        for group, queue in self._queues.items():
+            if self._running.get(group, 0) < self._limits.get(group, DEFAULT_CONCURRENCY):
+                job = queue.popleft()
+                if queue:
+                    self._queues.move_to_end(group)
+                else:
+                    del self._queues[group]
+                return group, job
+        return None, None
+
+    def _work_loop(self):
+        while True:
+            with self._lock:
+                group, job = self._next()
+                while job is None:
+                    if self._closed:
+                        return
+                    self._not_empty.wait()
+                    group, job = self._next()
+                self._queued -= 1
+                self._running[group] = self._running.get(group, 0) + 1
+                wait = time.monotonic() - job.submitted
+                self.wait_time = wait if self.executed == 0 else 0.9 * self.wait_time + 0.1 * wait
+                self.max_wait_time = max(self.max_wait_time, wait)
+                self.executed += 1
+                self._refill()
+                # there is room for a listening waiting
+                if self._queued < self.queue_size:
+                    self._not_full.notify()
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    job.future.set_result(job.fn(*job.args))
+                except BaseException as e:
+                    job.future.set_exception(e)
+            with self._lock:
+                self._running[group] -= 1
+                # the listener can start its next job, while this worker could take the one of another listener
+                if group in self._queues:
+                    self._not_empty.notify()
+
+    def _spill(self, group: str, fn: Callable, args: Tuple, future: Future):
+        seq = next(self._counter)
+        try:
+            if self._spill_writer is None:
+                if not self._spilled:
+                    logger.warning(f"Trigger queue full, notifications spilled to {self.spill_path}")
+                os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+                self._spill_writer = open(self.spill_path, "a")
+            record = {"seq": seq, "group": group, "fn": id(fn), "args": list(args), "submitted": time.monotonic()}
+            self._spill_writer.write(json.dumps(record) + "\n")
+            self._spill_writer.flush()
+        except (OSError, TypeError, ValueError) as e:
+            # the execution is kept in memory rather than lost
+            logger.warning(f"Spilling of the notification has failed, kept in memory: {e}")
+            logger.debug("", exc_info=True)
+            self._enqueue(group, _Job(fn, args, future, time.monotonic()))
+            return
+        self._spill_fns[id(fn)] = fn
+        self._spill_futures[seq] = future
+        self._spilled += 1
+        self.spills += 1
+
+    def _refill(self):
+        """
+        This method reads back the jobs spilled once the queue is half empty
+        """
+        if not self._spilled or self._queued > self.queue_size // 2:
+            return
+        if self._spill_reader is None:
+            self._spill_reader = open(self.spill_path)
+        while self._spilled and self._queued < self.queue_size:
+            line = self._spill_reader.readline()
+            if not line:
+                break
+            record = json.loads(line)
+            future = self._spill_futures.pop(record["seq"])
+            job = _Job(self._spill_fns[record["fn"]], tuple(record["args"]), future, record["submitted"])
+            self._spilled -= 1
+            self._enqueue(record["group"], job)
+        if not self._spilled:
+            logger.debug("Notifications spilled all read back")
+            self._close_spill()
+
+    def _close_spill(self):
+        for f in (self._spill_writer, self._spill_reader):
+            if f is not None:
+                f.close()
+        self._spill_writer = None
+        self._spill_reader = None
+        self._spill_fns.clear()
+        self._spill_futures.clear()
+        if os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
@@ -6,19 +6,21 @@
 # granted to it by virtue of its status as an intergovernmental organisation
 # nor does it submit to any jurisdiction.
 
-import itertools
-import re
+import hashlib
+import json
+import zlib
 from datetime import datetime
 from typing import Dict, List
 
-import parse
-
 from .. import logger
-from ..custom_exceptions import EventListenerException
+from ..custom_exceptions import EventListenerException, TriggerException
 from ..engine import EngineType
 from ..engine.engine import Engine
 from ..triggers import trigger_factory as tf
-from .validation import *  # noqa: F403
+from .key_codec import KeyCodec
+from .key_planner import KeyPlanner
+from .notification_filter import NotificationFilter
+from .validation import RequestValidator
 
 DEFAULT_PAYLOAD_KEY = "payload"
 
@@ -38,6 +40,8 @@ class EventListener:
         from_date: datetime = None,
         to_date: datetime = None,
         payload_key: str = None,
+        polling: Dict[str, float] = None,
+        dispatch: Dict[str, any] = None,
     ):
         self._event_type = event_type
         self._engine = engine
@@ -45,11 +49,23 @@ class EventListener:
         self._triggers = triggers
         self._listener_schema = listener_schema
         self._trigger_factory = tf.TriggerFactory()
-        self._keys = self.key_expansion(self._request)
-        self._filter = self.filter_expansion(self._request)
+        # the triggers are created once for all the notifications
+        self._trigger_plan = self._trigger_factory.create_plan(triggers if triggers else [])
         self._from_date = from_date
         self._to_date = to_date
+        self._codec = KeyCodec.get(event_type, listener_schema, engine.engine_type)
+        self._keys = self.key_expansion(self._request)
+        self._filter = self.filter_expansion(self._request)
+        self._compiled_filter = NotificationFilter(self._filter, self._codec.fields)
         self.payload_key = payload_key
+        self._polling = polling
+        # lanes the triggers are dispatched on, partitioning the notifications by key or by some request fields
+        self._dispatch = dispatch if dispatch else {}
+        self._lane_count: int = self._dispatch.get("lanes", 1)
+        self._partition: List[str] = self._dispatch.get("partition")
+        if self._partition:
+            for f in self._partition:
+                assert f in self._codec.fields, f"Partition attribute {f} not present in the notification"
 
     def __str__(self):
         return f"{self.event_type} listener to keys: {self.keys}"
@@ -85,6 +101,22 @@ class EventListener:
     def request(self) -> Dict[str, any]:
         return self._request
 
+    @property
+    def polling(self) -> Dict[str, float]:
+        return self._polling
+
+    @property
+    def dispatch(self) -> Dict[str, any]:
+        return self._dispatch
+
+    @property
+    def name(self) -> str:
+        """
+        :return: name identifying the listener across runs, made of its event type and a digest of its request
+        """
+        request = json.dumps(self._request, sort_keys=True, default=str)
+        return f"{self.event_type}-{hashlib.sha1(request.encode()).hexdigest()[:12]}"
+
     @property
     def keys(self) -> List[str]:
         return self._keys
@@ -103,36 +135,15 @@ class EventListener:
 
     def key_expansion(self, request: Dict[str, any]) -> List[str]:
         """
-        This functions composes the keys to watch using the listener request dictionary
+        This functions composes the keys to watch using the listener request dictionary. Keys sharing a prefix are
+        collapsed into a single range when cheaper, the notifications are then filtered by the callback. The keys are
+        never collapsed when searching the history as this relies on the status of each key.
         :param request:
         :return: List of keys
         """
-        # read the key format from the schema
-        key_base = EventListener._key_base_format(self.listener_schema, self.engine.engine_type)
-        try:
-            key: str = key_base.format(**request)
-        except KeyError as e:
-            raise KeyError(f"Wrong listener file: {','.join(e.args)} required")
-
-        # compose multiple keys from the list values
-        keys: List[str] = []
-        template = r"\[[^\[\]]*\]"
-        matches = re.findall(template, key)
-        if len(matches) == 0:
-            keys.append(key)
-        else:
-            # Build a list of the possible substitutions
-            ldests = []
-            for m in matches:
-                ldests.append(eval(m))
-            # Generate the various pairings
-            for lproduct in itertools.product(*ldests):
-                k = key
-                for src, dest in itertools.zip_longest(matches, lproduct):
-                    # Replace each term (you could optimise this using a single re.sub)
-                    k = k.replace(src, dest)
-                keys.append(k)
-        return keys
+        planner = KeyPlanner(self._codec.base_format, self.listener_schema.get("request"))
+        collapse = self.from_date is None and self.to_date is None and self.engine.engine_type != EngineType.FILE_BASED
+        return planner.plan(request, collapse=collapse)
 
     def filter_expansion(self, request: Dict[str, any]) -> Dict[str, List[any]]:
         """
@@ -167,29 +178,27 @@ class EventListener:
         :param key:
         :return:
         """
-        # read the key format from the schema
-        key_put_format = EventListener._key_base_format(
-            self.listener_schema, self.engine.engine_type
-        ) + EventListener._key_stem_format(self.listener_schema, self.engine.engine_type)
-
-        try:
-            notification: Dict[str, any] = parse.parse(key_put_format, key, extra_types=[str]).named
-        except AttributeError as e:
-            logger.debug("", exc_info=True)
-            raise EventListenerException(f"Key {key} failed validation, exception: {e}")
-        return notification
+        return self._codec.parse(key)
 
     def callback(self, key: str, value: str):
         """
         This callback function first parses the key and build a notification dictionary, it then filters it using the
         self.filter requested. If it passes the filter phase the notification is then passed to the triggers
-        otherwise the notification is ignored.
+        otherwise the notification is ignored. A TriggerException is raised if any trigger failed, so that the engine
+        does not save the notification as received when checkpointing only the triggered ones.
         :param key:
         :param value:
         :return:
         """
         # parse and filter the key
-        not_request: Dict[str, any] = self.parse_key(key)
+        try:
+            not_request: Dict[str, any] = self.parse_key(key)
+        except EventListenerException:
+            # keys listened as a single range include the status of each key
+            if self._is_status_key(key):
+                logger.debug(f"Status {key} ignored")
+                return
+            raise
 
         if self._is_expected(not_request):
             # prepare the notification dictionary to pass to the trigger
@@ -199,7 +208,8 @@ class EventListener:
             # execute all the triggers defined in the EventListener
             logger.info("A valid notification has been received, executing triggers...")
             logger.debug(f"{notification}")
-            self.execute_triggers(notification)
+            if self.execute_triggers(notification) is False:
+                raise TriggerException(f"Triggers not completed for notification {key}")
 
     def listen(self) -> bool:
         """
@@ -209,7 +219,48 @@ class EventListener:
 
         :return: True if the listener is in execution, False otherwise
         """
-        return self._engine.listen(self.keys, self.callback, self.from_date, self.to_date)
+        return self._engine.listen(
+            self.keys,
+            self.callback,
+            self.from_date,
+            self.to_date,
+            self.polling,
+            self.name,
+            key_filter=self.select,
+            lane=self.lane if self._lane_count > 1 else None,
+        )
+
+    def select(self, keys: List[str]) -> List[bool]:
+        """
+        This method filters a page of notifications at once by their keys, before they are decoded and passed one by
+        one to the callback. The statuses are discarded, the keys that cannot be parsed are left to the callback to
+        report.
+        :param keys: keys of the notifications received
+        :return: for each key, True if the notification has to be passed to the callback
+        """
+        parsed = self._codec.parse_many(keys)
+        selected = self._compiled_filter.select(parsed)
+        for i, notification in enumerate(parsed):
+            if notification is None and self._codec.is_base(keys[i]):
+                selected[i] = False
+        return selected
+
+    def lane(self, key: str) -> int:
+        """
+        This method assigns a notification to one of the lanes its triggers are dispatched on, by hashing its key or,
+        if the listener is partitioned, the values of the partition attributes. The notifications of the same lane are
+        triggered in order while the lanes are triggered in parallel
+        :param key: key of the notification
+        :return: the lane of the notification
+        """
+        partition = key
+        if self._partition:
+            notification = self._codec.parse_many([key])[0]
+            # the keys that cannot be parsed are left to the callback to report
+            if notification is not None:
+                partition = "/".join(str(notification[f]) for f in self._partition)
+        # the hash is stable across processes, contrary to the built-in one
+        return zlib.crc32(partition.encode()) % self._lane_count
 
     def stop(self) -> bool:
         """
@@ -224,37 +275,26 @@ class EventListener:
             logger.warning(f"{self} not currently in execution")
             return False
 
-    def execute_triggers(self, notification: Dict[str, any]):
+    def execute_triggers(self, notification: Dict[str, any]) -> bool:
         """
         This function is used to execute the triggers associated with this EventListener.
         :param notification:
-        :return:
+        :return: True if all the triggers have been executed, False if one failed
         """
         # execute all the triggers defined in the EventListener in order
-        for t in self.triggers:
-            try:
-                # create the trigger
-                trigger = self.trigger_factory.create_trigger(notification, t)
-            except Exception as e:
-                logger.error(f"Trigger {t} could not be created, {type(e)}: {e}")
-                logger.debug("", exc_info=True)
-                break  # the whole triggers execution stop
-            else:  # run the trigger
-                try:
-                    trigger.execute()
-                except Exception as e:
-                    logger.error(f"Trigger {t} could not be executed,  {e}")
-                    logger.debug("", exc_info=True)
-                    break  # the whole triggers execution stop
+        return self._trigger_plan.execute(notification)
 
     @staticmethod
-    def derive_notification_keys(params: Dict[str, any], schema: Dict[str, any], engine_type: EngineType):
+    def derive_notification_keys(
+        params: Dict[str, any], schema: Dict[str, any], engine_type: EngineType, event_type: str = None
+    ):
         """
         This function compose all the keys needed for a notification to the server using the parameters passed and
         the schema
         :param params:
         :param schema:
         :param engine_type
+        :param event_type: if passed, the key codec is shared with the other notifications of this event type
         :return: stem_key, base_key, admin_key
         """
         # get the request schema
@@ -263,34 +303,18 @@ class EventListener:
         # validate and canonize parameters
         EventListener._validate(params, request_schema)
 
-        # read the base key format from the schema
-        key_base_format = EventListener._key_base_format(schema, engine_type)
-        try:
-            # create the base key
-            base_key: str = key_base_format.format(**params)
-        except KeyError as e:
-            raise KeyError(f"Wrong parameters: {','.join(e.args)} required")
-
-        # read the stem key format from the schema
-        key_stem_format = key_base_format + EventListener._key_stem_format(schema, engine_type)
-        try:
-            # create the stem key
-            stem_key: str = key_stem_format.format(**params)
-        except KeyError as e:
-            raise KeyError(f"Wrong parameters: {','.join(e.args)} required")
-
-        # read the admin key format from the schema
-        key_admin_format = EventListener._key_admin_format(schema, engine_type)
-        if key_admin_format:
-            try:
-                # create the admin key
-                admin_key = key_admin_format.format(**params)
-            except KeyError as e:
-                raise KeyError(f"Wrong parameters: {','.join(e.args)} required")
+        if event_type:
+            codec = KeyCodec.get(event_type, schema, engine_type)
         else:
-            admin_key = None
+            codec = KeyCodec(schema, engine_type)
+        return codec.format(params)
 
-        return stem_key, base_key, admin_key
+    def _is_status_key(self, key: str) -> bool:
+        """
+        :param key:
+        :return: True if the key is the status of a key listened
+        """
+        return self._codec.is_base(key)
 
     def _is_expected(self, notification: Dict) -> bool:
         """
@@ -298,90 +322,7 @@ class EventListener:
         :param notification:
         :return:
         """
-        expected = True
-        for f_key, f_values in self._filter.items():
-            assert f_key in notification, "Filter attribute not present in the notification"
-            n_value = notification[f_key]
-            # infer the type of the attributes from the filter type, the default is string
-            if type(f_values[0]) is int:
-                n_value = int(n_value)
-            # now check if it matches the filters
-            if n_value not in f_values:
-                # notification does NOT complies with this filter attribute
-                expected = False
-                logger.debug(
-                    f"Notification {notification} failed filter {f_key} with value {n_value} therefore it "
-                    f"will be ignored"
-                )
-                break
-        return expected
-
-    @staticmethod
-    def _key_base_format(schema, engine_type: EngineType) -> str:
-        """
-        Helper method used to extract the key base format from the schema
-        :param schema:
-        :param engine_type:
-        :return: key base format
-        """
-        base_key_f = None
-        assert "endpoint" in schema, "Wrong schema structure, 'endpoint' could not be located"
-        endpoints = schema["endpoint"]
-        assert len(endpoints) > 0, "Wrong schema structure, 'endpoint' should be a non empty list"
-        for endpoint in endpoints:
-            assert "engine" in endpoint, "Wrong schema structure, 'engine' in 'endpoint' could not be located"
-            if engine_type.name.lower() in endpoint["engine"]:
-                assert "base" in endpoint, "Wrong schema structure, 'base' in 'endpoint' could not be located"
-                base_key_f = endpoint["base"]
-                if not base_key_f.endswith("/"):
-                    base_key_f = base_key_f + "/"
-                break
-        if base_key_f is None:
-            raise EventListenerException("Key base could bot be located in the schema")
-        return base_key_f
-
-    @staticmethod
-    def _key_stem_format(schema, engine_type: EngineType) -> str:
-        """
-        Helper method used to extract the key stem format from the schema
-        :param schema:
-        :param engine_type:
-        :return: key stem format
-        """
-        stem_key_f = None
-        assert "endpoint" in schema, "Wrong schema structure, 'endpoint' could not be located"
-        endpoints = schema["endpoint"]
-        assert len(endpoints) > 0, "Wrong schema structure, 'endpoint' should be a non empty list"
-        for endpoint in endpoints:
-            assert "engine" in endpoint, "Wrong schema structure, 'engine' in 'endpoint' could not be located"
-            if engine_type.name.lower() in endpoint["engine"]:
-                assert "stem" in endpoint, "Wrong schema structure, 'stem' in 'endpoint' could not be located"
-                stem_key_f = endpoint["stem"]
-                if stem_key_f.startswith("/"):
-                    stem_key_f = stem_key_f[1 : len(stem_key_f)]
-                break
-        if stem_key_f is None:
-            raise EventListenerException("Key base could bot be located in the schema")
-        return stem_key_f
-
-    @staticmethod
-    def _key_admin_format(schema, engine_type: EngineType) -> str:
-        """
-        Helper method used to extract the key admin format from the schema
-        :param schema:
-        :param engine_type:
-        :return: admin key format
-        """
-        admin_key_f = None
-        assert "endpoint" in schema, "Wrong schema structure, 'endpoint' could not be located"
-        endpoints = schema["endpoint"]
-        assert len(endpoints) > 0, "Wrong schema structure, 'endpoint' should be a non empty list"
-        for endpoint in endpoints:
-            assert "engine" in endpoint, "Wrong schema structure, 'engine' in 'endpoint' could not be located"
-            if engine_type.name.lower() in endpoint["engine"]:
-                admin_key_f = endpoint.get("admin")
-                break
-        return admin_key_f
+        return self._compiled_filter.matches(notification)
 
     @staticmethod
     def _validate(params, schema):
@@ -392,30 +333,4 @@ class EventListener:
         :param schema:
         :return:
         """
-        for p in params.keys():
-            # check if this attribute is defined in the schema
-            assert p in schema.keys(), f"Key {p} is not allowed"
-            type_list = schema[p]
-            valid = False
-            for p_schema in type_list:
-                try:
-                    assert "type" in p_schema, f"Wrong schema structure, 'type' could not be located for {p}"
-                    p_schema_c = p_schema.copy()
-                    validator_class = p_schema_c.pop("type")
-                    validator: TypeHandler = eval(f"{validator_class}(key=p, **p_schema_c)")  # noqa: F405
-                    # format the values associated to this attribute
-                    value = params[p]
-                    if type(value) is list:
-                        params[p] = []
-                        for v in value:
-                            params[p].append(validator.process(v))
-                    else:
-                        params[p] = validator.process(value)
-                    # if no ValueError have been generated exit and don't valid against the other type handlers
-                    valid = True
-                    break
-                except ValueError as e:
-                    logger.debug(f"{e}")
-            # check if at least one type handler was valid
-            if not valid:
-                raise ValueError(f"Value {params[p]} is not valid for key {p}")
+        RequestValidator.get(schema).validate(params)
@@ -72,8 +72,24 @@ class EventListenerFactory:
             # Parse the triggers
             triggers: Optional[List[Dict[str, any]]] = self._parse_triggers(listen)
 
+            # Parse the polling intervals overriding the ones of the engine
+            polling: Optional[Dict[str, float]] = self._parse_polling(listen)
+
+            # Parse the lanes the triggers are dispatched on
+            dispatch: Optional[Dict[str, any]] = self._parse_dispatch(listen)
+
+            # a batch only groups the notifications whose triggers are executed at the same time, each waiting for it
+            if any(self._is_batched(t) for t in triggers):
+                lanes = dispatch.get("lanes", 1) if dispatch else None
+                assert engine.trigger_concurrency(lanes) > 1, (
+                    "Post trigger batch requires the triggers of the listener executed concurrently, set "
+                    "trigger_workers and trigger_concurrency, or dispatch lanes, greater than 1"
+                )
+
             # create the listener
-            listener = el.EventListener(event_type, engine, request, triggers, schema, from_date, to_date, payload_key)
+            listener = el.EventListener(
+                event_type, engine, request, triggers, schema, from_date, to_date, payload_key, polling, dispatch
+            )
             listeners.append(listener)
 
         return listeners
@@ -98,3 +114,48 @@ class EventListenerFactory:
                 raise KeyError(f"Trigger type {e.args[0]} not recognised")
 
         return triggers
+
+    @staticmethod
+    def _is_batched(trigger: Dict[str, any]) -> bool:
+        """
+        :param trigger: trigger of a listener
+        :return: True if the trigger posts the notifications in batches
+        """
+        protocol = trigger.get("protocol")
+        return trigger.get("type", "").lower() == "post" and isinstance(protocol, dict) and bool(protocol.get("batch"))
+
+    def _parse_polling(self, listener: Dict[str, any]) -> Optional[Dict[str, float]]:
+        """
+        This method parses the optional polling block overriding the polling intervals of the engine
+        :param listener:
+        :return: the polling intervals, None if not defined
+        """
+        polling: Optional[Dict[str, float]] = listener.get("polling")
+        if polling is None:
+            return None
+        assert isinstance(polling, dict), "Wrong file structure, 'polling' must be a dictionary"
+        for k, v in polling.items():
+            assert k in ["interval", "min_interval", "max_interval"], f"Polling parameter {k} not recognised"
+            assert isinstance(v, (int, float)) and v > 0, f"Polling parameter {k} must be a positive number of seconds"
+        if "min_interval" in polling and "max_interval" in polling:
+            assert polling["min_interval"] <= polling["max_interval"], "Polling min_interval greater than max_interval"
+        return polling
+
+    def _parse_dispatch(self, listener: Dict[str, any]) -> Optional[Dict[str, any]]:
+        """
+        This method parses the optional dispatch block defining the lanes the triggers are dispatched on
+        :param listener:
+        :return: the number of lanes and the partition attributes, None if not defined
+        """
+        dispatch: Optional[Dict[str, any]] = listener.get("dispatch")
+        if dispatch is None:
+            return None
+        assert isinstance(dispatch, dict), "Wrong file structure, 'dispatch' must be a dictionary"
+        for k in dispatch.keys():
+            assert k in ["lanes", "partition"], f"Dispatch parameter {k} not recognised"
+        lanes = dispatch.get("lanes", 1)
+        assert isinstance(lanes, int) and lanes > 0, "Dispatch parameter lanes must be a positive integer"
+        partition = dispatch.get("partition")
+        if partition is not None:
+            assert isinstance(partition, list) and len(partition) > 0, "Dispatch parameter partition must be a list"
+        return dispatch
@@ -0,0 +1,149 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import threading
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import parse
+
+from .. import logger
+from ..custom_exceptions import EventListenerException
+from ..engine import EngineType
+
+
+class KeyCodec:
+    """
+    This class formats and parses the keys of an event type for an engine type. The key formats are read from the
+    endpoints of the schema and the parsers compiled only once, when the codec is created. The codecs are shared per
+    event type and engine type across the process, as long as the schema they were created from is the one in use.
+    """
+
+    _codecs: Dict[Tuple[str, EngineType], Tuple[Dict[str, any], "KeyCodec"]] = {}
+    _codecs_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, event_type: str, event_schema: Dict[str, any], engine_type: EngineType) -> "KeyCodec":
+        """
+        :param event_type: name of the event type
+        :param event_schema: schema of the event type
+        :param engine_type: type of the engine the keys are for
+        :return: the codec shared for this event type and engine type, created again if the schema has changed
+        """
+        with cls._codecs_lock:
+            entry = cls._codecs.get((event_type, engine_type))
+            # the schema is held by the entry, so it can be compared by identity
+            if entry is None or entry[0] is not event_schema:
+                logger.debug(f"Compiling the keys of {event_type} for {engine_type.name.lower()}")
+                entry = (event_schema, KeyCodec(event_schema, engine_type))
+                cls._codecs[(event_type, engine_type)] = entry
+            return entry[1]
+
+    @classmethod
+    def reset_all(cls):
+        """
+        Forget all the codecs of the process
+        """
+        with cls._codecs_lock:
+            cls._codecs.clear()
+
+    def __init__(self, event_schema: Dict[str, any], engine_type: EngineType):
+        """
+        :param event_schema: schema of the event type
+        :param engine_type: type of the engine the keys are for
+        """
+        endpoint = KeyCodec._endpoint(event_schema, engine_type)
+        self.base_format = KeyCodec._base_format(endpoint)
+        self.stem_format = self.base_format + KeyCodec._stem_format(endpoint)
+        self.admin_format: Optional[str] = endpoint.get("admin")
+        self._format_base = self.base_format.format
+        self._format_stem = self.stem_format.format
+        self._format_admin = self.admin_format.format if self.admin_format else None
+        self._stem_parser = parse.compile(self.stem_format)
+        self._base_parser = parse.compile(self.base_format)
+
+    def format(self, params: Dict[str, any]) -> Tuple[str, str, Optional[str]]:
+        """
+        :param params: parameters of the key, already validated
+        :return: stem_key, base_key, admin_key, this last one None if the schema does not define it
+        """
+        try:
+            base_key = self._format_base(**params)
+            stem_key = self._format_stem(**params)
+            admin_key = self._format_admin(**params) if self._format_admin else None
+        except KeyError as e:
+            raise KeyError(f"Wrong parameters: {','.join(e.args)} required")
+        return stem_key, base_key, admin_key
+
+    def parse(self, key: str) -> Dict[str, any]:
+        """
+        :param key: key of a notification
+        :return: the parameters of the key
+        """
+        result = self._stem_parser.parse(key)
+        if result is None:
+            raise EventListenerException(f"Key {key} failed validation, it does not match {self.stem_format}")
+        return result.named
+
+    def parse_many(self, keys: List[str]) -> List[Optional[Dict[str, any]]]:
+        """
+        :param keys: keys of a page of notifications
+        :return: the parameters of each key, None for the keys not matching the format
+        """
+        parse_key = self._stem_parser.parse
+        parsed = []
+        for key in keys:
+            result = parse_key(key)
+            parsed.append(result.named if result is not None else None)
+        return parsed
+
+    @property
+    def fields(self) -> FrozenSet[str]:
+        """
+        :return: names of the parameters of the keys
+        """
+        return frozenset(self._stem_parser.named_fields)
+
+    def is_base(self, key: str) -> bool:
+        """
+        :param key:
+        :return: True if the key matches the base format, as the status of a key does
+        """
+        return self._base_parser.parse(key) is not None
+
+    @staticmethod
+    def _endpoint(schema: Dict[str, any], engine_type: EngineType) -> Dict[str, any]:
+        """
+        Helper method used to extract the endpoint of the engine type from the schema
+        :param schema:
+        :param engine_type:
+        :return: endpoint
+        """
+        assert "endpoint" in schema, "Wrong schema structure, 'endpoint' could not be located"
+        endpoints = schema["endpoint"]
+        assert len(endpoints) > 0, "Wrong schema structure, 'endpoint' should be a non empty list"
+        for endpoint in endpoints:
+            assert "engine" in endpoint, "Wrong schema structure, 'engine' in 'endpoint' could not be located"
+            if engine_type.name.lower() in endpoint["engine"]:
+                return endpoint
+        raise EventListenerException("Key base could bot be located in the schema")
+
+    @staticmethod
+    def _base_format(endpoint: Dict[str, any]) -> str:
+        assert "base" in endpoint, "Wrong schema structure, 'base' in 'endpoint' could not be located"
+        base_key_f = endpoint["base"]
+        if not base_key_f.endswith("/"):
+            base_key_f = base_key_f + "/"
+        return base_key_f
+
+    @staticmethod
+    def _stem_format(endpoint: Dict[str, any]) -> str:
+        assert "stem" in endpoint, "Wrong schema structure, 'stem' in 'endpoint' could not be located"
+        stem_key_f = endpoint["stem"]
+        if stem_key_f.startswith("/"):
+            stem_key_f = stem_key_f[1:]
+        return stem_key_f
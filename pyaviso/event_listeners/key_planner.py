@@ -0,0 +1,118 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import itertools
+import string
+from typing import Dict, List, Tuple
+
+from .. import logger
+
+# cost of one range query, expressed as the number of key-values that could be transferred in the same time
+QUERY_COST = 20
+# number of values assumed for a parameter whose schema does not define a finite set of values
+DEFAULT_CARDINALITY = 100
+
+
+class KeyPlanner:
+    """
+    This class plans the range queries needed to listen to a request. The key format is expanded with the values
+    requested only up to the parameter where a single prefix range, filtered client-side, becomes cheaper than one
+    range per key. The choice is based on the number of keys and on the selectivity of the parameters, estimated from
+    their schema. The cartesian product of the values is only built for the plan selected.
+    """
+
+    def __init__(self, key_format: str, request_schema: Dict[str, any] = None, query_cost: int = QUERY_COST):
+        """
+        :param key_format: format of the keys to listen to, the base of the event type
+        :param request_schema: schema of the request parameters, used to estimate their selectivity
+        :param query_cost: cost of a range query, in number of key-values transferred
+        """
+        self.key_format = key_format
+        self.request_schema = request_schema if request_schema else {}
+        self.query_cost = query_cost
+        self._formatter = string.Formatter()
+
+    def plan(self, request: Dict[str, any], collapse: bool = True) -> List[str]:
+        """
+        :param request: listener request, parameters can have a single value or a list of values
+        :param collapse: if False every key is listened to on its own
+        :return: the keys, each one a prefix range, to listen to
+        """
+        literals, fields = self._expand_fields(request)
+        cut = len(fields)
+        if collapse:
+            cut = self._cheapest_cut(fields)
+            if cut < len(fields):
+                logger.debug(f"Listening to a single range per {fields[cut][0]}, filtered client-side")
+
+        keys = []
+        for values in itertools.product(*[f[1] for f in fields[:cut]]):
+            key = literals[0]
+            for i, v in enumerate(values):
+                key += v + literals[i + 1]
+            keys.append(key)
+        return keys
+
+    def _expand_fields(self, request: Dict[str, any]) -> Tuple[List[str], List[Tuple[str, List[str], int]]]:
+        """
+        :param request: listener request
+        :return: literal text around the fields and, for each field, its name, its values formatted and its cardinality
+        """
+        literals = [""]
+        fields = []
+        for literal, field_name, format_spec, conversion in self._formatter.parse(self.key_format):
+            literals[-1] += literal
+            if field_name is None:
+                continue
+            try:
+                value, _ = self._formatter.get_field(field_name, (), request)
+            except KeyError as e:
+                raise KeyError(f"Wrong listener file: {','.join(e.args)} required")
+            values = []
+            for v in value if type(value) is list else [value]:
+                v = self._formatter.format_field(self._formatter.convert_field(v, conversion), format_spec)
+                if v not in values:
+                    values.append(v)
+            fields.append((field_name, values, self._cardinality(field_name)))
+            literals.append("")
+        return literals, fields
+
+    def _cheapest_cut(self, fields: List[Tuple[str, List[str], int]]) -> int:
+        """
+        This method estimates the cost of expanding the first i fields and filtering the rest client-side, for every i
+        :param fields: fields of the key format
+        :return: number of fields to expand
+        """
+        best_cut, best_cost = None, None
+        for cut in range(len(fields), -1, -1):
+            n_keys = 1
+            for _, values, _ in fields[:cut]:
+                n_keys *= len(values)
+            # key-values transferred relative to the ones requested
+            volume = n_keys
+            for _, values, cardinality in fields[cut:]:
+                volume *= max(cardinality, len(values))
+            cost = n_keys * self.query_cost + volume
+            if best_cost is None or cost < best_cost:
+                best_cut, best_cost = cut, cost
+        return best_cut
+
+    def _cardinality(self, field_name: str) -> int:
+        """
+        :param field_name: request parameter
+        :return: number of values the parameter can take, as defined by its schema
+        """
+        cardinality = 0
+        for type_schema in self.request_schema.get(field_name, []):
+            if type_schema.get("values"):
+                cardinality += len(type_schema["values"])
+            elif type_schema.get("range"):
+                cardinality += type_schema["range"][1] - type_schema["range"][0] + 1
+            else:
+                return DEFAULT_CARDINALITY
+        return cardinality if cardinality > 0 else DEFAULT_CARDINALITY
@@ -128,7 +128,37 @@ class ListenerManager:
         :return: number of listeners running
         """
         logger.debug("Calling listen in ListenerManager...")
+        event_listeners = self.create_listeners(listeners, listener_schema, config, from_date, to_date)
 
+        # Add the listeners to the manager and run them
+        logger.debug("Starting listeners...")
+        self._add_listeners(event_listeners)
+        if not self._run_listeners():
+            if len(self.listeners) == 0:
+                raise EventListenerException("Listeners could not start, please check logs")
+            else:
+                logger.error("One or more listeners were not able to start")
+
+        # return the number of listeners running
+        return len(self.listeners)
+
+    def create_listeners(
+        self,
+        listeners: List[Dict[str, any]],
+        listener_schema: Dict[str, any],
+        config: user_config.UserConfig = None,
+        from_date: datetime = None,
+        to_date: datetime = None,
+    ) -> List[EventListener]:
+        """
+        This method instantiates the listeners without running them
+        :param listeners: listeners as list of dictionaries
+        :param listener_schema: schema to use to validate the listeners
+        :param config: UserConfig object
+        :param from_date: date from when to request notifications, if None it will be from now
+        :param to_date: date until when to request notifications, if None it will be until now
+        :return: the listeners created
+        """
         # first check the config
         if config is None:
             config = user_config.UserConfig()
@@ -150,15 +180,4 @@ class ListenerManager:
                 logger.debug("Listener dictionary correctly parsed")
             except Exception as e:
                 raise EventListenerException(f"Not able to load listener dictionary {ls}: {e}")
-
-        # Add the listeners to the manager and run them
-        logger.debug("Starting listeners...")
-        self._add_listeners(event_listeners)
-        if not self._run_listeners():
-            if len(self.listeners) == 0:
-                raise EventListenerException("Listeners could not start, please check logs")
-            else:
-                logger.error("One or more listeners were not able to start")
-
-        # return the number of listeners running
-        return len(self.listeners)
+        return event_listeners
@@ -9,14 +9,17 @@
 import json
 import os
 from enum import Enum
-from typing import Dict
+from typing import Dict, Optional
 
-from .. import HOME_FOLDER, SYSTEM_FOLDER, logger
+from .. import HOME_FOLDER, SYSTEM_FOLDER, __version__, logger
 from ..custom_exceptions import ServiceConfigException
 
 LOCAL_SCHEMA_FOLDER = "service_configuration"
 LISTENER_SCHEMA_FILE_NAME = "event_listener_schema.json"
 DEFAULT_SCHEMA_FILE_NAME = "default_listener_schema.json"
+# the remote schema parsed is cached in the home folder together with the revision of the service it comes from and
+# the version of the parser
+SCHEMA_CACHE_FOLDER = "service_configuration/cache"
 
 
 class ListenerSchemaParserType(Enum):
@@ -52,7 +55,19 @@ class ListenerSchemaParser:
             from ..service_config_manager import ServiceConfigManager
 
             config_manager = ServiceConfigManager(config)
-            remote_schema_files = config_manager.pull(config.notification_engine.service)
+            service = config.notification_engine.service
+            # a single request of the keys only tells if the schema cached is still valid
+            revision = config_manager.revision(service)
+            cache_path = self._cache_path(config)
+            evl_schema = self._load_cached_schema(cache_path, revision)
+            if evl_schema is not None:
+                logger.debug(f"Schema cache hit at revision {revision}")
+                return evl_schema
+            logger.debug(f"Schema cache miss at revision {revision}, pulling the service {service}...")
+            remote_schema_files = config_manager.pull(service)
+            evl_schema = self.parse(local_schema_file_paths, remote_schema_files)
+            self._save_cached_schema(cache_path, revision, evl_schema)
+            return evl_schema
         else:
             # First the system config file
             system_path = os.path.join(SYSTEM_FOLDER, LOCAL_SCHEMA_FOLDER)
@@ -73,6 +88,54 @@ class ListenerSchemaParser:
         # parse the file loaded
         return self.parse(local_schema_file_paths, remote_schema_files)
 
+    def _cache_path(self, config) -> str:
+        """
+        :param config: main configuration
+        :return: file caching the schema of the service parsed by this parser from the configuration server
+        """
+        engine = config.configuration_engine
+        name = f"{engine.host}_{engine.port}_{config.notification_engine.service}_{type(self).__name__}"
+        file_name = name.replace("/", "_").replace(":", "_") + ".json"
+        return os.path.join(os.path.expanduser(HOME_FOLDER), SCHEMA_CACHE_FOLDER, file_name)
+
+    def _load_cached_schema(self, cache_path: str, revision: int) -> Optional[Dict]:
+        """
+        :param cache_path: file caching the schema
+        :param revision: revision of the last change of the service
+        :return: the schema cached if parsed at the revision passed by this version, None otherwise
+        """
+        if revision < 0 or not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path) as cache_file:
+                cached = json.load(cache_file)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Schema cache {cache_path} not readable: {e}")
+            return None
+        # a schema parsed by another version could be parsed differently by this one
+        if cached.get("revision") != revision or cached.get("version") != __version__:
+            return None
+        return cached.get("schema")
+
+    def _save_cached_schema(self, cache_path: str, revision: int, evl_schema: Dict):
+        """
+        :param cache_path: file caching the schema
+        :param revision: revision of the last change of the service
+        :param evl_schema: schema parsed at this revision
+        """
+        if revision < 0:
+            return
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            # the file is replaced at once so that other processes never read it half written
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as cache_file:
+                json.dump({"revision": revision, "version": __version__, "schema": evl_schema}, cache_file)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Saving the schema cache has failed: {e}")
+            logger.debug("", exc_info=True)
+
     def _scan_folder(self, directory):
         files = []
         for x in os.walk(directory):
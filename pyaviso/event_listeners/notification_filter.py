@@ -0,0 +1,75 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+from typing import Dict, Iterable, List, Optional
+
+from .. import logger
+
+
+class NotificationFilter:
+    """
+    This class filters the notifications received against the values requested. The filter is compiled once per
+    listener, each attribute with the set of its values and the conversion to apply to the notification values, so that
+    checking a notification is a hash lookup per attribute. A page of notifications can be filtered at once.
+    """
+
+    def __init__(self, request_filter: Dict[str, List[any]], fields: Iterable[str] = None):
+        """
+        :param request_filter: values requested for each attribute
+        :param fields: attributes found in the notifications, if passed the filter is checked against them
+        """
+        self._checks = []
+        for f_key, f_values in request_filter.items():
+            if fields is not None:
+                assert f_key in fields, f"Filter attribute {f_key} not present in the notification"
+            # infer the type of the attributes from the filter type, the default is string
+            convert = int if type(f_values[0]) is int else None
+            self._checks.append((f_key, frozenset(f_values), convert))
+
+    def matches(self, notification: Dict[str, any]) -> bool:
+        """
+        :param notification: attributes of the notification
+        :return: True if the notification complies with the values requested
+        """
+        for f_key, f_values, convert in self._checks:
+            n_value = notification[f_key]
+            if convert is not None:
+                n_value = convert(n_value)
+            if n_value not in f_values:
+                # notification does NOT complies with this filter attribute
+                logger.debug(
+                    f"Notification {notification} failed filter {f_key} with value {n_value} therefore it "
+                    f"will be ignored"
+                )
+                return False
+        return True
+
+    def select(self, notifications: List[Optional[Dict[str, any]]]) -> List[bool]:
+        """
+        :param notifications: attributes of a page of notifications, None for the ones that could not be parsed
+        :return: for each notification, True if it complies with the values requested or if it could not be checked
+        """
+        selected = []
+        for notification in notifications:
+            if notification is None:
+                selected.append(True)
+                continue
+            ok = True
+            for f_key, f_values, convert in self._checks:
+                n_value = notification[f_key]
+                if convert is not None:
+                    try:
+                        n_value = convert(n_value)
+                    except ValueError:
+                        # left to the callback to report
+                        break
+                if n_value not in f_values:
+                    ok = False
+                    break
+            selected.append(ok)
+        return selected
@@ -21,12 +21,16 @@ class DateHandler(TypeHandler):
         return self._canonic
 
     def valid(self, value: any) -> bool:
-        try:
-            self._d_datetime = datetime.datetime.strptime(str(value), self.canonic)
-            return True
-        except ValueError as e:
-            raise ValueError("Date attribute is not complying with the format defined", e)
+        self._parse(value)
+        return True
 
     def canonise(self, value: any) -> str:
         # strptime tolerates months or days with no leading zero, we need to format it again to be sure they are there
-        return self._d_datetime.strftime(self.canonic)
+        return self._parse(value).strftime(self.canonic)
+
+    def _parse(self, value: any) -> datetime.datetime:
+        # the date is not kept between valid and canonise as the handler is shared by the threads notifying
+        try:
+            return datetime.datetime.strptime(str(value), self.canonic)
+        except ValueError as e:
+            raise ValueError("Date attribute is not complying with the format defined", e)
@@ -15,6 +15,11 @@ class EnumHandler(TypeHandler):
     def __init__(self, key, values: List[str], required=False, default=None):
         super(EnumHandler, self).__init__(key, required)
         self._valid_values = values
+        # the MARS enums have thousands of values, they are looked up in a set
+        try:
+            self._valid_set = frozenset(values)
+        except TypeError:
+            self._valid_set = values
         self._default = default
 
     @property
@@ -30,7 +35,7 @@ class EnumHandler(TypeHandler):
         except ValueError as e:
             raise ValueError(f"Key {self.key} is not of a valid type", e)
 
-        if value in self.valid_values:
+        if value in self._valid_set:
             return True
         else:
             valid_values_str = ",".join(map(lambda x: str(x), self.valid_values))
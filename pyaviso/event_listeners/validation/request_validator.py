@@ -0,0 +1,116 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+from ... import logger
+from .date_handler import DateHandler
+from .enum_handler import EnumHandler
+from .float_handler import FloatHandler
+from .int_handler import IntHandler
+from .regex_handler import RegexHandler
+from .string_handler import StringHandler
+from .time_handler import TimeHandler
+from .type_handler import TypeHandler
+
+HANDLERS = {
+    h.__name__: h
+    for h in (DateHandler, EnumHandler, FloatHandler, IntHandler, RegexHandler, StringHandler, TimeHandler)
+}
+# number of request schemas whose validators are kept in memory
+MAX_VALIDATORS = 64
+
+
+class RequestValidator:
+    """
+    This class validates and canonises the parameters of a request against the request schema of an event type. The
+    type handlers of each parameter are created from the schema only once, the first time the parameter is validated.
+    The validators are shared across the process as long as the schema they were created from is in use.
+    """
+
+    _validators: "OrderedDict[int, RequestValidator]" = OrderedDict()
+    _validators_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, request_schema: Dict[str, any]) -> "RequestValidator":
+        """
+        :param request_schema: request schema of an event type
+        :return: the validator shared for this schema
+        """
+        with cls._validators_lock:
+            validator = cls._validators.get(id(request_schema))
+            # the schema is held by the validator, so it can be compared by identity
+            if validator is None or validator.request_schema is not request_schema:
+                validator = RequestValidator(request_schema)
+                cls._validators[id(request_schema)] = validator
+                if len(cls._validators) > MAX_VALIDATORS:
+                    cls._validators.popitem(last=False)
+            else:
+                cls._validators.move_to_end(id(request_schema))
+            return validator
+
+    @classmethod
+    def reset_all(cls):
+        """
+        Forget all the validators of the process
+        """
+        with cls._validators_lock:
+            cls._validators.clear()
+
+    def __init__(self, request_schema: Dict[str, any]):
+        """
+        :param request_schema: request schema of an event type
+        """
+        self.request_schema = request_schema
+        self._handlers: Dict[str, List[TypeHandler]] = {}
+
+    def validate(self, params: Dict[str, any]):
+        """
+        This method validates and canonises the parameters passed. Note that the old params values are overwritten by
+        the canonised values.
+        :param params:
+        """
+        for p in params.keys():
+            valid = False
+            for validator in self._param_handlers(p):
+                try:
+                    # format the values associated to this attribute
+                    value = params[p]
+                    if type(value) is list:
+                        params[p] = [validator.process(v) for v in value]
+                    else:
+                        params[p] = validator.process(value)
+                    # if no ValueError have been generated exit and don't valid against the other type handlers
+                    valid = True
+                    break
+                except ValueError as e:
+                    logger.debug(f"{e}")
+            # check if at least one type handler was valid
+            if not valid:
+                raise ValueError(f"Value {params[p]} is not valid for key {p}")
+
+    def _param_handlers(self, p: str) -> List[TypeHandler]:
+        """
+        :param p: name of the parameter
+        :return: the type handlers of the parameter, created the first time
+        """
+        handlers = self._handlers.get(p)
+        if handlers is None:
+            # check if this attribute is defined in the schema
+            assert p in self.request_schema.keys(), f"Key {p} is not allowed"
+            handlers = []
+            for p_schema in self.request_schema[p]:
+                assert "type" in p_schema, f"Wrong schema structure, 'type' could not be located for {p}"
+                p_schema_c = p_schema.copy()
+                handler_class = p_schema_c.pop("type")
+                assert handler_class in HANDLERS, f"Wrong schema structure, type {handler_class} not recognised"
+                handlers.append(HANDLERS[handler_class](key=p, **p_schema_c))
+            self._handlers[p] = handlers
+        return handlers
@@ -7,6 +7,10 @@
 # nor does it submit to any jurisdiction.
 
 from abc import ABC, abstractmethod
+from functools import lru_cache
+
+# number of values canonised by each handler kept in memory, as the same dates, steps or enums are seen repeatedly
+CANONISED_CACHE_SIZE = 1024
 
 
 class TypeHandler(ABC):
@@ -14,6 +18,8 @@ class TypeHandler(ABC):
         super(TypeHandler, self).__init__()
         self._key = key
         self._required = required
+        # the handlers are configured once, so the same value is always canonised the same way
+        self._process_cached = lru_cache(maxsize=CANONISED_CACHE_SIZE, typed=True)(self._process)
 
     @property
     def key(self) -> str:
@@ -24,6 +30,14 @@ class TypeHandler(ABC):
         return self._required
 
     def process(self, value: any = None) -> str:
+        try:
+            hash(value)
+        except TypeError:
+            # values not hashable are not cached
+            return self._process(value)
+        return self._process_cached(value)
+
+    def _process(self, value: any = None) -> str:
         if self.required and value is None:
             raise KeyError(f"{self.key} is a mandatory key")
         elif not self.required and value is None:
@@ -6,6 +6,8 @@
 # granted to it by virtue of its status as an intergovernmental organisation
 # nor does it submit to any jurisdiction.
 
+import asyncio
+import functools
 from datetime import datetime
 from typing import Dict, List, Tuple
 
@@ -13,8 +15,14 @@ import yaml
 
 from . import exit_channel, logger, user_config
 from .authentication.auth import Auth
-from .custom_exceptions import EventListenerException, InvalidInputError
+from .custom_exceptions import (
+    EngineException,
+    EventListenerException,
+    InvalidInputError,
+)
+from .engine import EngineType
 from .engine import engine_factory as ef
+from .engine.engine import Engine
 from .event_listeners.event_listener import DEFAULT_PAYLOAD_KEY, EventListener
 from .event_listeners.listener_manager import ListenerManager
 
@@ -44,6 +52,23 @@ class NotificationManager:
         :param to_date: date until when to request notifications, if None it will be until now
         :return: number of listeners running
         """
+        listeners_list, listener_schema = self._load_listeners(config, listeners_file_paths, listeners)
+
+        # Call the listener manager
+        return self.listener_manager.listen(listeners_list, listener_schema, config, from_date, to_date)
+
+    def _load_listeners(
+        self,
+        config: user_config.UserConfig,
+        listeners_file_paths: List[str] = None,
+        listeners: Dict[str, any] = None,
+    ) -> Tuple[List[Dict[str, any]], Dict[str, any]]:
+        """
+        :param config: UserConfig object
+        :param listeners_file_paths: list of file paths to YAML listener files
+        :param listeners: listeners as dictionaries
+        :return: the listeners as list of dictionaries and the listener schema
+        """
         # check we have listeners
         listeners_list = []
         if listeners_file_paths is not None and len(listeners_file_paths) > 0:
@@ -58,9 +83,7 @@ class NotificationManager:
 
         # retrieve listener schema
         listener_schema = config.schema_parser.parser().load(config)
-
-        # Call the listener manager
-        return self.listener_manager.listen(listeners_list, listener_schema, config, from_date, to_date)
+        return listeners_list, listener_schema
 
     def listen(
         self,
@@ -85,7 +108,89 @@ class NotificationManager:
         :return:
         """
         logger.debug("Calling listen...")
+        config = self._listen_config(config, from_date, to_date, now, catchup)
+
+        # Call the listener manager
+        self._listen(config, listeners_file_paths, listeners, from_date, to_date)
 
+        # keep the main process running and wait for the listening thread to terminate
+        l_exit = exit_channel.get()  # this is blocking until all listener ends or there is an error
+        if l_exit:  # it exits successful
+            return
+        else:  # it exits with errors
+            raise EventListenerException("Error in one of the listening process")
+
+    async def async_listen(
+        self,
+        config: user_config.UserConfig = None,
+        listeners_file_paths: List[str] = None,
+        listeners: Dict[str, any] = None,
+        from_date: datetime = None,
+        to_date: datetime = None,
+        now: bool = False,
+        catchup: bool = False,
+    ):
+        """
+        This method is the asyncio variant of listen. The keys are listened by tasks of the running loop while the
+        triggers, that can block, are executed in the default executor of the loop. It requires the etcd_rest engine.
+        It returns when the listening has completed, cancelling it stops the listeners.
+        :param config: UserConfig object
+        :param listeners_file_paths: list of file paths to YAML listener files
+        :param listeners: listeners as dictionaries
+        :param from_date: date from when to request notifications, if None it will be from now
+        :param to_date: date until when to request notifications, if None it will be until now
+        :param now: if True ignore missed notifications, only listen to new ones
+        :param catchup: if True retrieve first the missed notifications
+        :return:
+        """
+        logger.debug("Calling async listen...")
+        config = self._listen_config(config, from_date, to_date, now, catchup)
+        loop = asyncio.get_running_loop()
+
+        # the listeners are created with a blocking engine, only used to define their keys
+        listeners_list, listener_schema = await loop.run_in_executor(
+            None, self._load_listeners, config, listeners_file_paths, listeners
+        )
+        event_listeners = await loop.run_in_executor(
+            None, self.listener_manager.create_listeners, listeners_list, listener_schema, config, from_date, to_date
+        )
+
+        engine_factory: ef.EngineFactory = ef.EngineFactory(config.notification_engine, Auth.get_auth(config))
+        async with engine_factory.create_async_engine() as engine:
+            for listener in event_listeners:
+                callback = functools.partial(loop.run_in_executor, None, listener.callback)
+                await engine.listen(
+                    listener.keys,
+                    callback,
+                    from_date,
+                    to_date,
+                    listener.polling,
+                    listener.name,
+                    key_filter=listener.select,
+                )
+                logger.info(f"Listening to {','.join(listener.keys)} at {engine.host}:{engine.port}...")
+            try:
+                await engine.wait()
+            except EngineException as e:
+                raise EventListenerException(f"Error in one of the listening process, {e}")
+
+    def _listen_config(
+        self,
+        config: user_config.UserConfig = None,
+        from_date: datetime = None,
+        to_date: datetime = None,
+        now: bool = False,
+        catchup: bool = False,
+    ) -> user_config.UserConfig:
+        """
+        This method validates the inputs of listen and sets the catchup behaviour in the configuration
+        :param config: UserConfig object
+        :param from_date: date from when to request notifications, if None it will be from now
+        :param to_date: date until when to request notifications, if None it will be until now
+        :param now: if True ignore missed notifications, only listen to new ones
+        :param catchup: if True retrieve first the missed notifications
+        :return: the configuration to use
+        """
         # first check the config
         if config is None:
             config = user_config.UserConfig()
@@ -106,16 +211,7 @@ class NotificationManager:
         else:
             if now:
                 config.notification_engine.catchup = False
-
-        # Call the listener manager
-        self._listen(config, listeners_file_paths, listeners, from_date, to_date)
-
-        # keep the main process running and wait for the listening thread to terminate
-        l_exit = exit_channel.get()  # this is blocking until all listener ends or there is an error
-        if l_exit:  # it exits successful
-            return
-        else:  # it exits with errors
-            raise EventListenerException("Error in one of the listening process")
+        return config
 
     def key(
         self, params: Dict, config: user_config.UserConfig = None, listener_schema: Dict = None
@@ -151,7 +247,7 @@ class NotificationManager:
         filtered_params = params.copy()
         filtered_params.pop("event")
         key, root, admin_key = EventListener.derive_notification_keys(
-            filtered_params, event_schema, config.notification_engine.type
+            filtered_params, event_schema, config.notification_engine.type, event_type=listener_type
         )
         logger.debug(f"Keys generated {root}, {key}, {admin_key}")
 
@@ -195,6 +291,34 @@ class NotificationManager:
         """
         logger.debug(f"Calling notify with the following notification {notification}...")
 
+        # first check the config
+        if config is None:
+            config = user_config.UserConfig()
+
+        kvs, base_key, admin_key, ttl = self._notification_kvs(notification, config)
+
+        # create the engine
+        engine_factory: ef.EngineFactory = ef.EngineFactory(config.notification_engine, Auth.get_auth(config))
+        engine = engine_factory.create_engine()
+
+        # submit the notification with status update
+        engine.push_with_status(
+            kvs, base_key=base_key, admin_key=admin_key, message=f"notification to key {kvs[0]['key']}", ttl=ttl
+        )
+
+        return True
+
+    def notify_many(self, notifications: List[Dict], config: user_config.UserConfig = None) -> List[bool]:
+        """
+        Send many notifications to the server. The notifications are all validated and translated in key-value pairs
+        first, using the schema loaded once, and then submitted in as few transactions as possible, each one updating
+        the status of its base keys once.
+        :param notifications: list of dictionaries of the notifications ready to submit
+        :param config: UserConfig object
+        :return: list telling for each notification if it has been submitted
+        """
+        logger.debug(f"Calling notify many with {len(notifications)} notifications...")
+
         # first check the config
         if config is None:
             config = user_config.UserConfig()
@@ -203,6 +327,83 @@ class NotificationManager:
         logger.debug("Getting schema...")
         listener_schema = config.schema_parser.parser().load(config)
 
+        # create the engine
+        engine_factory: ef.EngineFactory = ef.EngineFactory(config.notification_engine, Auth.get_auth(config))
+        engine = engine_factory.create_engine()
+
+        return self._notify_many(notifications, config, listener_schema, engine)
+
+    def _notify_many(
+        self, notifications: List[Dict], config: user_config.UserConfig, listener_schema: Dict, engine: Engine
+    ) -> List[bool]:
+        """
+        :param notifications: list of dictionaries of the notifications ready to submit
+        :param config: UserConfig object
+        :param listener_schema: event listener schema
+        :param engine: engine to submit the notifications with
+        :return: list telling for each notification if it has been submitted
+        """
+        results = [False] * len(notifications)
+        valid = []
+        for i, notification in enumerate(notifications):
+            try:
+                valid.append((i, self._notification_kvs(dict(notification), config, listener_schema)))
+            except Exception as e:
+                logger.error(f"Notification {notification} not valid, {e}")
+                logger.debug("", exc_info=True)
+        if not valid:
+            return results
+
+        # submit the notifications with status updates
+        submitted = engine.push_many_with_status([kvs for _, kvs in valid])
+        for (i, _), result in zip(valid, submitted):
+            results[i] = result
+        return results
+
+    async def async_notify(self, notification: Dict, config: user_config.UserConfig = None) -> bool:
+        """
+        This method is the asyncio variant of notify. With the etcd_rest engine the notification is submitted without
+        blocking the running loop, the other engines are executed in the default executor of the loop
+        :param notification: dictionary of the notification ready to submit
+        :param config: UserConfig object
+        :return: True if the notification has been submitted
+        """
+        logger.debug(f"Calling async notify with the following notification {notification}...")
+
+        # first check the config
+        if config is None:
+            config = user_config.UserConfig()
+
+        loop = asyncio.get_running_loop()
+        if config.notification_engine.type != EngineType.ETCD_REST:
+            return await loop.run_in_executor(None, self.notify, notification, config)
+
+        # the schema could be loaded from the configuration server
+        kvs, base_key, admin_key, ttl = await loop.run_in_executor(None, self._notification_kvs, notification, config)
+
+        engine_factory: ef.EngineFactory = ef.EngineFactory(config.notification_engine, Auth.get_auth(config))
+        async with engine_factory.create_async_engine() as engine:
+            await engine.push_with_status(
+                kvs, base_key=base_key, admin_key=admin_key, message=f"notification to key {kvs[0]['key']}", ttl=ttl
+            )
+
+        return True
+
+    def _notification_kvs(
+        self, notification: Dict, config: user_config.UserConfig, listener_schema: Dict = None
+    ) -> Tuple[List[Dict[str, any]], str, str, int]:
+        """
+        This method validates the notification and translates it in the key-value pair to submit
+        :param notification: dictionary of the notification ready to submit
+        :param config: UserConfig object
+        :param listener_schema: event listener schema, loaded if not passed
+        :return: a tuple: key-value pairs to submit, base key, admin key, TTL of the notification
+        """
+        if not listener_schema:
+            # retrieve listener schema
+            logger.debug("Getting schema...")
+            listener_schema = config.schema_parser.parser().load(config)
+
         # validate the input
         try:
             # check the payload key
@@ -216,10 +417,6 @@ class NotificationManager:
         except AssertionError as e:
             raise InvalidInputError(e)
 
-        # first check the config
-        if config is None:
-            config = user_config.UserConfig()
-
         # read the TTL for this key
         ttl = config.key_ttl
         if "ttl" in notification:
@@ -230,18 +427,8 @@ class NotificationManager:
         # generate the key
         key, base_key, admin_key = self.key(notification, config, listener_schema)
 
-        # create the engine
-        engine_factory: ef.EngineFactory = ef.EngineFactory(config.notification_engine, Auth.get_auth(config))
-        engine = engine_factory.create_engine()
-
-        # submit the notification with status update
         logger.debug(f"Submit key {key}, value {value} with status update")
-        kvs = [{"key": key, "value": value}]
-        engine.push_with_status(
-            kvs, base_key=base_key, admin_key=admin_key, message=f"notification to key {key}", ttl=ttl
-        )
-
-        return True
+        return [{"key": key, "value": value}], base_key, admin_key, ttl
 
     def _load_listener_files(self, listener_files: List[str]):
         """
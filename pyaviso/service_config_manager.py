@@ -120,12 +120,11 @@ class ServiceConfigManager:
         logger.debug("Calling pull...")
         # pull the service
         service_key = self._build_service_key(service)
-        kvs = self._engine.pull(service_key, key_only)
-        if len(kvs) != 0:
-            for kv in kvs:
-                file_name = kv["key"]
-                logger.debug(f"File pulled: {file_name}")
-        else:
+        kvs = []
+        for kv in self._engine.pull_iter(service_key, key_only):
+            logger.debug(f"File pulled: {kv['key']}")
+            kvs.append(kv)
+        if len(kvs) == 0:
             logger.debug(f"No files found for service {service}")
 
         return kvs
@@ -238,6 +237,18 @@ class ServiceConfigManager:
 
         return status
 
+    def revision(self, service: str) -> int:
+        """
+        This method reads the revision of the last change of the service, with a single request of the keys only
+        :param service: service to check
+        :return: revision of the last change of the service, -1 if the service is not found
+        """
+        logger.debug("Calling revision...")
+        # the status and the files of the service, any push, revert or remove changes the highest revision
+        service_key = self._build_service_key(service, root_only=True)
+        kvs = self._engine.pull(service_key, key_only=True)
+        return max((kv["mod_rev"] for kv in kvs), default=-1)
+
     def revert(self, service: str) -> List[str]:
         """
         This method reverts the service defined to the previous version
@@ -6,20 +6,29 @@
 # granted to it by virtue of its status as an intergovernmental organisation
 # nor does it submit to any jurisdiction.
 
+import atexit
+import copy
 import datetime
 import importlib
 import json
+import threading
+import time
+from concurrent.futures import Future
 from enum import Enum
-from typing import Dict
+from typing import Dict, List, Tuple
 
 import boto3
-import requests
 from cloudevents.http import CloudEvent, to_structured
 
 from .. import logger
 from ..custom_exceptions import TriggerException
+from ..engine.session_pool import SessionPool
 from . import trigger
 
+# HTTP statuses of a POST worth retrying, the server being overloaded or temporarily unavailable
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+BATCH_CONTENT_TYPE = "application/cloudevents-batch+json"
+
 
 class ProtocolType(Enum):
     """
@@ -47,6 +56,12 @@ class PostTrigger(trigger.Trigger):
         assert protocol_params.get("type") is not None, "protocol type is a mandatory field"
         self.protocol = ProtocolType[protocol_params.get("type").lower()].get_class()(notification, protocol_params)
 
+    def bind(self, notification: Dict) -> "PostTrigger":
+        bound = trigger.Trigger.bind(self, notification)
+        bound.protocol = copy.copy(self.protocol)
+        bound.protocol.notification = notification
+        return bound
+
     def execute(self):
         logger.info("Starting Post Trigger...'")
 
@@ -66,6 +81,10 @@ class PostCloudEventsHttp:
     TIMEOUT_DEFAULT = 60
     TYPE_DEFAULT = "aviso"
     SOURCE_DEFAULT = "https://aviso.ecmwf.int"
+    RETRIES_DEFAULT = 3
+    RETRY_BACKOFF_DEFAULT = 0.5  # seconds
+    BATCH_SIZE_DEFAULT = 100
+    BATCH_WINDOW_DEFAULT = 1  # seconds
 
     def __init__(self, notification: Dict, params: Dict):
         self.notification = notification
@@ -73,6 +92,20 @@ class PostCloudEventsHttp:
         self.url = params.get("url")
         self.timeout = params.get("timeout", self.TIMEOUT_DEFAULT)
         self.headers = params.get("headers", {})
+        self.retries = params.get("retries", self.RETRIES_DEFAULT)
+        self.retry_backoff = params.get("retry_backoff", self.RETRY_BACKOFF_DEFAULT)
+        # the connections to the URL are kept open and shared by all the notifications
+        self.session = SessionPool.session(self.url)
+
+        # optional batch mode, the notifications are grouped in a single POST
+        self.batch = None
+        if params.get("batch"):
+            batch_params = params.get("batch")
+            size = batch_params.get("size", self.BATCH_SIZE_DEFAULT)
+            window = batch_params.get("window", self.BATCH_WINDOW_DEFAULT)
+            assert isinstance(size, int) and size > 0, "batch size must be a positive integer"
+            assert isinstance(window, (int, float)) and window > 0, "batch window must be a positive number of seconds"
+            self.batch = CloudEventsBatch.get(self, size, window)
 
         # cloudEvents specific fields
         if params.get("cloudevents"):
@@ -95,23 +128,163 @@ class PostCloudEventsHttp:
 
         # Creates the HTTP request representation of the CloudEvents in structured content mode
         headers, body = to_structured(event)
-        self.headers.update(headers)
+
+        if self.batch is not None:
+            logger.debug(f"Adding CloudEvents notification {data} to the batch")
+            # the trigger fails if the batch of the notification is not sent
+            self.batch.add(body).result()
+            return
+
+        # the headers of the params are shared by the notifications of the listener
+        headers = {**self.headers, **headers}
 
         logger.debug(f"Sending CloudEvents notification {data}")
 
         # send the message
-        try:
-            resp = requests.post(self.url, data=body, headers=self.headers, verify=False, timeout=self.timeout)
-        except Exception as e:
-            logger.error("Not able to POST CloudEvents notification")
-            raise TriggerException(e)
-        if resp.status_code != 200:
+        self.post(body, headers)
+
+        logger.debug("CloudEvents notification sent successfully")
+
+    def post(self, body: bytes, headers: Dict[str, str]):
+        """
+        This method posts a message to the URL, retrying with an exponential backoff while the server answers that it
+        is overloaded or temporarily unavailable
+        :param body: message to post
+        :param headers: HTTP headers of the request
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                resp = self.session.post(self.url, data=body, headers=headers, verify=False, timeout=self.timeout)
+            except Exception as e:
+                logger.error("Not able to POST CloudEvents notification")
+                raise TriggerException(e)
+            if resp.status_code not in RETRY_STATUSES or attempt == self.retries:
+                break
+            delay = self.retry_backoff * 2**attempt
+            # the server can tell how long to wait when rate limiting
+            retry_after = resp.headers.get("Retry-After", "")
+            if resp.status_code == 429 and retry_after.isdigit():
+                delay = min(int(retry_after), self.timeout)
+            logger.warning(f"POST to {self.url} returned status {resp.status_code}, retrying in {delay}s...")
+            time.sleep(delay)
+        if not 200 <= resp.status_code < 300:
             raise TriggerException(
                 f"Not able to POST CloudEvents notification to {self.url}, "
                 f"status {resp.status_code}, {resp.reason}, {resp.content.decode()}"
             )
 
+
+class CloudEventsBatch:
+    """
+    This class groups the CloudEvents messages posted to the same URL in a single POST in batched content mode. A batch
+    is sent by the notification filling it or by a timer once the batch window has passed since its first message, and
+    each notification waits for its batch to be sent, failing if the batch fails. The batches are shared across the
+    process by URL and settings, so that the notifications of all the listeners posting to the same URL are grouped
+    together.
+    """
+
+    _batches: Dict[Tuple, "CloudEventsBatch"] = {}
+    _batches_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, protocol: PostCloudEventsHttp, size: int, window: float) -> "CloudEventsBatch":
+        """
+        :param protocol: protocol posting the batches
+        :param size: number of messages after which the batch is sent
+        :param window: max number of seconds the first message of a batch waits to be sent
+        :return: the batch shared for the URL and settings of the protocol
+        """
+        batch_key = (
+            protocol.url,
+            tuple(sorted(protocol.headers.items())),
+            protocol.timeout,
+            protocol.retries,
+            protocol.retry_backoff,
+            size,
+            window,
+        )
+        with cls._batches_lock:
+            batch = cls._batches.get(batch_key)
+            if batch is None:
+                batch = CloudEventsBatch(protocol, size, window)
+                cls._batches[batch_key] = batch
+            return batch
+
+    @classmethod
+    def flush_all(cls):
+        """
+        Send all the messages waiting in the batches of the process
+        """
+        with cls._batches_lock:
+            batches = list(cls._batches.values())
+        for batch in batches:
+            batch.flush()
+
+    def __init__(self, protocol: PostCloudEventsHttp, size: int, window: float):
+        """
+        :param protocol: protocol posting the batches
+        :param size: number of messages after which the batch is sent
+        :param window: max number of seconds the first message of a batch waits to be sent
+        """
+        self._protocol = protocol
+        self.size = size
+        self.window = window
+        self._bodies: List[bytes] = []
+        self._future = Future()
+        self._timer: threading.Timer = None
+        self._lock = threading.Lock()
+
+    def add(self, body: bytes) -> Future:
+        """
+        :param body: CloudEvents message in structured content mode
+        :return: future of the batch of the message, completed once the batch is sent
+        """
+        with self._lock:
+            self._bodies.append(body)
+            future = self._future
+            if len(self._bodies) < self.size:
+                if self._timer is None:
+                    self._timer = threading.Timer(self.window, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return future
+            bodies, future = self._take()
+        self._send(bodies, future)
+        return future
+
+    def flush(self):
+        """
+        Send the messages waiting, if any
+        """
+        with self._lock:
+            bodies, future = self._take()
+        if bodies:
+            self._send(bodies, future)
+
+    def _take(self) -> Tuple[List[bytes], Future]:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        bodies, future = self._bodies, self._future
+        self._bodies = []
+        self._future = Future()
+        return bodies, future
+
+    def _send(self, bodies: List[bytes], future: Future):
+        logger.debug(f"Sending batch of {len(bodies)} CloudEvents notifications")
+        headers = {**self._protocol.headers, "content-type": BATCH_CONTENT_TYPE}
+        try:
+            self._protocol.post(b"[" + b",".join(bodies) + b"]", headers)
+        except TriggerException as e:
+            logger.debug(f"Batch of {len(bodies)} CloudEvents notifications not sent: {e}")
+            future.set_exception(e)
+            return
         logger.debug("CloudEvents notification sent successfully")
+        future.set_result(None)
+
+
+# the messages waiting in a batch are sent before exiting
+atexit.register(CloudEventsBatch.flush_all)
 
 
 class PostCloudEventsAws:
@@ -6,6 +6,7 @@
 # granted to it by virtue of its status as an intergovernmental organisation
 # nor does it submit to any jurisdiction.
 
+import copy
 import importlib
 import json
 import os
@@ -57,6 +58,17 @@ class Trigger(ABC):
     def params(self) -> Dict[str, any]:
         return self._params
 
+    def bind(self, notification: Dict[str, any]) -> "Trigger":
+        """
+        This method creates the trigger of a notification from this one, already created and validated for the
+        listener. The params are shared, so they must not be changed by the execution
+        :param notification: dictionary containing the attributes characterising a notification
+        :return: the trigger ready to execute for the notification
+        """
+        bound = copy.copy(self)
+        bound._notification = notification
+        return bound
+
     @abstractmethod
     def execute(self):
         """
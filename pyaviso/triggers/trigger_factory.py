@@ -6,7 +6,7 @@
 # granted to it by virtue of its status as an intergovernmental organisation
 # nor does it submit to any jurisdiction.
 
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
 from .. import logger
 from .trigger import Trigger, TriggerType
@@ -17,11 +17,18 @@ class TriggerFactory:
     This class is in charge of creating a trigger for the specific trigger requested.
     """
 
+    def __init__(self):
+        # class of each trigger type, imported the first time
+        self._classes: Dict[TriggerType, type] = {}
+
     def create_trigger(self, notification: Dict[str, any], params: Dict[str, any]) -> Trigger:
         assert "type" in params, "'type' is a mandatory field in trigger"
         # find specific trigger class
         trigger_type = TriggerType[params.get("type").lower()]
-        trigger_class = trigger_type.get_class()
+        trigger_class = self._classes.get(trigger_type)
+        if trigger_class is None:
+            trigger_class = trigger_type.get_class()
+            self._classes[trigger_type] = trigger_class
 
         # instantiate the specific trigger
         logger.debug(f"Creating {trigger_type.name} trigger...")
@@ -29,3 +36,48 @@ class TriggerFactory:
         logger.debug(f"Trigger {trigger_type.name} created")
 
         return t
+
+    def create_plan(self, triggers: List[Dict[str, any]]) -> "TriggerPlan":
+        """
+        :param triggers: params of the triggers of a listener, in order of execution
+        :return: the triggers created once, to be executed for each notification
+        """
+        return TriggerPlan(triggers, self)
+
+
+class TriggerPlan:
+    """
+    This class holds the triggers of a listener, created and validated only once when the listener is created. For
+    each notification the triggers are bound to it and executed in order, with no import or validation of their params.
+    A trigger that could not be created makes every execution fail, as if it was created for each notification.
+    """
+
+    def __init__(self, triggers: List[Dict[str, any]], factory: TriggerFactory):
+        """
+        :param triggers: params of the triggers, in order of execution
+        :param factory: factory creating the triggers
+        """
+        self._steps: List[Tuple[Dict[str, any], Optional[Trigger], Optional[Exception]]] = []
+        for t in triggers:
+            try:
+                self._steps.append((t, factory.create_trigger(None, t), None))
+            except Exception as e:
+                logger.debug("", exc_info=True)
+                self._steps.append((t, None, e))
+
+    def execute(self, notification: Dict[str, any]) -> bool:
+        """
+        :param notification: notification to pass to the triggers
+        :return: True if all the triggers have been executed, False if one failed
+        """
+        for t, trigger, error in self._steps:
+            if error is not None:
+                logger.error(f"Trigger {t} could not be created, {type(error)}: {error}")
+                return False  # the whole triggers execution stop
+            try:
+                trigger.bind(notification).execute()
+            except Exception as e:
+                logger.error(f"Trigger {t} could not be executed,  {e}")
+                logger.debug("", exc_info=True)
+                return False  # the whole triggers execution stop
+        return True
@@ -20,7 +20,7 @@ import yaml
 
 from . import HOME_FOLDER, SYSTEM_FOLDER, logger
 from .authentication import AuthType
-from .engine import EngineType
+from .engine import CheckpointMode, EngineType, ListenMode, QueuePolicy
 from .event_listeners.listener_schema_parser import ListenerSchemaParserType
 
 # Default configuration location
@@ -41,6 +41,25 @@ class EngineConfig:
         https: bool = False,
         catchup: Optional[bool] = None,
         automatic_retry_delay: Optional[int] = None,
+        pool_size: Optional[int] = None,
+        keep_alive: bool = True,
+        max_retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+        listen_mode: str = "polling",
+        polling_workers: Optional[int] = None,
+        delivery_workers: Optional[int] = None,
+        min_polling_interval: Optional[float] = None,
+        max_polling_interval: Optional[float] = None,
+        status_index: bool = True,
+        status_index_ttl: Optional[int] = None,
+        checkpoint_mode: str = "received",
+        checkpoint_interval: Optional[float] = None,
+        checkpoint_count: Optional[int] = None,
+        lease_window: Optional[float] = None,
+        trigger_workers: Optional[int] = None,
+        trigger_queue_size: Optional[int] = None,
+        trigger_queue_policy: str = "block",
+        trigger_concurrency: Optional[int] = None,
     ):
         """
         :param host: endpoint host of the notification server
@@ -54,6 +73,30 @@ class EngineConfig:
         :param https: if True the connection will go through HTTPS
         :param catchup: if True the notification engine will first look for the missed notifications
         :param automatic_retry_delay: Number of seconds to wait before retrying to connect to the engine
+        :param pool_size: max number of HTTP connections kept open towards the server
+        :param keep_alive: if True the HTTP connections are re-used across requests
+        :param max_retries: number of times a failed HTTP connection attempt is retried before giving up
+        :param retry_backoff: backoff factor in seconds between consecutive HTTP connection attempts
+        :param listen_mode: watch to receive the notifications from a server stream, polling to query the server
+        periodically
+        :param polling_workers: number of threads polling the server for all the keys listened
+        :param delivery_workers: number of threads catching up the keys polled and delivering their notifications
+        :param min_polling_interval: polling interval right after receiving notifications, in seconds
+        :param max_polling_interval: polling interval reached by a key without notifications, in seconds
+        :param status_index: if True the statuses are indexed by hour to speed up the search of past notifications
+        :param status_index_ttl: seconds the entries of the status index live, 0 to keep them
+        :param checkpoint_mode: received to save the last revision as soon as it is received, triggered to save it only
+        once its triggers have succeeded
+        :param checkpoint_interval: max number of seconds a last revision saved waits to be committed
+        :param checkpoint_count: number of last revisions saved after which they are committed
+        :param lease_window: keys pushed with a TTL expiring within this number of seconds share the same lease, 0 to
+        request a lease per push
+        :param trigger_workers: number of threads executing the triggers in background, 0 to execute them in the
+        listening thread
+        :param trigger_queue_size: max number of notifications waiting in memory for their triggers
+        :param trigger_queue_policy: block to wait for room when the queue of the triggers is full, drop to discard the
+        notification, spill to save it to disk
+        :param trigger_concurrency: max number of notifications of the same listener triggered at the same time
         """
         self.host = host
         self.port = port
@@ -65,6 +108,25 @@ class EngineConfig:
         self.service = service
         self.catchup = catchup
         self.automatic_retry_delay = automatic_retry_delay
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.listen_mode = ListenMode[listen_mode.upper()]
+        self.polling_workers = polling_workers
+        self.delivery_workers = delivery_workers
+        self.min_polling_interval = min_polling_interval
+        self.max_polling_interval = max_polling_interval
+        self.status_index = status_index
+        self.status_index_ttl = status_index_ttl
+        self.checkpoint_mode = CheckpointMode[checkpoint_mode.upper()]
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_count = checkpoint_count
+        self.lease_window = lease_window
+        self.trigger_workers = trigger_workers
+        self.trigger_queue_size = trigger_queue_size
+        self.trigger_queue_policy = QueuePolicy[trigger_queue_policy.upper()]
+        self.trigger_concurrency = trigger_concurrency
 
     def __str__(self):
         config_items = [
@@ -78,6 +140,25 @@ class EngineConfig:
             f"service: {self.service}",
             f"catchup: {self.catchup}",
             f"automatic_retry_delay: {self.automatic_retry_delay}",
+            f"pool_size: {self.pool_size}",
+            f"keep_alive: {self.keep_alive}",
+            f"max_retries: {self.max_retries}",
+            f"retry_backoff: {self.retry_backoff}",
+            f"listen_mode: {self.listen_mode}",
+            f"polling_workers: {self.polling_workers}",
+            f"delivery_workers: {self.delivery_workers}",
+            f"min_polling_interval: {self.min_polling_interval}",
+            f"max_polling_interval: {self.max_polling_interval}",
+            f"status_index: {self.status_index}",
+            f"status_index_ttl: {self.status_index_ttl}",
+            f"checkpoint_mode: {self.checkpoint_mode}",
+            f"checkpoint_interval: {self.checkpoint_interval}",
+            f"checkpoint_count: {self.checkpoint_count}",
+            f"lease_window: {self.lease_window}",
+            f"trigger_workers: {self.trigger_workers}",
+            f"trigger_queue_size: {self.trigger_queue_size}",
+            f"trigger_queue_policy: {self.trigger_queue_policy}",
+            f"trigger_concurrency: {self.trigger_concurrency}",
         ]
         config_string = "\n".join(config_items)
         return f"Engine Configuration:\n{config_string}"
@@ -189,6 +270,23 @@ class UserConfig:
         notification_engine["service"] = "aviso/v1"
         notification_engine["catchup"] = True
         notification_engine["automatic_retry_delay"] = 15  # seconds
+        notification_engine["pool_size"] = 10
+        notification_engine["keep_alive"] = True
+        notification_engine["max_retries"] = 3
+        notification_engine["retry_backoff"] = 0.5  # seconds
+        notification_engine["listen_mode"] = "polling"
+        notification_engine["polling_workers"] = 8
+        notification_engine["delivery_workers"] = 16
+        notification_engine["status_index"] = True
+        notification_engine["status_index_ttl"] = 1382400  # 16 days, as the history kept by the server
+        notification_engine["checkpoint_mode"] = "received"
+        notification_engine["checkpoint_interval"] = 1  # seconds
+        notification_engine["checkpoint_count"] = 100
+        notification_engine["lease_window"] = 60  # seconds
+        notification_engine["trigger_workers"] = 0
+        notification_engine["trigger_queue_size"] = 1000
+        notification_engine["trigger_queue_policy"] = "block"
+        notification_engine["trigger_concurrency"] = 1
 
         # configuration engine
         configuration_engine = {}
@@ -199,6 +297,10 @@ class UserConfig:
         configuration_engine["max_file_size"] = 500  # KiB
         configuration_engine["timeout"] = 60  # seconds
         configuration_engine["automatic_retry_delay"] = 15  # seconds
+        configuration_engine["pool_size"] = 10
+        configuration_engine["keep_alive"] = True
+        configuration_engine["max_retries"] = 3
+        configuration_engine["retry_backoff"] = 0.5  # seconds
 
         # main config
         config = {}
@@ -294,8 +396,34 @@ class UserConfig:
             config["notification_engine"]["service"] = os.environ["AVISO_NOTIFICATION_SERVICE"]
         if "AVISO_NOTIFICATION_CATCHUP" in os.environ:
             config["notification_engine"]["catchup"] = os.environ["AVISO_NOTIFICATION_CATCHUP"]
+        if "AVISO_LISTEN_MODE" in os.environ:
+            config["notification_engine"]["listen_mode"] = os.environ["AVISO_LISTEN_MODE"]
         if "AVISO_POLLING_INTERVAL" in os.environ:
             config["notification_engine"]["polling_interval"] = int(os.environ["AVISO_POLLING_INTERVAL"])
+        if "AVISO_MIN_POLLING_INTERVAL" in os.environ:
+            config["notification_engine"]["min_polling_interval"] = float(os.environ["AVISO_MIN_POLLING_INTERVAL"])
+        if "AVISO_MAX_POLLING_INTERVAL" in os.environ:
+            config["notification_engine"]["max_polling_interval"] = float(os.environ["AVISO_MAX_POLLING_INTERVAL"])
+        if "AVISO_STATUS_INDEX" in os.environ:
+            config["notification_engine"]["status_index"] = os.environ["AVISO_STATUS_INDEX"]
+        if "AVISO_STATUS_INDEX_TTL" in os.environ:
+            config["notification_engine"]["status_index_ttl"] = int(os.environ["AVISO_STATUS_INDEX_TTL"])
+        if "AVISO_CHECKPOINT_MODE" in os.environ:
+            config["notification_engine"]["checkpoint_mode"] = os.environ["AVISO_CHECKPOINT_MODE"]
+        if "AVISO_CHECKPOINT_INTERVAL" in os.environ:
+            config["notification_engine"]["checkpoint_interval"] = float(os.environ["AVISO_CHECKPOINT_INTERVAL"])
+        if "AVISO_CHECKPOINT_COUNT" in os.environ:
+            config["notification_engine"]["checkpoint_count"] = int(os.environ["AVISO_CHECKPOINT_COUNT"])
+        if "AVISO_LEASE_WINDOW" in os.environ:
+            config["notification_engine"]["lease_window"] = float(os.environ["AVISO_LEASE_WINDOW"])
+        if "AVISO_TRIGGER_WORKERS" in os.environ:
+            config["notification_engine"]["trigger_workers"] = int(os.environ["AVISO_TRIGGER_WORKERS"])
+        if "AVISO_TRIGGER_QUEUE_SIZE" in os.environ:
+            config["notification_engine"]["trigger_queue_size"] = int(os.environ["AVISO_TRIGGER_QUEUE_SIZE"])
+        if "AVISO_TRIGGER_QUEUE_POLICY" in os.environ:
+            config["notification_engine"]["trigger_queue_policy"] = os.environ["AVISO_TRIGGER_QUEUE_POLICY"]
+        if "AVISO_TRIGGER_CONCURRENCY" in os.environ:
+            config["notification_engine"]["trigger_concurrency"] = int(os.environ["AVISO_TRIGGER_CONCURRENCY"])
         if "AVISO_CONFIGURATION_HOST" in os.environ:
             config["configuration_engine"]["host"] = os.environ["AVISO_CONFIGURATION_HOST"]
         if "AVISO_CONFIGURATION_PORT" in os.environ:
@@ -399,6 +527,10 @@ class UserConfig:
             ne["https"] = ne["https"].casefold() == "true".casefold()
         if type(ne["catchup"]) is str:
             ne["catchup"] = ne["catchup"].casefold() == "true".casefold()
+        if type(ne.get("keep_alive")) is str:
+            ne["keep_alive"] = ne["keep_alive"].casefold() == "true".casefold()
+        if type(ne.get("status_index")) is str:
+            ne["status_index"] = ne["status_index"].casefold() == "true".casefold()
 
         # translate the ne in a NotificationEngineConfig
         self._notification_engine = EngineConfig(
@@ -411,6 +543,25 @@ class UserConfig:
             service=ne["service"],
             catchup=ne["catchup"],
             automatic_retry_delay=ne["automatic_retry_delay"],
+            pool_size=ne.get("pool_size"),
+            keep_alive=ne.get("keep_alive", True),
+            max_retries=ne.get("max_retries"),
+            retry_backoff=ne.get("retry_backoff"),
+            listen_mode=ne.get("listen_mode", "polling"),
+            polling_workers=ne.get("polling_workers"),
+            delivery_workers=ne.get("delivery_workers"),
+            min_polling_interval=ne.get("min_polling_interval"),
+            max_polling_interval=ne.get("max_polling_interval"),
+            status_index=ne.get("status_index", True),
+            status_index_ttl=ne.get("status_index_ttl"),
+            checkpoint_mode=ne.get("checkpoint_mode", "received"),
+            checkpoint_interval=ne.get("checkpoint_interval"),
+            checkpoint_count=ne.get("checkpoint_count"),
+            lease_window=ne.get("lease_window"),
+            trigger_workers=ne.get("trigger_workers"),
+            trigger_queue_size=ne.get("trigger_queue_size"),
+            trigger_queue_policy=ne.get("trigger_queue_policy", "block"),
+            trigger_concurrency=ne.get("trigger_concurrency"),
         )
 
     @property
@@ -435,6 +586,8 @@ class UserConfig:
         assert "automatic_retry_delay" in ce, "configuration_engine automatic_retry_delay has not been configured"
         if isinstance(ce["https"], str):
             ce["https"] = ce["https"].casefold() == "true".casefold()
+        if isinstance(ce.get("keep_alive"), str):
+            ce["keep_alive"] = ce["keep_alive"].casefold() == "true".casefold()
 
         # exclude file_based from the options for the configuration engine
         assert ce["type"].casefold() != "file_based", "File_based engine not available as configuration engine"
@@ -447,6 +600,10 @@ class UserConfig:
             timeout=ce["timeout"],
             https=ce["https"],
             automatic_retry_delay=ce["automatic_retry_delay"],
+            pool_size=ce.get("pool_size"),
+            keep_alive=ce.get("keep_alive", True),
+            max_retries=ce.get("max_retries"),
+            retry_backoff=ce.get("retry_backoff"),
         )
 
     @property
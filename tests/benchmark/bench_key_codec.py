@@ -0,0 +1,65 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Microbenchmark of the keys formatted and parsed per second, with the format strings read from the schema and the
+pattern compiled at every call as done before, and with the precompiled KeyCodec:
+
+    python tests/benchmark/bench_key_codec.py --keys 20000
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import parse
+
+from pyaviso.engine import EngineType
+from pyaviso.event_listeners.key_codec import KeyCodec
+
+
+def uncompiled(schema, engine_type, params, key):
+    endpoint = KeyCodec._endpoint(schema, engine_type)
+    key_format = KeyCodec._base_format(endpoint) + KeyCodec._stem_format(endpoint)
+    key_format.format(**params)
+    return parse.parse(key_format, key).named
+
+
+def compiled(schema, engine_type, params, key):
+    codec = KeyCodec.get("flight", schema, engine_type)
+    codec.format(params)
+    return codec.parse(key)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=20000)
+    args = parser.parse_args()
+
+    with Path(Path(__file__).parent.parent / "unit/fixtures/listener_schema.json").open() as f:
+        schema = json.load(f)["flight"]
+    engine_type = EngineType.ETCD_REST
+    params = [{"country": "italy", "date": "20210101", "airport": "FCO", "number": str(i)} for i in range(args.keys)]
+    keys = [KeyCodec(schema, engine_type).format(p)[0] for p in params]
+
+    results = {}
+    for name, codec in (("uncompiled", uncompiled), ("KeyCodec", compiled)):
+        start = time.time()
+        for p, k in zip(params, keys):
+            assert codec(schema, engine_type, p, k) == p
+        results[name] = args.keys / (time.time() - start)
+
+    print(f"keys: {args.keys}")
+    for name, rate in results.items():
+        print(f"{name:12} {rate:10.1f} keys/s formatted and parsed")
+    print(f"speed-up:    {results['KeyCodec'] / results['uncompiled']:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Benchmark of the notifications per second submitted one per call with notify and all together with notify_many.
+It runs against the in-memory etcd stand-in, with an optional simulated latency:
+
+    python tests/benchmark/bench_notify_many.py --notifications 2000 --latency 0.001
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "unit"))
+from etcd_stand_in import EtcdStandIn  # noqa: E402
+
+from pyaviso import NotificationManager, user_config  # noqa: E402
+from pyaviso.engine.session_pool import SessionPool  # noqa: E402
+
+
+def notifications(n: int, run: int):
+    return [
+        {"event": "flight", "date": "20260101", "country": f"run{run}", "airport": "fco", "number": str(i)}
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--notifications", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of simulated server latency")
+    args = parser.parse_args()
+
+    # the local state of the engines is saved in a temporary home folder
+    os.environ["HOME"] = tempfile.mkdtemp()
+    server = EtcdStandIn(latency=args.latency).start()
+    config = user_config.UserConfig(conf_path=Path(__file__).parent.parent / "config.yaml")
+    config.notification_engine.host = "127.0.0.1"
+    config.notification_engine.port = server.port
+    manager = NotificationManager()
+    try:
+        start = time.time()
+        for notification in notifications(args.notifications, 1):
+            manager.notify(notification, config)
+        single = args.notifications / (time.time() - start)
+        single_txns = server.requests["/v3/kv/txn"]
+
+        server.requests.clear()
+        start = time.time()
+        assert all(manager.notify_many(notifications(args.notifications, 2), config))
+        bulk = args.notifications / (time.time() - start)
+        bulk_txns = server.requests["/v3/kv/txn"]
+    finally:
+        SessionPool.close_all()
+        server.stop()
+
+    print(f"notifications: {args.notifications}, latency: {args.latency}s")
+    print(f"notify:      {single:10.1f} notifications/s, {single_txns} transactions")
+    print(f"notify_many: {bulk:10.1f} notifications/s, {bulk_txns} transactions")
+    print(f"speed-up:    {bulk / single:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+Benchmark of the requests per second of the REST engine pull with and without the pooled HTTP sessions.
+It runs against the in-memory etcd stand-in, with an optional simulated latency:
+
+    python tests/benchmark/bench_session_pool.py --requests 2000 --threads 8
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "unit"))
+from etcd_stand_in import EtcdStandIn  # noqa: E402
+
+from pyaviso.authentication.none_auth import NoneAuth  # noqa: E402
+from pyaviso.engine.etcd_rest_engine import EtcdRestEngine  # noqa: E402
+from pyaviso.engine.session_pool import SessionPool  # noqa: E402
+from pyaviso.user_config import EngineConfig  # noqa: E402
+
+
+class _UnpooledSession:
+    """
+    Mimic of the previous behaviour, every request opens a new connection
+    """
+
+    def post(self, *args, **kwargs):
+        return requests.post(*args, **kwargs)
+
+
+def run(engine: EtcdRestEngine, n_requests: int, n_threads: int) -> float:
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        list(executor.map(lambda i: engine.pull(key=f"/ec/bench/{i % 100}"), range(n_requests)))
+    return n_requests / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of simulated server latency")
+    args = parser.parse_args()
+
+    server = EtcdStandIn(latency=args.latency).start()
+    config = EngineConfig(
+        host="127.0.0.1",
+        port=server.port,
+        type="etcd_rest",
+        polling_interval=1,
+        timeout=10,
+        automatic_retry_delay=1,
+        pool_size=args.threads,
+    )
+    try:
+        engine = EtcdRestEngine(config, NoneAuth(None))
+        engine._session = _UnpooledSession()
+        server.connections = 0
+        unpooled = run(engine, args.requests, args.threads)
+        unpooled_connections = server.connections
+
+        engine = EtcdRestEngine(config, NoneAuth(None))
+        server.connections = 0
+        pooled = run(engine, args.requests, args.threads)
+        pooled_connections = server.connections
+    finally:
+        SessionPool.close_all()
+        server.stop()
+
+    print(f"requests: {args.requests}, threads: {args.threads}, latency: {args.latency}s")
+    print(f"per-request connection: {unpooled:10.1f} req/s, {unpooled_connections} connections")
+    print(f"pooled session:         {pooled:10.1f} req/s, {pooled_connections} connections")
+    print(f"speed-up:               {pooled / unpooled:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+from pathlib import Path
+
+import pytest
+from etcd_stand_in import EtcdStandIn
+
+from pyaviso import user_config
+from pyaviso.engine.checkpoint_store import CheckpointStore
+from pyaviso.engine.lease_pool import LeasePool
+from pyaviso.engine.polling_scheduler import PollingScheduler
+from pyaviso.engine.session_pool import SessionPool
+from pyaviso.engine.status_cache import StatusCache
+from pyaviso.engine.token_manager import TokenManager
+from pyaviso.engine.trigger_executor import TriggerExecutor
+
+
+@pytest.fixture()
+def stand_in():
+    server = EtcdStandIn().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture()
+def conf(stand_in, tmp_path, monkeypatch):  # this automatically configure the logging
+    # the local state of the engines is saved in a temporary home folder
+    monkeypatch.setenv("HOME", str(tmp_path))
+    tests_path = Path(__file__).parent.parent
+    c = user_config.UserConfig(conf_path=Path(tests_path / "config.yaml"))
+    c.notification_engine.port = stand_in.port
+    c.notification_engine.host = "127.0.0.1"
+    c.configuration_engine.port = stand_in.port
+    c.configuration_engine.host = "127.0.0.1"
+    yield c
+    # the singletons shared by the engines are reset for the next test
+    SessionPool.close_all()
+    TokenManager.reset_all()
+    PollingScheduler.reset()
+    StatusCache.reset_all()
+    CheckpointStore.close_all()
+    LeasePool.reset_all()
+    TriggerExecutor.shutdown_all()
@@ -0,0 +1,373 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+"""
+In-memory stand-in of the etcd v3 gRPC gateway. It implements the subset of the JSON API used by the REST engine so
+that the engine can be tested and benchmarked without a real etcd server.
+"""
+
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPACTED_ERROR = "etcdserver: mvcc: required revision has been compacted"
+
+
+def _b64(b: bytes) -> str:
+    return str(base64.b64encode(b), "utf-8")
+
+
+def _unb64(s) -> bytes:
+    if s is None:
+        return None
+    return base64.b64decode(s)
+
+
+class EtcdStandIn:
+    """
+    Multi-version key-value store with the etcd semantics needed by the engines, served over HTTP
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, token=None, latency=0.0):
+        """
+        :param host: host to bind
+        :param port: port to bind, 0 to pick a free one
+        :param token: if defined, the requests must carry this token obtained from auth/authenticate
+        :param latency: seconds of delay added to each request to simulate the network
+        """
+        self.revision = 1
+        self.compact_revision = 0
+        self.history = []  # list of (revision, key, kv or None if deleted)
+        self.store = {}  # key -> kv
+        self.leases = {}
+        self.token = token
+        self.latency = latency
+        self.requests = {}  # path -> number of requests
+        self.connections = 0
+        self.watch_available = True
+        self.watches = 0
+        self.max_txn_ops = 128
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._stopping = False
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping = True
+        self._server.shutdown()
+        self._server.server_close()
+
+    def compact(self, revision: int):
+        with self._lock:
+            self.compact_revision = revision
+            self.history = [h for h in self.history if h[0] >= revision]
+            self._changed.notify_all()
+
+    def _watch_messages(self, body: dict):
+        """
+        Generator of the messages of a watch stream, one per revision, as they are committed
+        """
+        create = body["create_request"]
+        key = _unb64(create["key"])
+        range_end = _unb64(create.get("range_end"))
+        with self._lock:
+            next_rev = int(create.get("start_revision") or self.revision)
+        yield {"result": {"header": self._header(), "created": True}}
+        while not self._stopping:
+            with self._lock:
+                if next_rev < self.compact_revision:
+                    yield {
+                        "result": {
+                            "header": self._header(),
+                            "compact_revision": str(self.compact_revision),
+                            "canceled": True,
+                        }
+                    }
+                    return
+                changes = [h for h in self.history if h[0] >= next_rev and self._in_range(h[1], key, range_end)]
+                if not changes:
+                    next_rev = max(next_rev, self.revision)
+                    self._changed.wait(0.1)
+                    continue
+            revisions = sorted(set(h[0] for h in changes))
+            for rev in revisions:
+                events = []
+                for r, k, kv in changes:
+                    if r != rev:
+                        continue
+                    if kv is None:
+                        events.append({"type": "DELETE", "kv": {"key": _b64(k), "mod_revision": str(rev)}})
+                    else:
+                        events.append({"kv": self._encode_kv(kv)})
+                yield {"result": {"header": {"revision": str(rev)}, "events": events}}
+            next_rev = revisions[-1] + 1
+
+    # key-value logic
+
+    def _in_range(self, k: bytes, key: bytes, range_end: bytes) -> bool:
+        if range_end is None:
+            return k == key
+        if range_end == b"\0":
+            return k >= key
+        return key <= k < range_end
+
+    def _snapshot(self, revision: int):
+        if revision is None or revision == 0 or revision >= self.revision:
+            return dict(self.store)
+        if revision < self.compact_revision:
+            raise ValueError(COMPACTED_ERROR)
+        snapshot = {}
+        for rev, k, kv in self.history:
+            if rev > revision:
+                break
+            if kv is None:
+                snapshot.pop(k, None)
+            else:
+                snapshot[k] = kv
+        return snapshot
+
+    def range(self, body: dict) -> dict:
+        key = _unb64(body.get("key"))
+        range_end = _unb64(body.get("range_end"))
+        snapshot = self._snapshot(int(body.get("revision") or 0))
+        kvs = [kv for k, kv in snapshot.items() if self._in_range(k, key, range_end)]
+        min_rev = int(body.get("min_mod_revision") or 0)
+        max_rev = int(body.get("max_mod_revision") or 0)
+        if min_rev:
+            kvs = [kv for kv in kvs if kv["mod_revision"] >= min_rev]
+        if max_rev:
+            kvs = [kv for kv in kvs if kv["mod_revision"] <= max_rev]
+        kvs.sort(key=lambda kv: kv["key"], reverse=body.get("sort_order") == "DESCEND")
+        count = len(kvs)
+        limit = int(body.get("limit") or 0)
+        more = False
+        if limit and len(kvs) > limit:
+            kvs = kvs[:limit]
+            more = True
+        out = [self._encode_kv(kv, body.get("keys_only")) for kv in kvs]
+        resp = {"header": self._header(), "count": str(count)}
+        if out:
+            resp["kvs"] = out
+        if more:
+            resp["more"] = True
+        return resp
+
+    def _encode_kv(self, kv: dict, keys_only: bool = False) -> dict:
+        o = {
+            "key": _b64(kv["key"]),
+            "create_revision": str(kv["create_revision"]),
+            "mod_revision": str(kv["mod_revision"]),
+            "version": str(kv["version"]),
+        }
+        if not keys_only:
+            o["value"] = _b64(kv["value"])
+        if kv.get("lease"):
+            o["lease"] = str(kv["lease"])
+        return o
+
+    def _put(self, key: bytes, value: bytes, lease=None):
+        old = self.store.get(key)
+        kv = {
+            "key": key,
+            "value": value,
+            "create_revision": old["create_revision"] if old else self.revision,
+            "mod_revision": self.revision,
+            "version": old["version"] + 1 if old else 1,
+            "lease": int(lease) if lease else None,
+        }
+        if kv["lease"] and kv["lease"] not in self.leases:
+            raise ValueError("etcdserver: requested lease not found")
+        self.store[key] = kv
+        self.history.append((self.revision, key, kv))
+
+    def _delete(self, key: bytes, range_end: bytes):
+        deleted = [kv for k, kv in self.store.items() if self._in_range(k, key, range_end)]
+        for kv in deleted:
+            del self.store[kv["key"]]
+            self.history.append((self.revision, kv["key"], None))
+        return deleted
+
+    def _compare(self, cmp: dict) -> bool:
+        key = _unb64(cmp.get("key"))
+        kv = self.store.get(key)
+        target = cmp.get("target", "VERSION")
+        result = cmp.get("result", "EQUAL")
+        if target == "CREATE":
+            actual, expected = (kv["create_revision"] if kv else 0), int(cmp.get("create_revision") or 0)
+        elif target == "MOD":
+            actual, expected = (kv["mod_revision"] if kv else 0), int(cmp.get("mod_revision") or 0)
+        elif target == "VALUE":
+            actual, expected = (kv["value"] if kv else None), _unb64(cmp.get("value"))
+        else:
+            actual, expected = (kv["version"] if kv else 0), int(cmp.get("version") or 0)
+        if result == "EQUAL":
+            return actual == expected
+        if result == "NOT_EQUAL":
+            return actual != expected
+        if result == "GREATER":
+            return actual > expected
+        return actual < expected
+
+    def _apply_ops(self, ops: list) -> list:
+        responses = []
+        for op in ops:
+            if "requestPut" in op or "request_put" in op:
+                put = op.get("requestPut") or op.get("request_put")
+                self._put(_unb64(put["key"]), _unb64(put.get("value", "")), put.get("lease"))
+                responses.append({"response_put": {"header": self._header()}})
+            elif "requestDeleteRange" in op or "request_delete_range" in op:
+                d = op.get("requestDeleteRange") or op.get("request_delete_range")
+                deleted = self._delete(_unb64(d["key"]), _unb64(d.get("range_end")))
+                responses.append({"response_delete_range": {"deleted": str(len(deleted))}})
+            elif "requestRange" in op or "request_range" in op:
+                r = op.get("requestRange") or op.get("request_range")
+                responses.append({"response_range": self.range(r)})
+            elif "requestTxn" in op or "request_txn" in op:
+                responses.append({"response_txn": self._txn(op.get("requestTxn") or op.get("request_txn"))})
+        return responses
+
+    def _txn(self, body: dict) -> dict:
+        succeeded = all(self._compare(c) for c in body.get("compare", []))
+        ops = body.get("success", []) if succeeded else body.get("failure", [])
+        responses = self._apply_ops(ops)
+        resp = {"header": self._header(), "responses": responses}
+        if succeeded:
+            resp["succeeded"] = True
+        return resp
+
+    def txn(self, body: dict) -> dict:
+        ops = body.get("success", [])
+        if len(ops) > self.max_txn_ops:
+            raise ValueError("etcdserver: too many operations in txn request")
+        puts = [(op.get("requestPut") or op.get("request_put"))["key"] for op in ops if "requestPut" in op]
+        if len(set(puts)) != len(puts):
+            raise ValueError("etcdserver: duplicate key given in txn request")
+        writes = self.revision
+        resp = self._txn(body)
+        if any(h[0] == writes for h in self.history[-1:]):
+            self.revision += 1
+        resp["header"] = self._header()
+        return resp
+
+    def deleterange(self, body: dict) -> dict:
+        deleted = self._delete(_unb64(body["key"]), _unb64(body.get("range_end")))
+        if deleted:
+            self.revision += 1
+        resp = {"header": self._header(), "deleted": str(len(deleted))}
+        if body.get("prev_kv") and deleted:
+            resp["prev_kvs"] = [
+                {
+                    "key": _b64(kv["key"]),
+                    "value": _b64(kv["value"]),
+                    "create_revision": str(kv["create_revision"]),
+                    "mod_revision": str(kv["mod_revision"]),
+                    "version": str(kv["version"]),
+                }
+                for kv in deleted
+            ]
+        return resp
+
+    def lease_grant(self, body: dict) -> dict:
+        lease_id = len(self.leases) + 1000
+        self.leases[lease_id] = time.time() + int(body["TTL"])
+        return {"header": self._header(), "ID": str(lease_id), "TTL": str(body["TTL"])}
+
+    def _header(self) -> dict:
+        return {"revision": str(self.revision - 1 if self.revision > 1 else 1)}
+
+    # HTTP layer
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body are written separately, avoid the delayed ack stall on keep-alive connections
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stand_in._lock:
+                    stand_in.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, code, body):
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, messages):
+                with stand_in._lock:
+                    stand_in.watches += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for message in messages:
+                        line = json.dumps(message).encode() + b"\n"
+                        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                self.close_connection = True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if stand_in.latency:
+                    time.sleep(stand_in.latency)
+                path = self.path
+                with stand_in._lock:
+                    stand_in.requests[path] = stand_in.requests.get(path, 0) + 1
+                if path == "/v3/auth/authenticate":
+                    return self._reply(200, {"header": stand_in._header(), "token": stand_in.token or "token"})
+                if stand_in.token and self.headers.get("Authorization") != stand_in.token:
+                    return self._reply(401, {"error": "etcdserver: invalid auth token", "code": 16})
+                handlers = {
+                    "/v3/kv/range": stand_in.range,
+                    "/v3/kv/txn": stand_in.txn,
+                    "/v3/kv/deleterange": stand_in.deleterange,
+                    "/v3/lease/grant": stand_in.lease_grant,
+                }
+                if path == "/v3/watch" and stand_in.watch_available:
+                    return self._stream(stand_in._watch_messages(body))
+                if path not in handlers:
+                    return self._reply(404, {"error": "not found"})
+                try:
+                    with stand_in._lock:
+                        resp = handlers[path](body)
+                        stand_in._changed.notify_all()
+                except ValueError as e:
+                    return self._reply(400, {"error": str(e), "code": 11})
+                self._reply(200, resp)
+
+        return Handler
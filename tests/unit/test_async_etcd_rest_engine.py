@@ -0,0 +1,222 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+from pyaviso import logger
+from pyaviso.authentication import auth
+from pyaviso.custom_exceptions import EngineException
+from pyaviso.engine import ListenMode
+from pyaviso.engine.engine_factory import EngineFactory
+from pyaviso.engine.etcd_rest_engine import EtcdRestEngine
+
+pytest.importorskip("aiohttp")
+
+
+@pytest.fixture()
+def conf(conf):
+    conf.notification_engine.catchup = False
+    return conf
+
+
+def async_engine(conf):
+    return EngineFactory(conf.notification_engine, auth.Auth.get_auth(conf)).create_async_engine()
+
+
+def test_push_pull_delete(conf):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+
+    async def run():
+        async with async_engine(conf) as engine:
+            kvs = [{"key": "/tmp/aviso/test/test1", "value": "1"}, {"key": "/tmp/aviso/test/test2", "value": "2"}]
+            assert await engine.push(kvs)
+            kvs = await engine.pull(key="/tmp/aviso/test")
+            assert [kv["key"] for kv in kvs] == ["/tmp/aviso/test/test2", "/tmp/aviso/test/test1"]
+            assert kvs[0]["value"] == b"2"
+            assert len(await engine.delete("/tmp/aviso/test")) == 2
+            assert len(await engine.pull(key="/tmp/aviso/test")) == 0
+
+    asyncio.run(run())
+
+
+def test_pull_iter_pages(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+
+    async def run():
+        async with async_engine(conf) as engine:
+            await engine.push([{"key": f"/tmp/aviso/test/test{i:02}", "value": str(i)} for i in range(25)])
+            keys = [kv["key"] async for kv in engine.pull_iter(key="/tmp/aviso/test", page_size=10)]
+            assert keys == [f"/tmp/aviso/test/test{i:02}" for i in reversed(range(25))]
+
+    asyncio.run(run())
+    assert stand_in.requests["/v3/kv/range"] == 3
+
+
+def test_push_with_status(conf):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+
+    async def run():
+        async with async_engine(conf) as engine:
+            await engine.push_with_status([{"key": "/tmp/aviso/test/test1", "value": "1"}], "/tmp/aviso/test")
+            await engine.push_with_status([{"key": "/tmp/aviso/test/test2", "value": "2"}], "/tmp/aviso/test")
+            return await engine.pull("/tmp/aviso/test", prefix=False)
+
+    status = asyncio.run(run())
+    # the status is linked to the previous one as with the blocking engine
+    assert json.loads(status[0]["value"].decode())["prev_rev"] == status[0]["mod_rev"] - 1
+
+
+def test_listen_polling(conf):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.listen_mode = ListenMode.POLLING
+    conf.notification_engine.polling_interval = 0.1
+    received = []
+
+    async def callback(k, v):
+        await asyncio.sleep(0)
+        received.append((k, v))
+
+    async def run():
+        async with async_engine(conf) as engine:
+            await engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+            keys = [f"/tmp/aviso/test/key{i:03}/" for i in range(200)]
+            assert await engine.listen(keys, callback)
+            await asyncio.sleep(0.5)
+            await engine.push([{"key": keys[10] + "test1", "value": "1"}, {"key": keys[150] + "test1", "value": "1"}])
+            await asyncio.sleep(0.5)
+            assert len(engine.polling_intervals()) == 200
+            assert await engine.stop()
+            assert engine.polling_intervals() == {}
+            return keys
+
+    threads = threading.active_count()
+    keys = asyncio.run(run())
+    assert sorted(received) == [(keys[10] + "test1", "1"), (keys[150] + "test1", "1")]
+    # all the keys are listened by the event loop, no thread is started
+    assert threading.active_count() <= threads + 1
+
+
+def test_listen_checkpoint_off_loop(conf, tmp_path, monkeypatch):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    monkeypatch.setenv("HOME", str(tmp_path))
+    conf.notification_engine.listen_mode = ListenMode.POLLING
+    conf.notification_engine.polling_interval = 0.1
+    conf.notification_engine.catchup = True
+    saving_threads = []
+
+    async def run():
+        async with async_engine(conf) as engine:
+            save = engine._engine._save_last_revision
+
+            def save_last_revision(*args):
+                saving_threads.append(threading.current_thread())
+                save(*args)
+
+            monkeypatch.setattr(engine._engine, "_save_last_revision", save_last_revision)
+            await engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+            assert await engine.listen(["/tmp/aviso/test/"], lambda k, v: None)
+            await asyncio.sleep(0.3)
+            await engine.push([{"key": "/tmp/aviso/test/test1", "value": "1"}])
+            await asyncio.sleep(0.3)
+            assert await engine.stop()
+
+    asyncio.run(run())
+    # the revisions are saved to the local state outside the thread of the loop
+    assert saving_threads
+    assert threading.main_thread() not in saving_threads
+
+
+def test_listen_watch(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.listen_mode = ListenMode.WATCH
+    received = []
+
+    async def run():
+        async with async_engine(conf) as engine:
+            await engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+            assert await engine.listen(["/tmp/aviso/test"], lambda k, v: received.append((k, v)))
+            await asyncio.sleep(0.5)
+            await engine.push(
+                [{"key": "/tmp/aviso/test/test1", "value": "1"}, {"key": "/tmp/aviso/test", "value": "s"}]
+            )
+            await engine.delete("/tmp/aviso/test/test1")
+            await engine.push([{"key": "/tmp/aviso/test/test2", "value": "2"}])
+            await asyncio.sleep(0.5)
+
+    asyncio.run(run())
+    assert received == [("/tmp/aviso/test/test1", "1"), ("/tmp/aviso/test/test2", "2")]
+    # the changes came through a single stream, no polling
+    assert stand_in.watches == 1
+    assert stand_in.requests.get("/v3/kv/range", 0) == 1
+
+
+def test_listen_watch_not_available(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.listen_mode = ListenMode.WATCH
+    conf.notification_engine.polling_interval = 0.1
+    stand_in.watch_available = False
+    received = []
+
+    async def run():
+        async with async_engine(conf) as engine:
+            await engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+            assert await engine.listen(["/tmp/aviso/test"], lambda k, v: received.append(k))
+            await asyncio.sleep(0.5)
+            await engine.push([{"key": "/tmp/aviso/test/test1", "value": "1"}])
+            await asyncio.sleep(0.5)
+
+    asyncio.run(run())
+    assert received == ["/tmp/aviso/test/test1"]
+    assert stand_in.requests["/v3/watch"] == 1
+
+
+def test_wait_failure(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.catchup = None
+
+    async def run():
+        async with async_engine(conf) as engine:
+            assert await engine.listen(["/tmp/aviso/test"], lambda k, v: None)
+            with pytest.raises(EngineException):
+                await engine.wait()
+
+    asyncio.run(run())
+
+
+def test_token_shared(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    stand_in.token = "token1"
+    conf.auth_type = "etcd"
+    conf.username = "test"
+    conf.password = "test"
+    authenticator = auth.Auth.get_auth(conf)
+
+    async def run():
+        async with EngineFactory(conf.notification_engine, authenticator).create_async_engine() as engine:
+            await asyncio.gather(*[engine.pull("/tmp/aviso/test") for i in range(10)])
+            # the server forgets the token, the engine has to authenticate again
+            stand_in.token = "token2"
+            await asyncio.gather(*[engine.pull("/tmp/aviso/test") for i in range(10)])
+
+    asyncio.run(run())
+    assert stand_in.requests["/v3/auth/authenticate"] == 2
+    # the token is shared with the blocking engines
+    EtcdRestEngine(conf.notification_engine, authenticator).pull("/tmp/aviso/test")
+    assert stand_in.requests["/v3/auth/authenticate"] == 2
+
+
+def test_not_available(conf):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.type = conf.notification_engine.type.ETCD_GRPC
+    with pytest.raises(EngineException):
+        async_engine(conf)
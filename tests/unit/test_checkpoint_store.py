@@ -0,0 +1,103 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import os
+import time
+
+from pyaviso import logger
+from pyaviso.engine.checkpoint_store import CheckpointStore
+
+
+def test_save_per_key(tmp_path):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    path = str(tmp_path / "last" / "checkpoints.db")
+    store = CheckpointStore(path)
+    assert store.revision("localhost:2379", "flight", "/tmp/aviso/a/") == -1
+    assert not store.saved("localhost:2379")
+    store.save("localhost:2379", "flight", "/tmp/aviso/a/", 10)
+    store.save("localhost:2379", "flight", "/tmp/aviso/b/", 20)
+    store.save("localhost:2379", "other", "/tmp/aviso/a/", 30)
+    store.save("otherhost:2379", "flight", "/tmp/aviso/a/", 40)
+    assert store.saved("localhost:2379")
+    assert store.revision("localhost:2379", "flight", "/tmp/aviso/a/") == 10
+    store.close()
+    # another process reads the revisions committed
+    store = CheckpointStore(path)
+    assert store.revision("localhost:2379", "flight", "/tmp/aviso/a/") == 10
+    assert store.revision("localhost:2379", "flight", "/tmp/aviso/b/") == 20
+    assert store.revision("localhost:2379", "other", "/tmp/aviso/a/") == 30
+    assert store.revision("otherhost:2379", "flight", "/tmp/aviso/a/") == 40
+    store.delete("localhost:2379", "flight", "/tmp/aviso/a/")
+    assert store.revision("localhost:2379", "flight", "/tmp/aviso/a/") == -1
+    assert store.revision("localhost:2379", "other", "/tmp/aviso/a/") == 30
+
+
+def test_group_commit(tmp_path):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    path = str(tmp_path / "checkpoints.db")
+    store = CheckpointStore(path, commit_interval=60, commit_count=1000)
+    for rev in range(100):
+        store.save("localhost:2379", "flight", f"/tmp/aviso/{rev % 10}/", rev)
+    # the revisions wait for the commit interval
+    assert store.commits == 0
+    assert CheckpointStore(path).revision("localhost:2379", "flight", "/tmp/aviso/9/") == -1
+    assert store.revision("localhost:2379", "flight", "/tmp/aviso/9/") == 99
+    assert store.flush()
+    assert store.commits == 1
+    assert CheckpointStore(path).revision("localhost:2379", "flight", "/tmp/aviso/9/") == 99
+
+    store = CheckpointStore(path, commit_interval=0)
+    store.save("localhost:2379", "flight", "/tmp/aviso/9/", 100)
+    assert store.commits == 1
+    assert CheckpointStore(path).revision("localhost:2379", "flight", "/tmp/aviso/9/") == 100
+
+
+def test_commit_interval(tmp_path):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    path = str(tmp_path / "checkpoints.db")
+    store = CheckpointStore(path, commit_interval=0.2, commit_count=1000)
+    store.save("localhost:2379", "flight", "/tmp/aviso/a/", 10)
+    assert CheckpointStore(path).revision("localhost:2379", "flight", "/tmp/aviso/a/") == -1
+    time.sleep(0.5)
+    # a single revision saved is committed at the end of the interval, with no further call
+    assert store.commits == 1
+    assert CheckpointStore(path).revision("localhost:2379", "flight", "/tmp/aviso/a/") == 10
+    store.close()
+
+
+def test_commit_count(tmp_path):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    path = str(tmp_path / "checkpoints.db")
+    store = CheckpointStore(path, commit_interval=60, commit_count=10)
+    for rev in range(25):
+        store.save("localhost:2379", "flight", "/tmp/aviso/a/", rev)
+    # the revisions are committed every 10 saved, even if of the same key
+    assert store.commits == 2
+    assert CheckpointStore(path).revision("localhost:2379", "flight", "/tmp/aviso/a/") == 19
+    # the stores are shared per commit settings
+    assert CheckpointStore.get(path, 60, 10) is CheckpointStore.get(path, 60, 10)
+    assert CheckpointStore.get(path, 60, 10) is not CheckpointStore.get(path)
+    CheckpointStore.close_all()
+
+
+def test_latest(tmp_path):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    path = str(tmp_path / "checkpoints.db")
+    store = CheckpointStore(path)
+    assert store.latest("localhost:2379", "/tmp/aviso/a/") is None
+    store.save("localhost:2379", "flight-1", "/tmp/aviso/a/", 10)
+    store.save("localhost:2379", "flight-2", "/tmp/aviso/b/", 20)
+    assert store.latest("localhost:2379", "/tmp/aviso/a/") == ("flight-1", 10)
+    store.flush()
+    time.sleep(0.01)
+    store.save("localhost:2379", "flight-2", "/tmp/aviso/a/", 30)
+    store.flush()
+    # the newest checkpoint of the key is returned, whichever listener saved it
+    assert store.latest("localhost:2379", "/tmp/aviso/a/") == ("flight-2", 30)
+    assert store.latest("otherhost:2379", "/tmp/aviso/a/") is None
+    store.close()
@@ -0,0 +1,85 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import json
+import os
+
+from pyaviso import AvisoClient, logger
+from pyaviso.event_listeners.listener_schema_parser import ListenerSchemaParser
+
+NOTIFICATION = {"event": "flight", "date": "20260101", "country": "italy", "airport": "fco", "number": "1"}
+
+
+def push_schema(client: AvisoClient, schema):
+    client.engine.push_with_status(
+        [{"key": "/ec/config/aviso/v1/event_listener_schema.json", "value": json.dumps(schema)}],
+        base_key="/ec/config/aviso/v1",
+    )
+
+
+def test_notify(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    client = AvisoClient(conf)
+    for number in range(5):
+        assert client.notify(dict(NOTIFICATION, number=str(number), payload="landed"))
+    assert client.value(dict(NOTIFICATION, number="4")) == "landed"
+    assert client.notify_many([dict(NOTIFICATION, number=str(number)) for number in range(5, 10)]) == [True] * 5
+    # the schema is loaded and the status is read only once
+    assert client.schema_loads == 1
+    assert stand_in.requests["/v3/kv/range"] == 2
+
+
+def test_remote_schema_refresh(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.remote_schema = True
+    client = AvisoClient(conf, schema_check_interval=0)
+    schema = ListenerSchemaParser()._load_default_schema()
+    push_schema(client, schema)
+    key, _, _ = client.key(NOTIFICATION)
+    assert key == "/tmp/aviso/flight/20260101/italy/FCO/1"
+    client.key(NOTIFICATION)
+    assert client.schema_loads == 1
+
+    # the schema is loaded again once changed on the configuration server
+    schema["flight"]["endpoint"][0]["base"] = "/tmp/aviso/flights/"
+    push_schema(client, schema)
+    key, _, _ = client.key(NOTIFICATION)
+    assert key == "/tmp/aviso/flights/20260101/italy/FCO/1"
+    assert client.schema_loads == 2
+
+
+def test_remote_schema_cache(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.remote_schema = True
+    parser = ListenerSchemaParser()
+    schema = parser._load_default_schema()
+    push_schema(AvisoClient(conf), schema)
+    assert parser.load(conf) == schema
+    assert os.path.exists(parser._cache_path(conf))
+
+    # the schema cached is validated with a single request of the keys only
+    stand_in.requests.clear()
+    assert parser.load(conf) == schema
+    assert stand_in.requests["/v3/kv/range"] == 1
+
+    # the service is pulled again once changed on the configuration server
+    schema["flight"]["endpoint"][0]["base"] = "/tmp/aviso/flights/"
+    push_schema(AvisoClient(conf), schema)
+    stand_in.requests.clear()
+    assert parser.load(conf) == schema
+    assert stand_in.requests["/v3/kv/range"] == 2
+
+    # as well as when cached by another version
+    with open(parser._cache_path(conf)) as cache_file:
+        cached = json.load(cache_file)
+    cached["version"] = "0.0.0"
+    with open(parser._cache_path(conf), "w") as cache_file:
+        json.dump(cached, cache_file)
+    stand_in.requests.clear()
+    assert parser.load(conf) == schema
+    assert stand_in.requests["/v3/kv/range"] == 2
@@ -21,6 +21,7 @@ import pytest
 
 from pyaviso import HOME_FOLDER, logger, user_config
 from pyaviso.authentication import auth
+from pyaviso.engine import ListenMode
 from pyaviso.engine.etcd_engine import LOCAL_STATE_FOLDER
 from pyaviso.engine.etcd_grpc_engine import EtcdGrpcEngine
 from pyaviso.engine.etcd_rest_engine import EtcdRestEngine
@@ -42,13 +43,30 @@ def grpc_engine():  # this automatically configure the logging
     return engine
 
 
+def grpc_polling_engine():  # this automatically configure the logging
+    tests_path = Path(__file__).parent.parent
+    c = user_config.UserConfig(conf_path=Path(tests_path / "config.yaml"))
+    c.notification_engine.listen_mode = ListenMode.POLLING
+    authenticator = auth.Auth.get_auth(c)
+    engine = EtcdGrpcEngine(c.notification_engine, authenticator)
+    return engine
+
+
+def grpc_watch_engine():  # this automatically configure the logging
+    tests_path = Path(__file__).parent.parent
+    c = user_config.UserConfig(conf_path=Path(tests_path / "config.yaml"))
+    c.notification_engine.listen_mode = ListenMode.WATCH
+    authenticator = auth.Auth.get_auth(c)
+    engine = EtcdGrpcEngine(c.notification_engine, authenticator)
+    return engine
+
+
 # setting up multiple engines to test
 engines = [rest_engine(), grpc_engine()]
 
 
-@pytest.mark.parametrize("engine", engines)
 @pytest.fixture(autouse=True)
-def pre_post_test(engine):
+def pre_post_test(request):
     # delete the revision state
     full_home_path = os.path.expanduser(HOME_FOLDER)
     full_state_path = os.path.join(full_home_path, LOCAL_STATE_FOLDER)
@@ -60,6 +78,7 @@ def pre_post_test(engine):
     yield
     # delete all the keys at the end of the test
     try:
+        engine = request.node.callspec.params["engine"]
         engine.delete("test")
         engine.stop()
     except Exception:
@@ -191,7 +210,7 @@ def test_revisions(engine):
     assert len(resp) == 2
 
 
-@pytest.mark.parametrize("engine", engines)
+@pytest.mark.parametrize("engine", engines + [grpc_watch_engine()])
 def test_listen(engine):
     logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
     callback_list = []
@@ -273,6 +292,54 @@ def test_listen_old_state(engine):
     assert len(callback_list) == 3
 
 
+@pytest.mark.parametrize("engine", [grpc_polling_engine()])
+def test_listen_polling(engine):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    callback_list = []
+
+    def callback(key, value):
+        callback_list.append(1)
+
+    # listen to a test key
+    assert engine.listen(["test"], callback)
+    time.sleep(0.5)
+
+    # create independent change to the test key to trigger the notification
+    kvs = [{"key": "test1", "value": "1"}]
+    assert engine.push(kvs)
+    # wait a polling interval and check the function has been triggered
+    time.sleep(2)
+    assert len(callback_list) == 1
+    assert engine.stop()
+
+
+@pytest.mark.parametrize("engine", [grpc_watch_engine()])
+def test_watch_compacted_state(engine):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    callback_list = []
+
+    def callback(key, value):
+        callback_list.append(value)
+
+    kvs = [{"key": "test1", "value": "1"}]
+    assert engine.push(kvs)
+    old_revision = engine._latest_revision("test")
+    kvs = [{"key": "test1", "value": "2"}]
+    assert engine.push(kvs)
+    # the state points to a revision no longer available
+    engine._save_last_revision(old_revision, "test")
+    import etcd3
+
+    etcd = etcd3.client(host=engine.host, port=engine.port)
+    etcd.compact(engine._latest_revision("test"))
+
+    # the watch resumes from the oldest revision available
+    assert engine.listen(["test"], callback)
+    time.sleep(2)
+    assert callback_list == ["2"]
+    assert engine.stop()
+
+
 @pytest.mark.parametrize("engine", engines)
 def test_find_revisions(engine):
     kvs = [{"key": "test/test", "value": "0"}]
@@ -477,6 +544,24 @@ def test_status_as_linked_list(engine):
     assert status4.get("last_prev_day_rev") == "102"
 
 
+@pytest.mark.parametrize("engine", engines)
+def test_status_replaced(engine):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    kvs = [{"key": "test/test0", "value": "0"}]
+    assert engine.push_with_status(kvs, base_key="test/", message="test/test0")
+
+    # another client replaces the status known by the process
+    status = {"date_time": "2020-08-28T10:58:17.829Z"}
+    assert engine.push([{"key": "test/", "value": json.dumps(status)}])
+    replaced_rev = engine.pull("test/", prefix=False)[0]["mod_rev"]
+
+    # the new status is linked to the replaced one
+    kvs = [{"key": "test/test1", "value": "0"}]
+    assert engine.push_with_status(kvs, base_key="test/", message="test/test1")
+    status_kvs = engine.pull("test/", prefix=False)
+    assert int(json.loads(status_kvs[0]["value"].decode())["prev_rev"]) == int(replaced_rev)
+
+
 @pytest.mark.parametrize("engine", engines)
 def test_save_delete_state(engine):
     logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
@@ -0,0 +1,632 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import datetime
+import json
+import os
+import threading
+import time
+
+from pyaviso import NotificationManager, logger
+from pyaviso.authentication import auth
+from pyaviso.custom_exceptions import TriggerException
+from pyaviso.engine import CheckpointMode, ListenMode
+from pyaviso.engine.engine import DATE_FORMAT
+from pyaviso.engine.etcd_rest_engine import EtcdRestEngine
+from pyaviso.engine.status_cache import StatusCache
+
+
+def etcd_auth(conf):
+    conf.auth_type = "etcd"
+    conf.username = "test"
+    conf.password = "test"
+    return auth.Auth.get_auth(conf)
+
+
+def test_push_pull_delete(conf):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    assert engine.push([{"key": "/tmp/aviso/test/test1", "value": "1"}, {"key": "/tmp/aviso/test/test2", "value": "2"}])
+    kvs = engine.pull(key="/tmp/aviso/test")
+    assert len(kvs) == 2
+    assert kvs[0]["key"] == "/tmp/aviso/test/test2"
+    deleted = engine.delete("/tmp/aviso/test")
+    assert len(deleted) == 2
+    assert len(engine.pull(key="/tmp/aviso/test")) == 0
+
+
+def test_notify_many(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    notification = {"event": "flight", "date": "20260101", "country": "Italy", "airport": "fco"}
+    notifications = [dict(notification, number=str(i), payload="here") for i in range(300)]
+    notifications.append(notification)  # not valid, the number is missing
+    notifications.append(dict(notification, number="299"))  # written twice in the last transaction
+    results = NotificationManager().notify_many(notifications, conf)
+    assert results == [True] * 300 + [False, True]
+    # 300 notifications with the status and its index fit in 3 transactions, the key written twice needs another
+    assert stand_in.requests["/v3/kv/txn"] == 4
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    assert len(engine.pull(key="/tmp/aviso/flight/20260101/")) == 300
+    # the status has been updated once per transaction and linked to the previous one
+    status = engine.pull("/tmp/aviso/flight/", prefix=False)[0]
+    assert json.loads(status["value"].decode())["prev_rev"] == status["mod_rev"] - 1
+    assert (
+        json.loads(status["value"].decode())["message"]
+        == "notification to key /tmp/aviso/flight/20260101/italy/FCO/299"
+    )
+
+
+def test_push_ttl_shared_lease(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    for i in range(10):
+        assert engine.push([{"key": f"/tmp/aviso/test/test{i}", "value": "1"}], ttl=3600)
+    # the keys expiring at the same time share a single lease
+    assert stand_in.requests["/v3/lease/grant"] == 1
+    assert len({kv["lease"] for kv in stand_in.store.values()}) == 1
+    assert engine._lease_pool.live == 1
+
+    conf.notification_engine.lease_window = 0
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    for i in range(3):
+        assert engine.push([{"key": f"/tmp/aviso/test/test{i}", "value": "1"}], ttl=3600)
+    assert stand_in.requests["/v3/lease/grant"] == 4
+
+
+def test_push_with_status_cas(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    for i in range(5):
+        assert engine.push_with_status([{"key": f"/tmp/aviso/test/test{i}", "value": "1"}], "/tmp/aviso/test")
+    # the status is read only the first time, then linked to the one pushed
+    assert stand_in.requests["/v3/kv/range"] == 1
+    assert stand_in.requests["/v3/kv/txn"] == 5
+    status = engine.pull("/tmp/aviso/test", prefix=False)[0]
+    assert json.loads(status["value"].decode())["prev_rev"] == status["mod_rev"] - 1
+
+    # another client replaces the status, the transaction is attempted again linking to it
+    engine.push([{"key": "/tmp/aviso/test", "value": status["value"]}])
+    assert engine.push_with_status([{"key": "/tmp/aviso/test/test5", "value": "1"}], "/tmp/aviso/test")
+    assert stand_in.requests["/v3/kv/range"] == 2
+    assert stand_in.requests["/v3/kv/txn"] == 8
+    new_status = engine.pull("/tmp/aviso/test", prefix=False)[0]
+    assert json.loads(new_status["value"].decode())["prev_rev"] == status["mod_rev"] + 1
+    assert len(engine.pull("/tmp/aviso/test/")) == 6
+
+
+def test_session_shared(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    authenticator = auth.Auth.get_auth(conf)
+    engine1 = EtcdRestEngine(conf.notification_engine, authenticator)
+    engine2 = EtcdRestEngine(conf.notification_engine, authenticator)
+    assert engine1._session is engine2._session
+
+    for i in range(10):
+        engine1.pull(key="/tmp/aviso/test")
+        engine2.pull(key="/tmp/aviso/test")
+    # all the requests went through the same keep-alive connection
+    assert stand_in.requests["/v3/kv/range"] == 20
+    assert stand_in.connections == 1
+
+
+def test_session_no_keep_alive(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.keep_alive = False
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    for i in range(3):
+        engine.pull(key="/tmp/aviso/test")
+    assert stand_in.connections == 3
+
+
+def test_token_cached(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    stand_in.token = "token1"
+    engine1 = EtcdRestEngine(conf.notification_engine, etcd_auth(conf))
+    engine2 = EtcdRestEngine(conf.notification_engine, etcd_auth(conf))
+    engine1.push([{"key": "/tmp/aviso/test/test1", "value": "1"}])
+    for i in range(5):
+        assert len(engine1.pull(key="/tmp/aviso/test")) == 1
+        assert len(engine2.pull(key="/tmp/aviso/test")) == 1
+    assert stand_in.requests["/v3/auth/authenticate"] == 1
+    assert engine1._token_manager is engine2._token_manager
+    assert engine1._token_manager.metrics()["authentications"] == 1
+
+
+def test_token_rejected(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    stand_in.token = "token1"
+    engine = EtcdRestEngine(conf.notification_engine, etcd_auth(conf))
+    engine.pull(key="/tmp/aviso/test")
+    # the server forgets the token, the engine has to authenticate again
+    stand_in.token = "token2"
+    engine.pull(key="/tmp/aviso/test")
+    engine.pull(key="/tmp/aviso/test")
+    assert stand_in.requests["/v3/auth/authenticate"] == 2
+    assert engine._token_manager.metrics()["invalidations"] == 1
+
+
+def test_token_single_refresh(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    stand_in.token = "token1"
+    engine = EtcdRestEngine(conf.notification_engine, etcd_auth(conf))
+    engine.pull(key="/tmp/aviso/test")
+    stand_in.token = "token2"
+    stand_in.latency = 0.05
+    # all the threads get the token rejected at the same time
+    threads = [threading.Thread(target=engine.pull, args=("/tmp/aviso/test",)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert stand_in.requests["/v3/auth/authenticate"] == 2
+    assert stand_in.requests["/v3/kv/range"] <= 1 + 8 * 2
+
+
+def test_pull_iter_pages(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    engine.push([{"key": f"/tmp/aviso/test/test{i:02}", "value": str(i)} for i in range(25)])
+    kvs = engine.pull_iter(key="/tmp/aviso/test", page_size=10)
+    first = next(kvs)
+    assert first["key"] == "/tmp/aviso/test/test24"
+    # keys pushed after the first page are not part of the result
+    engine.push([{"key": "/tmp/aviso/test/test99", "value": "99"}])
+    keys = [first["key"]] + [kv["key"] for kv in kvs]
+    assert keys == [f"/tmp/aviso/test/test{i:02}" for i in reversed(range(25))]
+    assert stand_in.requests["/v3/kv/range"] == 3
+    assert len(engine.pull(key="/tmp/aviso/test")) == 26
+
+
+def test_listen(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.catchup = False
+    conf.notification_engine.polling_interval = 0.1
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    received = []
+    engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+    assert engine.listen(["/tmp/aviso/test"], lambda k, v: received.append(k))
+    time.sleep(0.5)
+    engine.push([{"key": "/tmp/aviso/test/test1", "value": "1"}, {"key": "/tmp/aviso/test", "value": "status"}])
+    time.sleep(0.5)
+    engine.stop()
+    assert received == ["/tmp/aviso/test/test1"]
+
+
+def test_listen_status_index(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.catchup = False
+    conf.notification_engine.polling_interval = 0.1
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    received = []
+    engine.push([{"key": "/tmp/aviso/other", "value": "1"}])
+    assert engine.listen(["/tmp/aviso/test/"], lambda k, v: received.append(k))
+    time.sleep(0.5)
+    assert engine.push_with_status([{"key": "/tmp/aviso/test/test1", "value": "1"}], "/tmp/aviso/test")
+    time.sleep(0.5)
+    engine.stop()
+    # the index of the hour is outside the key space listened
+    assert len(engine.pull("/aviso/index/tmp/aviso/test/")) == 1
+    assert received == ["/tmp/aviso/test/test1"]
+
+
+def test_listen_catchup_per_key(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.catchup = True
+    conf.notification_engine.listen_mode = ListenMode.POLLING
+    conf.notification_engine.polling_interval = 0.1
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    engine.push([{"key": "/tmp/aviso/test/a", "value": "status"}, {"key": "/tmp/aviso/test/b", "value": "status"}])
+    received = []
+    assert engine.listen(["/tmp/aviso/test/a/"], lambda k, v: received.append(k), listener="first")
+    assert engine.listen(["/tmp/aviso/test/b/"], lambda k, v: received.append(k), listener="second")
+    time.sleep(0.3)
+    engine.push([{"key": "/tmp/aviso/test/a/test1", "value": "1"}])
+    time.sleep(0.3)
+    engine.stop("/tmp/aviso/test/a/")
+    engine.push([{"key": "/tmp/aviso/test/b/test1", "value": "1"}])
+    time.sleep(0.3)
+    engine.stop()
+    assert received == ["/tmp/aviso/test/a/test1", "/tmp/aviso/test/b/test1"]
+
+    # notifications sent while not listening
+    engine.push([{"key": "/tmp/aviso/test/a/test2", "value": "2"}, {"key": "/tmp/aviso/test/b/test2", "value": "2"}])
+    received.clear()
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    # each key resumes from its own revision, a changed listener from the newest revision saved for its key
+    assert engine.listen(["/tmp/aviso/test/a/"], lambda k, v: received.append(k), listener="first")
+    assert engine.listen(["/tmp/aviso/test/b/"], lambda k, v: received.append(k), listener="third")
+    time.sleep(0.3)
+    engine.stop()
+    assert sorted(received) == ["/tmp/aviso/test/a/test2", "/tmp/aviso/test/b/test2"]
+
+    # a listener to a key never listened starts from now
+    engine.push([{"key": "/tmp/aviso/test/c/test1", "value": "1"}])
+    received.clear()
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    assert engine.listen(["/tmp/aviso/test/c/"], lambda k, v: received.append(k), listener="fourth")
+    time.sleep(0.3)
+    engine.stop()
+    assert received == []
+
+
+def test_listen_checkpoint_triggered(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.catchup = True
+    conf.notification_engine.listen_mode = ListenMode.POLLING
+    conf.notification_engine.polling_interval = 0.1
+    conf.notification_engine.checkpoint_mode = CheckpointMode.TRIGGERED
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+    received = []
+
+    def callback(k, v):
+        received.append(k)
+        if k == "/tmp/aviso/test/test2":
+            raise TriggerException("failed")
+
+    assert engine.listen(["/tmp/aviso/test/"], callback, listener="flight")
+    time.sleep(0.3)
+    engine.push([{"key": "/tmp/aviso/test/test1", "value": "1"}])
+    time.sleep(0.3)
+    engine.push([{"key": "/tmp/aviso/test/test2", "value": "2"}])
+    time.sleep(0.3)
+    engine.push([{"key": "/tmp/aviso/test/test3", "value": "3"}])
+    time.sleep(0.3)
+    engine.stop()
+    assert received == ["/tmp/aviso/test/test1", "/tmp/aviso/test/test2", "/tmp/aviso/test/test3"]
+
+    # the notification whose trigger failed is received again, together with the following ones
+    received.clear()
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    assert engine.listen(["/tmp/aviso/test/"], lambda k, v: received.append(k), listener="flight")
+    time.sleep(0.3)
+    engine.stop()
+    assert sorted(received) == ["/tmp/aviso/test/test2", "/tmp/aviso/test/test3"]
+
+
+def test_listen_trigger_executor(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.catchup = True
+    conf.notification_engine.listen_mode = ListenMode.POLLING
+    conf.notification_engine.polling_interval = 0.1
+    conf.notification_engine.checkpoint_mode = CheckpointMode.TRIGGERED
+    conf.notification_engine.trigger_workers = 2
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+    received = []
+
+    def callback(k, v):
+        time.sleep(0.05)
+        received.append(k)
+        if k == "/tmp/aviso/test/test2":
+            raise TriggerException("failed")
+
+    assert engine.listen(["/tmp/aviso/test/"], callback, listener="flight")
+    time.sleep(0.3)
+    for i in range(4):
+        engine.push([{"key": f"/tmp/aviso/test/test{i}", "value": str(i)}])
+    time.sleep(0.5)
+    engine.stop()
+    # the triggers are executed in background, the listening is not held by them
+    assert sorted(received) == [f"/tmp/aviso/test/test{i}" for i in range(4)]
+    metrics = engine.trigger_metrics()
+    assert metrics["executed"] == 4
+    assert metrics["depth"] == 0
+
+    # the notification whose trigger failed is received again, together with the following ones
+    received.clear()
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    assert engine.listen(["/tmp/aviso/test/"], lambda k, v: received.append(k), listener="flight")
+    time.sleep(0.3)
+    engine.stop()
+    assert sorted(received) == ["/tmp/aviso/test/test2", "/tmp/aviso/test/test3"]
+
+
+def test_listen_trigger_checkpoint_running(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.catchup = True
+    conf.notification_engine.listen_mode = ListenMode.POLLING
+    conf.notification_engine.polling_interval = 0.1
+    conf.notification_engine.checkpoint_mode = CheckpointMode.TRIGGERED
+    conf.notification_engine.trigger_workers = 1
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+    release = threading.Event()
+
+    def callback(k, v):
+        if k == "/tmp/aviso/test/test0":
+            release.wait(5)
+
+    assert engine.listen(["/tmp/aviso/test/"], callback, listener="flight")
+    time.sleep(0.3)
+    for i in range(3):
+        engine.push([{"key": f"/tmp/aviso/test/test{i}", "value": str(i)}])
+        time.sleep(0.2)
+    # the listening goes on while the first trigger runs, the revision saved stays at its notification
+    assert engine.trigger_metrics()["depth"] == 2
+    engine._checkpoints.flush()
+    first_rev = engine.pull("/tmp/aviso/test/test0", prefix=False)[0]["mod_rev"]
+    assert engine._last_saved_revision("/tmp/aviso/test/", "flight") == first_rev
+
+    # and it advances once the triggers have completed
+    release.set()
+    time.sleep(0.3)
+    engine.stop()
+    last_rev = engine.pull("/tmp/aviso/test/test2", prefix=False)[0]["mod_rev"]
+    assert engine._last_saved_revision("/tmp/aviso/test/", "flight") == last_rev + 1
+
+
+def test_listen_trigger_lanes(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.catchup = False
+    conf.notification_engine.listen_mode = ListenMode.POLLING
+    conf.notification_engine.polling_interval = 0.1
+    conf.notification_engine.trigger_workers = 4
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+    received = {"a": [], "b": []}
+    submitted = {"a": [], "b": []}
+
+    def lane(k):
+        submitted[k.split("/")[-2]].append(int(k.split("/")[-1]))
+        return k.split("/")[-2]
+
+    def callback(k, v):
+        lane = k.split("/")[-2]
+        # the first lane is slower, it must not hold the second one nor be reordered
+        time.sleep(0.05 if lane == "a" else 0.001)
+        received[lane].append(int(v))
+
+    assert engine.listen(["/tmp/aviso/test/"], callback, listener="flight", lane=lane)
+    time.sleep(0.3)
+    for i in range(5):
+        engine.push(
+            [{"key": f"/tmp/aviso/test/a/{i}", "value": str(i)}, {"key": f"/tmp/aviso/test/b/{i}", "value": str(i)}]
+        )
+        time.sleep(0.02)
+    time.sleep(1)
+    engine.stop()
+    # each lane is triggered in the order its notifications have been received
+    assert sorted(received["a"]) == list(range(5))
+    assert received == submitted
+
+
+def test_listen_key_filter(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.catchup = False
+    conf.notification_engine.polling_interval = 0.1
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    received = []
+    batches = []
+
+    def key_filter(keys):
+        batches.append(len(keys))
+        return [k.endswith("2") for k in keys]
+
+    engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+    assert engine.listen(["/tmp/aviso/test/"], lambda k, v: received.append(k), key_filter=key_filter)
+    time.sleep(0.5)
+    engine.push([{"key": f"/tmp/aviso/test/test{i}", "value": str(i)} for i in range(3)])
+    time.sleep(0.5)
+    engine.stop()
+    # the notifications received together are filtered at once
+    assert received == ["/tmp/aviso/test/test2"]
+    assert batches == [3]
+
+
+def test_listen_watch(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.catchup = False
+    conf.notification_engine.listen_mode = ListenMode.WATCH
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    received = []
+    engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+    assert engine.listen(["/tmp/aviso/test"], lambda k, v: received.append((k, v)))
+    time.sleep(0.5)
+    engine.push([{"key": "/tmp/aviso/test/test1", "value": "1"}, {"key": "/tmp/aviso/test", "value": "status"}])
+    engine.delete("/tmp/aviso/test/test1")
+    engine.push([{"key": "/tmp/aviso/test/test2", "value": "2"}])
+    time.sleep(0.5)
+    engine.stop()
+    assert received == [("/tmp/aviso/test/test1", "1"), ("/tmp/aviso/test/test2", "2")]
+    # the changes came through a single stream, no polling
+    assert stand_in.watches == 1
+    assert stand_in.requests.get("/v3/kv/range", 0) == 1
+
+
+def test_listen_watch_not_available(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.catchup = False
+    conf.notification_engine.listen_mode = ListenMode.WATCH
+    conf.notification_engine.polling_interval = 0.1
+    stand_in.watch_available = False
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    received = []
+    engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+    assert engine.listen(["/tmp/aviso/test"], lambda k, v: received.append(k))
+    time.sleep(0.5)
+    engine.push([{"key": "/tmp/aviso/test/test1", "value": "1"}])
+    time.sleep(0.5)
+    engine.stop()
+    assert received == ["/tmp/aviso/test/test1"]
+    assert stand_in.requests["/v3/watch"] == 1
+
+
+def test_listen_watch_compacted(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.listen_mode = ListenMode.WATCH
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    engine.push([{"key": f"/tmp/aviso/test/test{i}", "value": str(i)} for i in range(3)])
+    stand_in.compact(stand_in.revision)
+    received = []
+    # watching from a compacted revision resumes from the compact revision
+    engine._add_listener("/tmp/aviso/test")
+    t = threading.Thread(
+        target=engine._watch, args=("/tmp/aviso/test", 1, lambda kvs, rev: received.extend(kvs) or rev)
+    )
+    t.start()
+    time.sleep(0.5)
+    engine.push([{"key": "/tmp/aviso/test/test3", "value": "3"}])
+    time.sleep(0.5)
+    engine.stop()
+    t.join()
+    assert [kv["key"] for kv in received] == ["/tmp/aviso/test/test3"]
+    assert stand_in.watches == 2
+
+
+def test_listen_polling_many_keys(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.catchup = False
+    conf.notification_engine.listen_mode = ListenMode.POLLING
+    conf.notification_engine.polling_interval = 0.1
+    conf.notification_engine.polling_workers = 4
+    conf.notification_engine.delivery_workers = 2
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+    keys = [f"/tmp/aviso/test/key{i:03}/" for i in range(200)]
+    received = []
+    assert engine.listen(keys, lambda k, v: received.append(k))
+    # the catch-up of the keys and their polling share the threads of the scheduler, whatever the number of keys
+    for _ in range(20):
+        assert len([t for t in threading.enumerate() if t.name.startswith("aviso-")]) == 1 + 4 + 2
+        time.sleep(0.1)
+    # the keys are caught up in turn by the delivery workers
+    time.sleep(1)
+    engine.push([{"key": keys[10] + "test1", "value": "1"}, {"key": keys[150] + "test1", "value": "1"}])
+    time.sleep(1)
+    engine.stop()
+    assert sorted(received) == [keys[10] + "test1", keys[150] + "test1"]
+    # stopping is prompt, nothing is polled afterwards
+    time.sleep(0.2)
+    polled = stand_in.requests["/v3/kv/range"]
+    time.sleep(0.3)
+    assert stand_in.requests["/v3/kv/range"] == polled
+
+
+def test_listen_polling_slow_trigger(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.catchup = False
+    conf.notification_engine.listen_mode = ListenMode.POLLING
+    conf.notification_engine.polling_interval = 0.1
+    conf.notification_engine.polling_workers = 1
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+    release = threading.Event()
+    received = []
+
+    def trigger(k, v):
+        if k.startswith("/tmp/aviso/test/slow/"):
+            release.wait(5)
+        received.append(k)
+
+    assert engine.listen(["/tmp/aviso/test/slow/", "/tmp/aviso/test/fast/"], trigger)
+    time.sleep(0.3)
+    engine.push([{"key": "/tmp/aviso/test/slow/test1", "value": "1"}])
+    time.sleep(0.3)
+    engine.push([{"key": "/tmp/aviso/test/fast/test1", "value": "1"}])
+    time.sleep(0.5)
+    # the trigger of the slow key does not hold the only polling worker
+    assert received == ["/tmp/aviso/test/fast/test1"]
+    release.set()
+    time.sleep(0.3)
+    engine.stop()
+    assert received == ["/tmp/aviso/test/fast/test1", "/tmp/aviso/test/slow/test1"]
+
+
+def test_listen_polling_adaptive(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.catchup = False
+    conf.notification_engine.listen_mode = ListenMode.POLLING
+    conf.notification_engine.polling_interval = 0.1
+    conf.notification_engine.min_polling_interval = 0.1
+    conf.notification_engine.max_polling_interval = 0.4
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    engine.push([{"key": "/tmp/aviso/test", "value": "status"}])
+    received = []
+    assert engine.listen(["/tmp/aviso/test/busy/"], lambda k, v: received.append(k))
+    # the listener overrides the intervals of the engine
+    assert engine.listen(["/tmp/aviso/test/slow/"], lambda k, v: received.append(k), polling={"max_interval": 0.2})
+    time.sleep(1.5)
+    # idle keys back off up to their max interval
+    assert engine.polling_intervals() == {"/tmp/aviso/test/busy/": 0.4, "/tmp/aviso/test/slow/": 0.2}
+    polled = stand_in.requests["/v3/kv/range"]
+    time.sleep(1)
+    # about 2.5 polls for the busy key and 5 for the slow one, the jitter shortens the intervals up to 10%
+    assert 6 <= stand_in.requests["/v3/kv/range"] - polled <= 10
+    engine.push([{"key": "/tmp/aviso/test/busy/test1", "value": "1"}])
+    for i in range(50):
+        if received:
+            break
+        time.sleep(0.01)
+    time.sleep(0.02)
+    # right after a notification the key is polled at the min interval
+    assert received == ["/tmp/aviso/test/busy/test1"]
+    assert engine.polling_intervals()["/tmp/aviso/test/busy/"] == 0.1
+    engine.stop()
+    assert engine.polling_intervals() == {}
+
+
+def test_find_revisions_indexed(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    # a status every 20 minutes for 3 days
+    start = datetime.datetime(2026, 1, 1)
+    dates = iter(start + datetime.timedelta(minutes=20 * i) for i in range(3 * 72))
+    new_status = engine._new_status
+
+    def dated_status(message=""):
+        status = new_status(message)
+        status["date_time"] = next(dates).strftime(DATE_FORMAT)
+        return status
+
+    engine._new_status = dated_status
+    revisions = []
+    for i in range(3 * 72):
+        assert engine.push_with_status([{"key": f"/tmp/aviso/test/test{i}", "value": "1"}], "/tmp/aviso/test/")
+        revisions.append(engine._latest_revision("/tmp/aviso/test/"))
+    # the index is outside the keys of the event, with a bucket per hour expiring after its TTL
+    buckets = engine.pull("/aviso/index/tmp/aviso/test/")
+    assert len(buckets) == 72
+    # the buckets share the lease of their window
+    assert 1 <= len(stand_in.leases) <= 2
+    assert all(stand_in.store[kv["key"].encode()]["lease"] in stand_in.leases for kv in buckets)
+    assert len(engine.pull("/tmp/aviso/test/")) == 3 * 72 + 1
+
+    from_date = start + datetime.timedelta(hours=10, minutes=30)
+    to_date = start + datetime.timedelta(days=1, hours=15, minutes=30)
+    ranges = stand_in.requests["/v3/kv/range"]
+    from_rev, to_rev = engine._from_to_revisions("/tmp/aviso/test/", from_date=from_date, to_date=to_date)
+    # the status of 10:40 of the first day and the one of 15:20 of the second day
+    assert from_rev == revisions[32]
+    assert to_rev == revisions[72 + 46]
+    # only the statuses of the hour of each date are navigated
+    assert stand_in.requests["/v3/kv/range"] - ranges <= 10
+
+    # without the index the whole history is navigated
+    conf.notification_engine.status_index = False
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    ranges = stand_in.requests["/v3/kv/range"]
+    assert engine._from_to_revisions("/tmp/aviso/test/", from_date=from_date) == (revisions[32], None)
+    assert stand_in.requests["/v3/kv/range"] - ranges > 30
+
+
+def test_find_revisions_cached(conf, stand_in):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    conf.notification_engine.status_index = False
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    for i in range(20):
+        assert engine.push_with_status([{"key": f"/tmp/aviso/test/test{i}", "value": "1"}], "/tmp/aviso/test/")
+    from_date = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    revisions = engine._from_to_revisions("/tmp/aviso/test/", from_date=from_date)
+
+    # a new process walks the history saved by the first one, only the current status is requested
+    StatusCache.reset_all()
+    engine = EtcdRestEngine(conf.notification_engine, auth.Auth.get_auth(conf))
+    ranges = stand_in.requests["/v3/kv/range"]
+    assert engine._from_to_revisions("/tmp/aviso/test/", from_date=from_date) == revisions
+    assert stand_in.requests["/v3/kv/range"] - ranges == 1
@@ -211,3 +211,64 @@ def test_multiple_listener(conf: user_config.UserConfig, schema):
     for listener in listeners:
         assert listener.keys is not None
         assert listener.keys[0]  # this will fail if the path was an empty string
+
+
+def test_polling_listener(conf: user_config.UserConfig, schema):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    # create the notification listener factory
+    authenticator = auth.Auth.get_auth(conf)
+    engine_factory: ef.EngineFactory = ef.EngineFactory(conf.notification_engine, authenticator)
+    listener_factory = elf.EventListenerFactory(engine_factory, schema)
+    # open the listener yaml file
+    with Path(tests_path / "unit/fixtures/good_listeners/polling_flight_listener.yaml").open(mode="r") as f:
+        listeners_dict = yaml.safe_load(f.read())
+    # parse it
+    listeners: list = listener_factory.create_listeners(listeners_dict)
+    assert listeners[0].polling == {"interval": 30, "min_interval": 1, "max_interval": 600}
+
+
+def test_bad_polling(conf: user_config.UserConfig, schema):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    # create the notification listener factory
+    authenticator = auth.Auth.get_auth(conf)
+    engine_factory: ef.EngineFactory = ef.EngineFactory(conf.notification_engine, authenticator)
+    listener_factory = elf.EventListenerFactory(engine_factory, schema)
+    # open the listener yaml file
+    with Path(tests_path / "unit/fixtures/bad_listeners/badPolling.yaml").open(mode="r") as f:
+        listeners_dict = yaml.safe_load(f.read())
+    # parse it
+    with pytest.raises(AssertionError) as e:
+        listener_factory.create_listeners(listeners_dict)
+    assert e.value.args[0] == "Polling min_interval greater than max_interval"
+
+
+def test_dispatch_listener(conf: user_config.UserConfig, schema):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    # create the notification listener factory
+    authenticator = auth.Auth.get_auth(conf)
+    engine_factory: ef.EngineFactory = ef.EngineFactory(conf.notification_engine, authenticator)
+    listener_factory = elf.EventListenerFactory(engine_factory, schema)
+    # open the listener yaml file
+    with Path(tests_path / "unit/fixtures/good_listeners/dispatch_flight_listener.yaml").open(mode="r") as f:
+        listeners_dict = yaml.safe_load(f.read())
+    # parse it
+    listeners: list = listener_factory.create_listeners(listeners_dict)
+    listener = listeners[0]
+    assert listener.dispatch == {"lanes": 4, "partition": ["date", "airport"]}
+    # the notifications of the same date and airport share the same lane, whatever the flight number
+    lanes = {
+        listener.lane(f"/tmp/aviso/flight/italy/2021010{d}/{a}/AZ{n}")
+        for d in range(2)
+        for a in ["FCO", "CIA"]
+        for n in range(10)
+    }
+    assert len(lanes) <= 4
+    for d in range(2):
+        for a in ["FCO", "CIA"]:
+            assert len({listener.lane(f"/tmp/aviso/flight/italy/2021010{d}/{a}/AZ{n}") for n in range(10)}) == 1
+
+    # the partition attributes must be part of the key
+    listeners_dict["listeners"][0]["dispatch"]["partition"] = ["flight"]
+    with pytest.raises(AssertionError) as e:
+        listener_factory.create_listeners(listeners_dict)
+    assert e.value.args[0] == "Partition attribute flight not present in the notification"
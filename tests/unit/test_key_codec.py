@@ -0,0 +1,59 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import copy
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from pyaviso import logger
+from pyaviso.custom_exceptions import EventListenerException
+from pyaviso.engine import EngineType
+from pyaviso.event_listeners.key_codec import KeyCodec
+
+tests_path = Path(__file__).parent.parent
+
+
+@pytest.fixture()
+def schema():
+    with Path(tests_path / "unit/fixtures/listener_schema.json").open() as schema:
+        yield json.load(schema)["flight"]
+    KeyCodec.reset_all()
+
+
+def test_format_parse(schema):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    codec = KeyCodec(schema, EngineType.ETCD_REST)
+    params = {"country": "italy", "date": "20210101", "airport": "FCO", "number": "AZ203"}
+    stem_key, base_key, admin_key = codec.format(params)
+    assert stem_key == "/tmp/aviso/flight/italy/20210101/FCO/AZ203"
+    assert base_key == "/tmp/aviso/flight/italy/"
+    assert admin_key == "/tmp/admin/italy"
+    assert codec.parse(stem_key) == params
+    assert codec.is_base(base_key)
+    assert not codec.is_base("/tmp/other/italy/")
+    with pytest.raises(EventListenerException):
+        codec.parse(base_key)
+    with pytest.raises(KeyError):
+        codec.format({"country": "italy"})
+
+
+def test_shared_codec(schema):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    codec = KeyCodec.get("flight", schema, EngineType.ETCD_REST)
+    assert KeyCodec.get("flight", schema, EngineType.ETCD_REST) is codec
+    assert KeyCodec.get("flight", schema, EngineType.ETCD_GRPC) is not codec
+
+    # a schema loaded again compiles a new codec
+    new_schema = copy.deepcopy(schema)
+    new_schema["endpoint"][0]["base"] = "/tmp/aviso/flights/{country}"
+    new_codec = KeyCodec.get("flight", new_schema, EngineType.ETCD_REST)
+    assert new_codec is not codec
+    assert new_codec.base_format == "/tmp/aviso/flights/{country}/"
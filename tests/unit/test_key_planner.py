@@ -0,0 +1,100 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from pyaviso import logger, user_config
+from pyaviso.authentication import auth
+from pyaviso.engine import engine_factory as ef
+from pyaviso.event_listeners import event_listener_factory as elf
+from pyaviso.event_listeners.key_planner import KeyPlanner
+
+tests_path = Path(__file__).parent.parent
+
+KEY_FORMAT = "/tmp/aviso/mars/{stream}/{step}/{time}/"
+REQUEST_SCHEMA = {
+    "stream": [{"type": "StringHandler"}],
+    "step": [{"type": "IntHandler", "range": [0, 9]}],
+    "time": [{"type": "EnumHandler", "values": ["0", "6", "12", "18"]}],
+}
+
+
+@pytest.fixture()
+def listener_factory():
+    c = user_config.UserConfig(conf_path=Path(tests_path / "config.yaml"))
+    with Path(tests_path / "unit/fixtures/listener_schema.json").open() as schema:
+        engine_factory = ef.EngineFactory(c.notification_engine, auth.Auth.get_auth(c))
+        return elf.EventListenerFactory(engine_factory, json.load(schema))
+
+
+def test_single_key():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    planner = KeyPlanner(KEY_FORMAT, REQUEST_SCHEMA)
+    assert planner.plan({"stream": "enfo", "step": 1, "time": "0"}) == ["/tmp/aviso/mars/enfo/1/0/"]
+
+
+def test_selective_keys_expanded():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    planner = KeyPlanner(KEY_FORMAT, REQUEST_SCHEMA)
+    keys = planner.plan({"stream": ["enfo", "oper"], "step": 1, "time": "0"})
+    assert keys == ["/tmp/aviso/mars/enfo/1/0/", "/tmp/aviso/mars/oper/1/0/"]
+
+
+def test_collapse_unselective():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    planner = KeyPlanner(KEY_FORMAT, REQUEST_SCHEMA)
+    # all the times and most of the steps requested, one range per stream is cheaper
+    request = {"stream": ["enfo", "oper"], "step": list(range(8)), "time": ["0", "6", "12", "18"]}
+    assert planner.plan(request) == ["/tmp/aviso/mars/enfo/", "/tmp/aviso/mars/oper/"]
+    # unless collapsing is disabled
+    assert len(planner.plan(request, collapse=False)) == 2 * 8 * 4
+
+
+def test_product_not_materialised():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    planner = KeyPlanner("/tmp/aviso/test/{a}/{b}/{c}/")
+    values = [str(i) for i in range(1000)]
+    # a billion keys
+    assert planner.plan({"a": values, "b": values, "c": values}) == ["/tmp/aviso/test/"]
+
+
+def test_missing_parameter():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    planner = KeyPlanner(KEY_FORMAT, REQUEST_SCHEMA)
+    with pytest.raises(KeyError) as e:
+        planner.plan({"stream": "enfo"})
+    assert "step" in str(e.value)
+
+
+def test_listener_history_not_collapsed(listener_factory):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    countries = [f"country{i}" for i in range(200)]
+    listeners_dict = {"listeners": [{"event": "flight", "request": {"country": countries}, "triggers": []}]}
+    listener = listener_factory.create_listeners(listeners_dict).pop()
+    assert listener.keys == ["/tmp/aviso/flight/"]
+    # the history is searched from the status of each key
+    listener = listener_factory.create_listeners(listeners_dict, from_date=datetime(2020, 1, 1)).pop()
+    assert len(listener.keys) == 200
+
+
+def test_listener_status_ignored(listener_factory):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    listeners_dict = {"listeners": [{"event": "flight", "request": {"country": "italy"}, "triggers": []}]}
+    listener = listener_factory.create_listeners(listeners_dict).pop()
+    notifications = []
+    listener.execute_triggers = notifications.append
+    listener.callback("/tmp/aviso/flight/germany/", "status")
+    listener.callback("/tmp/aviso/flight/germany/20210101/FCO/AZ203", "None")
+    listener.callback("/tmp/aviso/flight/italy/20210101/FCO/AZ203", "None")
+    assert len(notifications) == 1
+    assert notifications[0]["request"]["country"] == "italy"
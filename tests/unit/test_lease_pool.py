@@ -0,0 +1,101 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import os
+import threading
+import types
+
+import pytest
+
+from pyaviso import logger
+from pyaviso.engine import lease_pool
+from pyaviso.engine.lease_pool import LeasePool
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(lease_pool, "time", types.SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def granter():
+    granted = []
+
+    def grant(ttl):
+        granted.append(ttl)
+        return str(len(granted))
+
+    return grant, granted
+
+
+def test_shared_lease(clock):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    pool = LeasePool(window=60)
+    grant, granted = granter()
+    # the keys expiring in the same window share the lease, that expires at the end of the window
+    assert pool.lease(100, grant) == "1"
+    assert pool.lease(110, grant) == "1"
+    clock.value += 10
+    assert pool.lease(100, grant) == "1"
+    assert granted == [140]
+    # the keys expiring in the next window get a new lease
+    assert pool.lease(200, grant) == "2"
+    assert granted == [140, 250]
+    assert pool.live == 2
+    # the leases expired are forgotten
+    clock.value += 140
+    assert pool.live == 1
+    pool.discard("2")
+    assert pool.live == 0
+
+
+def test_lease_per_push(clock):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    pool = LeasePool(window=0)
+    grant, granted = granter()
+    assert pool.lease(100, grant) == "1"
+    assert pool.lease(100, grant) == "2"
+    assert granted == [100, 100]
+    assert pool.live == 0
+
+
+def test_grant_out_of_lock(clock):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    pool = LeasePool(window=60)
+    release = threading.Event()
+    granted = []
+
+    def slow_grant(ttl):
+        granted.append(ttl)
+        release.wait(5)
+        return "slow"
+
+    leases = []
+    threads = [threading.Thread(target=lambda: leases.append(pool.lease(100, slow_grant))) for _ in range(3)]
+    for t in threads:
+        t.start()
+    while not granted:
+        release.wait(0.01)
+    # a slow grant does not hold the pushes expiring in another window
+    grant, _ = granter()
+    assert pool.lease(200, grant) == "1"
+    release.set()
+    for t in threads:
+        t.join(5)
+    # and the pushes expiring in its window wait for its lease
+    assert leases == ["slow"] * 3
+    assert granted == [140]
+
+    # a failed grant fails the pushes waiting for it, the next push grants again
+    def failed_grant(ttl):
+        raise RuntimeError("unavailable")
+
+    with pytest.raises(RuntimeError):
+        pool.lease(300, failed_grant)
+    assert pool.lease(300, grant) == "2"
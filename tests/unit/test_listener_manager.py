@@ -88,3 +88,26 @@ def test_adding_listeners(conf, schema):
     # now delete them
     aviso.cancel_listeners()
     assert aviso.listeners.__len__() == 0
+
+
+def test_select(conf, schema):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    authenticator = auth.Auth.get_auth(conf)
+    engine_factory: ef.EngineFactory = ef.EngineFactory(conf.notification_engine, authenticator)
+    eng = engine_factory.create_engine()
+    request = {"country": ["italy", "spain"], "date": 20210101}
+    listener = EventListener("flight", eng, request, [{"type": "Log"}], schema)
+
+    keys = [
+        "/tmp/aviso/flight/20210101/italy/FCO/AZ203",
+        "/tmp/aviso/flight/20210101/france/CDG/AF1",
+        "/tmp/aviso/flight/20210102/spain/MAD/IB1",
+        "/tmp/aviso/flight/20210101/spain/MAD/IB2",
+        # the status is discarded, a key not matching the format is left to the callback to report
+        "/tmp/aviso/flight/",
+        "/tmp/aviso/other",
+    ]
+    assert listener.select(keys) == [True, False, False, True, False, True]
+    # the filter of the batch agrees with the one of the callback
+    for key, selected in zip(keys[:4], listener.select(keys[:4])):
+        assert listener._is_expected(listener.parse_key(key)) == selected
@@ -0,0 +1,49 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import os
+
+import pytest
+
+from pyaviso import logger
+from pyaviso.engine.polling_policy import JITTER, PollingPolicy
+
+
+def test_fixed_interval():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    policy = PollingPolicy(30)
+    assert not policy.adaptive
+    assert [policy.next(0) for i in range(5)] == [30] * 5
+    assert policy.next(10) == 30
+
+
+def test_backoff():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    policy = PollingPolicy(30, min_interval=1, max_interval=300)
+    assert policy.adaptive
+    intervals = []
+    for i in range(6):
+        delay = policy.next(0)
+        assert policy.interval * (1 - JITTER) <= delay <= policy.interval
+        intervals.append(policy.interval)
+    assert intervals == [60, 120, 240, 300, 300, 300]
+    # notifications bring the interval down to the min
+    assert policy.next(5) <= 1
+    assert policy.interval == 1
+    assert policy.next(0) >= 1
+
+
+def test_bounds():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    # the interval is kept within the bounds
+    assert PollingPolicy(30, max_interval=10).interval == 10
+    assert PollingPolicy(30, max_interval=10).min_interval == 10
+    assert PollingPolicy(30, min_interval=60).max_interval == 60
+    assert PollingPolicy(30, min_interval=1).max_interval == 30
+    with pytest.raises(AssertionError):
+        PollingPolicy(30, min_interval=60, max_interval=10)
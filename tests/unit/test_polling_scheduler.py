@@ -0,0 +1,150 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import os
+import threading
+import time
+
+import pytest
+
+from pyaviso import logger
+from pyaviso.engine.polling_scheduler import PollingScheduler
+
+
+@pytest.fixture()
+def scheduler():
+    s = PollingScheduler(workers=4, detached_workers=2)
+    yield s
+    s.shutdown()
+
+
+def test_periodic_tasks(scheduler):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    threads_before = threading.active_count()
+    runs = {}
+    lock = threading.Lock()
+    stops = {}
+
+    def task(key):
+        def run():
+            with lock:
+                runs[key] = runs.get(key, 0) + 1
+            return 0.1
+
+        return run
+
+    for i in range(2000):
+        key = f"/tmp/aviso/test/test{i}"
+        stops[key] = threading.Event()
+        scheduler.schedule(key, task(key), stops[key])
+    time.sleep(0.5)
+    # one scheduling thread and the workers, whatever the number of keys
+    assert threading.active_count() - threads_before == 1 + 4 + 2
+    assert len(runs) == 2000
+    assert all(n >= 2 for n in runs.values())
+    for stop in stops.values():
+        stop.set()
+    time.sleep(0.3)
+    completed = dict(runs)
+    time.sleep(0.3)
+    assert runs == completed
+    assert scheduler.pending() == 0
+
+
+def test_stop_prompt(scheduler):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    runs = []
+    stop = threading.Event()
+    scheduler.schedule("/tmp/aviso/test", lambda: runs.append(1) or 3600, stop)
+    time.sleep(0.1)
+    stop.set()
+    # the task is dropped without waiting for its next execution
+    scheduler.schedule("/tmp/aviso/test2", lambda: None, threading.Event())
+    time.sleep(0.1)
+    assert runs == [1]
+    assert scheduler.pending() == 1
+
+
+def test_no_overlap(scheduler):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    running = []
+    overlaps = []
+    stop = threading.Event()
+
+    def run():
+        if running:
+            overlaps.append(1)
+        running.append(1)
+        time.sleep(0.05)
+        running.pop()
+        return 0
+
+    scheduler.schedule("/tmp/aviso/test", run, stop)
+    time.sleep(0.5)
+    stop.set()
+    assert overlaps == []
+
+
+def test_task_completed(scheduler):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    runs = []
+    scheduler.schedule("/tmp/aviso/test", lambda: runs.append(1) or (0 if len(runs) < 3 else None), threading.Event())
+    time.sleep(0.3)
+    assert runs == [1, 1, 1]
+    assert scheduler.pending() == 0
+
+
+def test_detach(scheduler):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    release = threading.Event()
+    runs = []
+    # more long executions than workers
+    for i in range(8):
+        scheduler.detach(f"/tmp/aviso/test/test{i}", release.wait, 5)
+    scheduler.schedule("/tmp/aviso/test", lambda: runs.append(1) or 0.05, threading.Event())
+    time.sleep(0.3)
+    # the workers keep executing the tasks
+    assert len(runs) >= 3
+    release.set()
+
+
+def test_detach_bounded():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    scheduler = PollingScheduler(workers=2, detached_workers=3)
+    release = threading.Event()
+    running = []
+    peak = []
+    order = []
+    lock = threading.Lock()
+
+    def execution(key, i):
+        with lock:
+            running.append(key)
+            peak.append(len(running))
+        release.wait(5)
+        with lock:
+            running.remove(key)
+            order.append((key, i))
+
+    # many keys, each with more than one execution
+    for i in range(3):
+        for k in range(100):
+            scheduler.detach(f"/tmp/aviso/test/test{k}", execution, k, i)
+    time.sleep(0.2)
+    # the executions wait for the threads of the scheduler
+    assert len([t for t in threading.enumerate() if t.name.startswith("aviso-")]) == 1 + 2 + 3
+    release.set()
+    for _ in range(50):
+        if len(order) == 300:
+            break
+        time.sleep(0.1)
+    scheduler.shutdown()
+    assert max(peak) == 3
+    # the executions of a key are run in order
+    for k in range(100):
+        assert [i for key, i in order if key == k] == [0, 1, 2]
@@ -0,0 +1,78 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import datetime
+import os
+
+from pyaviso import logger
+from pyaviso.engine.status_cache import StatusCache
+
+DATE = datetime.datetime(2026, 1, 1, 10, 30)
+
+
+def test_store_load(tmp_path):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    path = str(tmp_path / "status" / "cache.jsonl")
+    cache = StatusCache(path)
+    assert cache.status("/tmp/aviso/test/", 10) is None
+    cache.store("/tmp/aviso/test/", 10, (10, DATE, 8, 2))
+    cache.store("/tmp/aviso/test/", 12, (11, DATE, 10, None))
+    assert cache.status("/tmp/aviso/test/", 10) == (10, DATE, 8, 2)
+    # another process reads the statuses saved
+    cache = StatusCache(path)
+    assert cache.status("/tmp/aviso/test/", 10) == (10, DATE, 8, 2)
+    assert cache.status("/tmp/aviso/test/", 12) == (11, DATE, 10, None)
+    assert cache.status("/tmp/aviso/test2/", 10) is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_compacted(tmp_path):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    path = str(tmp_path / "cache.jsonl")
+    cache = StatusCache(path)
+    for rev in range(1, 10):
+        cache.store("/tmp/aviso/test/", rev, (rev, DATE, rev - 1, None))
+    cache.compacted(5)
+    assert cache.status("/tmp/aviso/test/", 5) is None
+    assert cache.status("/tmp/aviso/test/", 6) is not None
+    # the statuses compacted are neither cached again nor loaded by another process
+    cache.store("/tmp/aviso/test/", 4, (4, DATE, 3, None))
+    assert cache.status("/tmp/aviso/test/", 4) is None
+    cache = StatusCache(path)
+    assert cache.status("/tmp/aviso/test/", 5) is None
+    assert cache.status("/tmp/aviso/test/", 6) is not None
+
+
+def test_validate(tmp_path):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    path = str(tmp_path / "cache.jsonl")
+    cache = StatusCache(path)
+    cache.store("/tmp/aviso/test/", 10, (10, DATE, 8, None))
+    cache.store("/tmp/aviso/test2/", 10, (10, DATE, 8, None))
+    cache.validate("/tmp/aviso/test/", 12)
+    assert cache.status("/tmp/aviso/test/", 10) is not None
+    # the current status is older than the ones cached, the server has been re-created
+    cache.validate("/tmp/aviso/test/", 3)
+    assert cache.status("/tmp/aviso/test/", 10) is None
+    assert cache.status("/tmp/aviso/test2/", 10) is not None
+    cache = StatusCache(path)
+    assert cache.status("/tmp/aviso/test/", 10) is None
+
+
+def test_rewrite(tmp_path):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    path = str(tmp_path / "cache.jsonl")
+    cache = StatusCache(path, max_statuses=10)
+    for rev in range(1, 21):
+        cache.store("/tmp/aviso/test/", rev, (rev, DATE, rev - 1, None))
+    # the file is rewritten with the most recent statuses when loaded
+    cache = StatusCache(path, max_statuses=10)
+    assert cache.status("/tmp/aviso/test/", 15) is None
+    assert cache.status("/tmp/aviso/test/", 16) is not None
+    with open(path) as f:
+        assert len(f.readlines()) == 6
@@ -0,0 +1,129 @@
+# (C) Copyright 1996- ECMWF.
+#
+# This software is licensed under the terms of the Apache Licence Version 2.0
+# which can be obtained at http://www.apache.org/licenses/LICENSE-2.0.
+# In applying this licence, ECMWF does not waive the privileges and immunities
+# granted to it by virtue of its status as an intergovernmental organisation
+# nor does it submit to any jurisdiction.
+
+import os
+import threading
+import time
+
+from pyaviso import logger
+from pyaviso.engine import QueuePolicy
+from pyaviso.engine.trigger_executor import TriggerExecutor
+
+
+def test_order_per_listener():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    executor = TriggerExecutor(workers=4)
+    received = {"first": [], "second": []}
+
+    def trigger(group, i):
+        time.sleep(0.001)
+        received[group].append(i)
+        return i
+
+    futures = [executor.submit(group, trigger, group, i) for i in range(50) for group in received]
+    assert [f.result(timeout=5) for f in futures] == [i for i in range(50) for _ in received]
+    # each listener executes its triggers one at a time, in order
+    assert received == {"first": list(range(50)), "second": list(range(50))}
+    executor.shutdown()
+
+
+def test_concurrency_limit():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    executor = TriggerExecutor(workers=8)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def trigger():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+
+    futures = [executor.submit("flight", trigger, limit=3) for _ in range(20)]
+    for f in futures:
+        f.result(timeout=5)
+    assert max(peak) == 3
+    executor.shutdown()
+
+
+def test_queue_full_block():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    executor = TriggerExecutor(workers=1, queue_size=2, policy=QueuePolicy.BLOCK)
+    release = threading.Event()
+    executor.submit("flight", release.wait)
+    time.sleep(0.1)
+    executor.submit("flight", lambda: None)
+    executor.submit("flight", lambda: None)
+    assert executor.depth == 2
+    blocked = threading.Thread(target=executor.submit, args=("flight", lambda: None))
+    blocked.start()
+    blocked.join(0.2)
+    # the submission waits for room in the queue
+    assert blocked.is_alive()
+    release.set()
+    blocked.join(5)
+    assert not blocked.is_alive()
+    executor.shutdown()
+
+
+def test_queue_full_drop():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    executor = TriggerExecutor(workers=1, queue_size=2, policy=QueuePolicy.DROP)
+    release = threading.Event()
+    executor.submit("flight", release.wait)
+    time.sleep(0.1)
+    futures = [executor.submit("flight", lambda: None) for _ in range(4)]
+    assert futures[2] is None and futures[3] is None
+    time.sleep(0.1)
+    release.set()
+    for f in futures[:2]:
+        f.result(timeout=5)
+    metrics = executor.metrics()
+    assert metrics["dropped"] == 2
+    assert metrics["executed"] == 3
+    assert metrics["depth"] == 0
+    assert metrics["max_wait_time"] >= 0.1
+    executor.shutdown()
+
+
+def test_queue_full_spill(tmp_path):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    spill_path = str(tmp_path / "triggers" / "spill.jsonl")
+    executor = TriggerExecutor(workers=1, queue_size=4, policy=QueuePolicy.SPILL, spill_path=spill_path)
+    release = threading.Event()
+    received = []
+    executor.submit("flight", release.wait)
+    time.sleep(0.1)
+    futures = [executor.submit("flight", received.append, f"/tmp/aviso/test/test{i}") for i in range(20)]
+    # the notifications beyond the size of the queue are saved to disk
+    assert os.path.exists(spill_path)
+    assert executor.metrics()["spilled"] == 16
+    release.set()
+    for f in futures:
+        f.result(timeout=5)
+    # and read back in order
+    assert received == [f"/tmp/aviso/test/test{i}" for i in range(20)]
+    assert executor.depth == 0
+    assert not os.path.exists(spill_path)
+    executor.shutdown()
+
+
+def test_shutdown_cancels():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    executor = TriggerExecutor(workers=1)
+    release = threading.Event()
+    running = executor.submit("flight", release.wait)
+    time.sleep(0.1)
+    waiting = executor.submit("flight", lambda: None)
+    executor.shutdown()
+    release.set()
+    assert running.result(timeout=5)
+    assert waiting.cancelled()
@@ -7,6 +7,7 @@
 # nor does it submit to any jurisdiction.
 
 import contextlib
+import json
 import logging
 import os
 import time
@@ -19,9 +20,12 @@ from flask import Flask, request
 
 from pyaviso import logger, user_config
 from pyaviso.authentication import auth
+from pyaviso.custom_exceptions import TriggerException
 from pyaviso.engine import engine_factory as ef
 from pyaviso.event_listeners import event_listener_factory as elf
 from pyaviso.event_listeners.listener_schema_parser import ListenerSchemaParser
+from pyaviso.triggers.post_trigger import PostCloudEventsHttp
+from pyaviso.triggers.trigger import TriggerType
 
 tests_path = Path(__file__).parent.parent
 
@@ -218,6 +222,26 @@ def received():
     return f"Received {request.json}"
 
 
+batches = []
+batch_attempts = []
+
+
+@test_frontend.route("/batch", methods=["POST"])
+def received_batch():
+    assert request.content_type == "application/cloudevents-batch+json"
+    batch = json.loads(request.get_data())
+    batch_attempts.append(len(batch))
+    if len(batch_attempts) == 1:
+        return "Unavailable", 503
+    batches.append(batch)
+    return f"Accepted {len(batch)}", 202
+
+
+@test_frontend.route("/unavailable", methods=["POST"])
+def unavailable():
+    return "Unavailable", 503
+
+
 # test_frontend.run(host="127.0.0.1", port=8001)
 
 
@@ -248,6 +272,59 @@ def test_post_cloudEventshttp_listener(conf, listener_factory, caplog):
         assert "CloudEvents notification sent successfully" in caplog.text
 
 
+def test_post_cloudevents_batch(conf, listener_factory, caplog):
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    with caplog_for_logger(caplog):  # this allows to assert over the logging output
+        # open the listener yaml file
+        with Path(tests_path / "unit/fixtures/good_listeners/post_cloudEventsHttp_batch_listener.yaml").open(
+            mode="r"
+        ) as f:
+            listeners_dict = yaml.safe_load(f.read())
+        # a batch is rejected if the triggers are executed one at a time, it would hold a single notification
+        with pytest.raises(AssertionError):
+            listener_factory.create_listeners(listeners_dict)
+        conf.notification_engine.trigger_workers = 4
+        conf.notification_engine.trigger_concurrency = 4
+        # parse it
+        listeners: list = listener_factory.create_listeners(listeners_dict)
+        listener = listeners.pop()
+
+        # start a test frontend to send the notifications to
+        server = Thread(target=test_frontend.run, daemon=True, kwargs={"host": "127.0.0.1", "port": 8052})
+        server.start()
+        time.sleep(1)
+
+        # simulate a stream of notifications triggered at the same time, each waiting for its batch to be sent. The
+        # first POST is answered as unavailable and retried
+        callbacks = []
+        for number in ["AZ201", "AZ202", "AZ203", "AZ204"]:
+            args = (f"/tmp/aviso/flight/20210101/italy/FCO/{number}", "Landed")
+            callbacks.append(Thread(target=listener.callback, args=args))
+            callbacks[-1].start()
+            time.sleep(0.05)
+        callbacks[-1].join(0.1)
+        # the last notification is sent once the batch window has passed
+        assert len(batches) == 1
+        assert callbacks[-1].is_alive()
+        for callback in callbacks:
+            callback.join(5)
+
+        for record in caplog.records:
+            assert record.levelname != "ERROR"
+        assert batch_attempts == [3, 3, 1]
+        assert [[e["data"]["request"]["number"] for e in batch] for batch in batches] == [
+            ["AZ201", "AZ202", "AZ203"],
+            ["AZ204"],
+        ]
+        assert all(batch[0]["type"] == "aviso" for batch in batches)
+
+        # the notifications of a batch not sent fail
+        params = {"url": "http://127.0.0.1:8052/unavailable", "retries": 0, "batch": {"size": 2, "window": 0.1}}
+        protocol = PostCloudEventsHttp({"event": "flight"}, params)
+        with pytest.raises(TriggerException):
+            protocol.execute()
+
+
 @pytest.mark.skip  # we don't have a AWS topic available for testing
 def test_post_cloudeventsaws_listener(conf, listener_factory, caplog):
     logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
@@ -375,3 +452,33 @@ def test_multiple_triggers(conf, listener_factory, caplog, monkeypatch: pytest.M
             os.remove("testLog.log")
         if os.path.exists("test.txt"):
             os.remove("test.txt")
+
+
+def test_trigger_plan(conf, listener_factory, caplog, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.chdir(base_path())
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    payloads = []
+    created = []
+    get_class = TriggerType.get_class
+
+    def counting_get_class(trigger_type):
+        created.append(trigger_type)
+        return get_class(trigger_type)
+
+    monkeypatch.setattr(TriggerType, "get_class", counting_get_class)
+    trigger = {"type": "function", "function": lambda notification: payloads.append(notification["payload"])}
+    listeners = {"listeners": [{"event": "flight", "request": {"country": "Italy"}, "triggers": [trigger]}]}
+    listener = listener_factory.create_listeners(listeners).pop()
+
+    # the trigger is created once, each notification is passed to it on its own
+    for payload in ["Landed", "Departed", "Delayed"]:
+        listener.callback("/tmp/aviso/flight/20210101/italy/FCO/AZ203", payload)
+    assert payloads == ["Landed", "Departed", "Delayed"]
+    assert created == [TriggerType.function]
+
+    # a trigger that could not be created fails every notification
+    listeners = {"listeners": [{"event": "flight", "request": {"country": "Italy"}, "triggers": [{"type": "command"}]}]}
+    listener = listener_factory.create_listeners(listeners).pop()
+    with caplog_for_logger(caplog):
+        assert not listener.execute_triggers({"event": "flight"})
+    assert "could not be created" in caplog.text
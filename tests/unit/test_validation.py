@@ -8,6 +8,8 @@
 
 import os
 
+import pytest
+
 from pyaviso import logger
 from pyaviso.event_listeners.event_listener import EventListener
 from pyaviso.event_listeners.validation import (
@@ -16,6 +18,7 @@ from pyaviso.event_listeners.validation import (
     FloatHandler,
     IntHandler,
     RegexHandler,
+    RequestValidator,
     StringHandler,
     TimeHandler,
 )
@@ -210,3 +213,32 @@ def test_multiple_types():
     params = {"postproc": 12.5}
     EventListener._validate(params, schema)
     assert params["postproc"] == "12"
+
+
+def test_request_validator():
+    logger.debug(os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0])
+    schema = {
+        "date": [{"type": "DateHandler", "canonic": "%Y%m%d"}],
+        "class": [{"type": "EnumHandler", "values": [f"c{i}" for i in range(5000)]}],
+    }
+    validator = RequestValidator.get(schema)
+    assert RequestValidator.get(schema) is validator
+    assert RequestValidator.get(dict(schema)) is not validator
+
+    params = {"date": "2021-1-5", "class": ["c1", "c4999"]}
+    with pytest.raises(ValueError, match="Value 2021-1-5 is not valid for key date"):
+        validator.validate(params)
+    # the params are left unchanged when not valid
+    assert params["class"] == ["c1", "c4999"]
+
+    params = {"date": "202115", "class": ["c1", "c4999"]}
+    validator.validate(params)
+    assert params == {"date": "20210105", "class": ["c1", "c4999"]}
+    with pytest.raises(ValueError, match="Value c5000 is not valid for key class"):
+        validator.validate({"class": "c5000"})
+
+    # the handlers are created once and the values already seen are not canonised again
+    handler = validator._param_handlers("date")[0]
+    assert validator._param_handlers("date")[0] is handler
+    validator.validate({"date": "202115"})
+    assert handler._process_cached.cache_info().hits == 1